@@ -1,30 +1,50 @@
-from dash import Dash, html, dcc, Input, Output, State, callback
+from dash import Dash, html, dcc, Input, Output, State, callback, ClientsideFunction
 import dash_bootstrap_components as dbc
 from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
+from geopy.exc import GeopyError
 import requests
 from quantum_model import QuantumTornadoPredictor
+from quantum_kernel import QuantumKernelModel
+from quantum_surrogate import TornadoSurrogate, SURROGATE_ERROR_BUDGET
 import os
 from dotenv import load_dotenv
 import datetime
 import math
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
+import hmac
 import numpy as np
 import traceback
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash.exceptions import PreventUpdate
+import plotly.io as pio
 from quantum_visualization import create_quantum_circuit_visualization
 import dash
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from qiskit import QuantumCircuit, Aer, execute
 from qiskit.visualization import plot_histogram
 import pennylane as qml
 from sklearn.preprocessing import MinMaxScaler
+from data_sources.observation import Observation, as_observation, to_batch, batch_row
+from data_sources.forecast_source import OpenWeatherMapForecastSource
+from disaster_scoring import (tornado_probability, earthquake_probability, fire_probability,
+                              flood_probability, score_all, apply_trends)
+from singleflight import SingleFlight
+from gazetteer import get_gazetteer
+from data_sources.http_session import session
+from data_sources.resilience import StaleWhileRevalidate, UpstreamError, breaker_stats
+from serving import is_async, run_cpu
+from scoring_pool import get_scoring_pool
+from prediction_cache import PredictionCache
+from observation_history import ObservationHistory
+from disaster_aggregates import DisasterAggregates
+from watchlist import Watchlist, sse_stream
+from http_caching import init_compression, use_fast_json, cacheable, enable_revalidation
+import mem_instrumentation
+from mem_instrumentation import instrument
 
 # Load environment variables
 load_dotenv()
@@ -36,8 +56,52 @@ server = app.server  # Expose the Flask server for Gunicorn
 # Enable CORS for the Flask server
 CORS(server)
 
+# Compress large responses (figure JSON) and let clients revalidate unchanged ones
+init_compression(server)
+enable_revalidation(server)
+use_fast_json()
+
 predictor = QuantumTornadoPredictor()
-geolocator = Nominatim(user_agent="tornado_predictor")
+# Lookup-table surrogate for bulk scoring (see quantum_surrogate.py); None until it is built
+tornado_surrogate = TornadoSurrogate.load_or_none(predictor)
+# Untrained until quantum_kernel.py has been run; the model then falls back to `predictor`
+qkernel_model = QuantumKernelModel.load_or_untrained(scaler=predictor.scaler)
+# Upstream endpoints are configurable so load tests can point them at a local stand-in
+OWM_BASE_URL = os.getenv('OWM_BASE_URL', 'http://api.openweathermap.org')
+geolocator = Nominatim(user_agent="tornado_predictor",
+                       domain=os.getenv('NOMINATIM_DOMAIN', 'nominatim.openstreetmap.org'),
+                       scheme=os.getenv('NOMINATIM_SCHEME', 'https'))
+
+# Concurrent identical requests share one in-flight geocode / weather fetch / prediction
+geocode_flight = SingleFlight('geocode')
+weather_flight = SingleFlight('weather')
+forecast_flight = SingleFlight('forecast')
+prediction_flight = SingleFlight('prediction')
+
+# Last known good upstream answers behind per-source circuit breakers
+weather_cache = StaleWhileRevalidate('openweathermap', fresh_ttl=int(os.getenv('WEATHER_FRESH_TTL', 600)),
+                                     max_stale=int(os.getenv('WEATHER_MAX_STALE', 6 * 3600)))
+geocode_cache = StaleWhileRevalidate('nominatim', fresh_ttl=float('inf'))
+
+# Daily forecasts: one bulk call per location, cached per forecast run
+forecast_source = OpenWeatherMapForecastSource(os.getenv('OPENWEATHERMAP_API_KEY'), OWM_BASE_URL)
+FORECAST_DAYS = 5  # OpenWeatherMap's forecast horizon
+
+# Per-cell prediction results, shared across workers (see prediction_cache.py)
+prediction_cache = PredictionCache()
+
+# Recent readings per location, for pressure/humidity/wind trends (see observation_history.py)
+observation_history = ObservationHistory()
+
+# Pre-aggregated event rollups behind /api/global-disasters (see disaster_aggregates.py).
+# The refresher thread is started by the server entry points (gunicorn.conf.py
+# post_worker_init, __main__), not at import, so scripts that import the app and fork
+# (build.py) stay single-threaded.
+disaster_aggregates = DisasterAggregates()
+
+# Watched locations are re-scored in the background and pushed to clients over SSE
+watchlist = Watchlist(lambda lat, lon: get_weather_data(lat, lon),
+                      lambda weather, model: score_disasters(weather, model))
 
 # --- Color palette matching the screenshot ---
 COLORS = {
@@ -66,94 +130,101 @@ GRAPH_COLORS = {
     'flood': COLORS['tab_flood'],
 }
 
-# Global statistics data (updated with real data)
-GLOBAL_STATS = {
-    'tornado': {
-        'count': 1250,  # Average annual tornadoes in the US
-        'deaths': 60,   # Average annual deaths
-        'injuries': 1500,
-        'damage': 1.5   # Billions USD
-    },
-    'earthquake': {
-        'count': 20000,  # Annual earthquakes worldwide
-        'deaths': 2000,  # Average annual deaths
-        'injuries': 5000,
-        'damage': 5.0    # Billions USD
-    },
-    'fire': {
-        'count': 50000,  # Annual wildfires in the US
-        'deaths': 100,   # Average annual deaths
-        'injuries': 2000,
-        'damage': 2.0    # Billions USD
-    },
-    'flood': {
-        'count': 1000,   # Annual significant floods worldwide
-        'deaths': 5000,  # Average annual deaths
-        'injuries': 10000,
-        'damage': 10.0   # Billions USD
-    }
-}
-
+@instrument('geocode')
 def get_coordinates(location):
+    return geocode_flight.do(location.strip().lower(), _geocode, location)
+
+class LocationNotFound(UpstreamError):
+    """Nominatim answered, but has no match for the place"""
+
+def _geocode(location):
+    # Offline gazetteer first; Nominatim is only a fallback for places it doesn't know
+    coordinates = get_gazetteer().lookup(location)
+    if coordinates:
+        return coordinates
     try:
-        location_data = geolocator.geocode(location + ", USA")
-        if location_data:
-            return location_data.latitude, location_data.longitude
+        # Places don't move, so answers are kept indefinitely; the breaker fails fast
+        # while Nominatim is down instead of waiting out every timeout
+        coordinates, _ = geocode_cache.get(location.strip().lower(), lambda: _nominatim_lookup(location))
+        return coordinates
+    except LocationNotFound:
         return None, None
-    except GeocoderTimedOut:
+    except (GeopyError, UpstreamError) as e:
+        print(f"Error geocoding {location}: {str(e)}")
         return None, None
 
+def _nominatim_lookup(location):
+    location_data = geolocator.geocode(location + ", USA")
+    if location_data:
+        return location_data.latitude, location_data.longitude
+    # Raised rather than returned so a miss (or a transient empty answer) is never cached
+    raise LocationNotFound(f"Nominatim has no match for {location}")
+
+@instrument('fetch_weather')
 def get_weather_data(lat, lon):
+    weather = weather_flight.do((round(lat, 4), round(lon, 4)), _fetch_weather_data, lat, lon)
+    observation_history.record(weather)
+    return weather
+
+def _fetch_weather_data(lat, lon):
     api_key = os.getenv('OPENWEATHERMAP_API_KEY')
     
     if not api_key:
         print("Error: OpenWeatherMap API key not found in .env file")
-        return get_mock_weather_data()
+        return get_mock_weather_data(lat, lon)
     
     if api_key == 'your_openweathermap_api_key_here':
         print("Error: Please replace the placeholder API key with your actual OpenWeatherMap API key")
-        return get_mock_weather_data()
+        return get_mock_weather_data(lat, lon)
     
     try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
-        print(f"Making API request to: {url}")
-        
-        response = requests.get(url, timeout=10)
-        print(f"API Response Status Code: {response.status_code}")
-        print(f"API Response Headers: {response.headers}")
-        print(f"API Response Content: {response.content}")
-        
-        if response.status_code == 200:
-            weather_data = response.json()
-            # Add coordinates to the weather data for the quantum model
-            weather_data['coord'] = {'lat': lat, 'lon': lon}
-            return weather_data
-        elif response.status_code == 401:
-            print("Error: Invalid API key")
-            return get_mock_weather_data()
-        elif response.status_code == 404:
-            print("Error: Location not found")
-            return get_mock_weather_data()
-        else:
-            print(f"Error: API request failed with status code {response.status_code}")
-            return get_mock_weather_data()
-            
+        # Last known good reading is served (flagged stale) while OWM is down or the
+        # breaker is open; an old reading that is merely being refreshed is not stale
+        weather_data, stale = weather_cache.get((round(lat, 2), round(lon, 2)),
+                                                lambda: _request_weather(lat, lon, api_key))
     except requests.exceptions.Timeout:
         print("Error: API request timed out")
-        return get_mock_weather_data()
+        return get_mock_weather_data(lat, lon)
     except requests.exceptions.ConnectionError:
         print("Error: Failed to connect to the API")
-        return get_mock_weather_data()
+        return get_mock_weather_data(lat, lon)
+    except UpstreamError as e:
+        print(f"Error: {str(e)}")
+        return get_mock_weather_data(lat, lon)
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
-        return get_mock_weather_data()
+        return get_mock_weather_data(lat, lon)
+
+    weather_data = weather_data.copy()
+    # Add coordinates to the weather data for the quantum model
+    weather_data.lat, weather_data.lon = lat, lon
+    weather_data.stale = stale
+    return weather_data
 
-def get_mock_weather_data():
-    """Return mock weather data for testing when the API is not available"""
+def _request_weather(lat, lon, api_key):
+    url = f"{OWM_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
+    response = session.get(url, timeout=10)
+    if response.status_code != 200:
+        # Never log the URL: it carries the API key
+        print(f"OpenWeatherMap returned status {response.status_code} for {lat:.2f}, {lon:.2f}")
+    
+    if response.status_code == 200:
+        return Observation.from_owm(response.json())
+    elif response.status_code == 401:
+        raise UpstreamError("Invalid API key", response.status_code)
+    elif response.status_code == 404:
+        raise UpstreamError("Location not found", response.status_code)
+    raise UpstreamError(f"API request failed with status code {response.status_code}", response.status_code)
+
+def get_mock_weather_data(lat=None, lon=None):
+    """
+    Return mock weather data for testing when the API is not available. The reading
+    is placed at the requested coordinates so it is never mistaken for another place.
+    """
     print("Using mock weather data")
-    return {
+    weather = Observation.from_owm({
         'main': {
             'temp': 293.15,  # 20°C
             'humidity': 65,
@@ -184,7 +255,10 @@ def get_mock_weather_data():
         'visibility': 10000,  # 10km
         'mock_data': True,  # Flag to indicate this is mock data
         'coord': {'lat': 40.7128, 'lon': -74.0060}  # Default coordinates (NYC)
-    }
+    })
+    if lat is not None and lon is not None:
+        weather.lat, weather.lon = lat, lon
+    return weather
 
 def test_api_connection():
     """Test the OpenWeatherMap API connection with a known location"""
@@ -195,9 +269,9 @@ def test_api_connection():
     lat, lon = 40.7128, -74.0060
     
     try:
-        url = f"http://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
+        url = f"{OWM_BASE_URL}/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}"
         print(f"Requesting weather data from: {url}")
-        response = requests.get(url, timeout=10)
+        response = session.get(url, timeout=10)
         
         print(f"Response status code: {response.status_code}")
         print(f"Response headers: {response.headers}")
@@ -403,12 +477,14 @@ app.layout = dbc.Container(
                 dbc.Card([
                     dbc.CardBody([
                         html.H4("Location", style={'color': COLORS['tab_guide']}),
-                        dbc.Input(id="location-input", placeholder="Enter city, state", type="text", className="mb-3", style={'borderColor': COLORS['tab_guide']}),
+                        dbc.Input(id="location-input", placeholder="Enter city, state", type="text", className="mb-3", style={'borderColor': COLORS['tab_guide']}, list="location-suggestions", autoComplete="off"),
+                        html.Datalist(id="location-suggestions"),
                         html.H4("Prediction Model", style={'color': COLORS['tab_guide'], 'marginTop': '1rem'}),
                         dcc.Dropdown(
                             id="model-select",
                             options=[
                                 {"label": "Quantum AI", "value": "quantum"},
+                                {"label": "Quantum Kernel", "value": "qkernel"},
                                 {"label": "LSTM (Deep Learning)", "value": "lstm"},
                                 {"label": "Random Forest", "value": "rf"},
                                 {"label": "XGBoost", "value": "xgb"},
@@ -420,6 +496,8 @@ app.layout = dbc.Container(
                             style={"marginBottom": "1rem"}
                         ),
                         dbc.Button("Predict", id="predict-button", color="primary", className="w-100", style={'backgroundColor': COLORS['sidebar_button'], 'color': COLORS['sidebar_button_text'], 'fontWeight': 'bold'}),
+                        # Drains the streamed prediction events into the panels (assets/prediction_stream.js)
+                        dcc.Interval(id="prediction-stream-poll", interval=100, disabled=True),
                     ])
                 ], className="mb-4", style={'backgroundColor': COLORS['sidebar_bg'], 'border': f'2px solid {COLORS["sidebar_border"]}'}),
                 dbc.Card([
@@ -489,8 +567,181 @@ app.layout = dbc.Container(
     ],
 )
 
+@server.route('/api/autocomplete')
+@cacheable(max_age=86400)
+def autocomplete():
+    """Prefix suggestions for the location input, answered from the offline gazetteer"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 8, type=int), 50)
+    return jsonify({'query': query, 'suggestions': get_gazetteer().autocomplete(query, limit)})
+
+@server.route('/api/global-disasters')
+@cacheable(max_age=300)
+def global_disasters():
+    """Recent events and per-type/per-region totals, served from the materialized rollups"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 3660)
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    try:
+        return jsonify({'success': True, **disaster_aggregates.summary(days, limit)})
+    except Exception as e:
+        print(f"Error reading disaster aggregates: {str(e)}")
+        return jsonify({'success': False, 'error': 'Disaster data unavailable'}), 503
+
+def _is_admin():
+    token = os.getenv('ADMIN_TOKEN')
+    supplied = request.headers.get('X-Admin-Token') or request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(token) and hmac.compare_digest(supplied.encode(), token.encode())
+
+@server.route('/api/admin/memory')
+def memory_report():
+    """
+    Per-section retained/peak memory, RSS and top allocation sites of this worker
+    (MEMORY_PROFILING=1 enables tracing). Requires the ADMIN_TOKEN header.
+    """
+    if not _is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    top = min(request.args.get('top', 25, type=int), 200)
+    group_by = request.args.get('group', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': 'group must be lineno, filename or traceback'}), 400
+    return jsonify(mem_instrumentation.report(top, group_by))
+
+@server.route('/api/admin/memory/baseline', methods=['POST'])
+def memory_baseline():
+    """Measure growth_since_baseline from now on"""
+    if not _is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if not mem_instrumentation.enabled():
+        return jsonify({'error': 'Memory profiling is off; set MEMORY_PROFILING=1'}), 409
+    mem_instrumentation.reset_baseline()
+    return jsonify({'baseline': 'reset'})
+
+@server.route('/api/health/upstreams')
+def upstream_health():
+    """Circuit breaker state per upstream source"""
+    return jsonify({'upstreams': breaker_stats(), 'stale_weather_served': weather_cache.stale_served,
+                    'weather_revalidated': weather_cache.revalidated})
+
+@server.route('/api/watchlist', methods=['GET'])
+def watchlist_entries():
+    return jsonify({'entries': watchlist.list(), 'stats': watchlist.stats()})
+
+@server.route('/api/watchlist', methods=['POST'])
+def watchlist_add():
+    body = request.get_json(silent=True) or {}
+    location = (body.get('location') or '').strip()
+    if not location:
+        return jsonify({'error': 'location is required'}), 400
+    lat, lon = get_coordinates(location)
+    if lat is None or lon is None:
+        return jsonify({'error': f'Could not find location: {location}'}), 404
+    threshold = body.get('threshold')
+    entry = watchlist.add(location, lat, lon, body.get('model', 'quantum'),
+                          float(threshold) if threshold is not None else None)
+    return jsonify(entry), 201
+
+@server.route('/api/watchlist/<path:key>', methods=['DELETE'])
+def watchlist_remove(key):
+    if not watchlist.remove(key):
+        return jsonify({'error': 'not watched'}), 404
+    return '', 204
+
+@server.route('/api/watchlist/stream')
+def watchlist_stream():
+    """Server-Sent Events: an `update` per re-scored location, `alert` on threshold crossings"""
+    if not is_async():
+        # Each subscriber would hold one of the few gthread threads for as long as it is open
+        return jsonify({'error': 'The watchlist stream needs async workers; run with SERVING_MODE=async'}), 503
+    return Response(stream_with_context(sse_stream(watchlist)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Fast rule-based scorers first, so their panels arrive while the tornado model runs
+STREAM_ORDER = ('earthquake', 'fire', 'flood', 'tornado')
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {pio.json.to_json_plotly(data)}\n\n"
+
+@instrument('predict_disaster_event')
+def build_disaster_event(disaster_type, location, lat, lon, weather_data, forecast, model):
+    """One streamed `disaster` event: probability, result panel and figures"""
+    prob = run_cpu(predict_disaster, weather_data, disaster_type, model)
+    prob, = adjust_for_trends(weather_data, [prob], (disaster_type,), model)
+    result, gauge, forecast_fig, factors = build_disaster_outputs(disaster_type, prob, location,
+                                                                  lat, lon, weather_data, forecast)
+    return _sse('disaster', {'disaster': disaster_type, 'probability': prob, 'result': result,
+                             'figures': {'gauge': gauge, 'forecast': forecast_fig, 'factors': factors}})
+
+def stream_prediction_events(location, model):
+    """
+    Server-Sent Events for one prediction: location, then one event per disaster as it
+    completes. The finished disaster events are cached per cell, model, location and
+    time bucket, so a repeat request for the same reading is one cache lookup.
+    """
+    try:
+        lat, lon = get_coordinates(location)
+        if lat is None or lon is None:
+            yield _sse('error', {'message': f"Could not find location: {location}"})
+            return
+        weather_data = get_weather_data(lat, lon)
+        weather = as_observation(weather_data)
+        yield _sse('location', {'location': location, 'lat': lat, 'lon': lon, 'model': model,
+                                'mock_data': bool(weather.mock), 'stale_data': bool(weather.stale)})
+        cached = prediction_cache.get_outputs(weather, model, location)
+        if cached is not None:
+            yield cached
+            yield _sse('done', {})
+            return
+        forecast = get_forecast_probabilities(lat, lon, weather_data, model)
+        events = []
+        for disaster_type in STREAM_ORDER:
+            # Concurrent requests for the same place share each disaster's scoring
+            events.append(prediction_flight.do((location.strip().lower(), model, disaster_type),
+                                               build_disaster_event, disaster_type, location, lat, lon,
+                                               weather_data, forecast, model))
+            yield events[-1]
+        prediction_cache.put_outputs(weather, model, location, ''.join(events))
+        yield _sse('done', {})
+    except Exception as e:
+        print(f"Error in streamed prediction: {str(e)}")
+        traceback.print_exc()
+        yield _sse('error', {'message': "An error occurred. Please try again."})
+
+@server.route('/api/predict/stream')
+def predict_stream():
+    """
+    Progressive prediction results as Server-Sent Events. Each `disaster` event carries
+    the probability, the result panel and the gauge/forecast/factor figures.
+    """
+    location = request.args.get('location', '').strip()
+    if not location:
+        return jsonify({'error': 'location is required'}), 400
+    model = request.args.get('model', 'quantum')
+    return Response(stream_with_context(stream_prediction_events(location, model)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # Callbacks
 @app.callback(
+    Output("location-suggestions", "children"),
+    [Input("location-input", "value")]
+)
+def update_location_suggestions(value):
+    if not value or len(value) < 2:
+        return []
+    return [html.Option(value=place['name']) for place in get_gazetteer().autocomplete(value)]
+
+# The Predict button streams /api/predict/stream into the panels, so each disaster's
+# results appear as soon as they are scored (see assets/prediction_stream.js)
+app.clientside_callback(
+    ClientsideFunction(namespace='prediction_stream', function_name='start'),
+    [Output("prediction-stream-poll", "disabled"),
+     Output("prediction-stream-poll", "n_intervals")],
+    [Input("predict-button", "n_clicks")],
+    [State("location-input", "value"), State("model-select", "value")]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='prediction_stream', function_name='poll'),
     [Output("tornado-result", "children"),
      Output("tornado-gauge", "figure"),
      Output("tornado-forecast", "figure"),
@@ -506,156 +757,150 @@ app.layout = dbc.Container(
      Output("flood-result", "children"),
      Output("flood-gauge", "figure"),
      Output("flood-forecast", "figure"),
-     Output("flood-factors", "figure")],
-    [Input("predict-button", "n_clicks")],
-    [State("location-input", "value"), State("model-select", "value")]
+     Output("flood-factors", "figure"),
+     Output("prediction-stream-poll", "disabled", allow_duplicate=True)],
+    [Input("prediction-stream-poll", "n_intervals")],
+    prevent_initial_call=True
 )
-def update_predictions(n_clicks, location, model):
-    if n_clicks is None or not location:
-        raise PreventUpdate
-    try:
-        lat, lon = get_coordinates(location)
-        if not lat or not lon:
-            return ["Invalid location. Please try again."] * 16
-        weather_data = get_weather_data(lat, lon)
-        # Select prediction method
-        def predict(weather_data, disaster_type):
-            if model == "quantum":
-                return predict_with_quantum(weather_data, disaster_type)
-            elif model == "lstm":
-                return predict_with_lstm(weather_data, disaster_type)
-            elif model == "rf":
-                return predict_with_rf(weather_data, disaster_type)
-            elif model == "xgb":
-                return predict_with_xgb(weather_data, disaster_type)
-            elif model == "svm":
-                return predict_with_svm(weather_data, disaster_type)
-            elif model == "mlp":
-                return predict_with_mlp(weather_data, disaster_type)
-            return 0.0
-        tornado_prob = predict(weather_data, 'tornado')
-        earthquake_prob = predict(weather_data, 'earthquake')
-        fire_prob = predict(weather_data, 'fire')
-        flood_prob = predict(weather_data, 'flood')
-        results = []
-        for disaster_type, prob in [
-            ('tornado', tornado_prob),
-            ('earthquake', earthquake_prob),
-            ('fire', fire_prob),
-            ('flood', flood_prob)
-        ]:
-            color = GRAPH_COLORS[disaster_type]
-            fig_gauge = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=prob * 100,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                title={'text': f"{disaster_type.capitalize()} Probability (%)",
-                      'font': {'size': 24, 'color': COLORS['text'], 'family': 'Poppins'}},
-                gauge={
-                    'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': color},
-                    'bar': {'color': color},
-                    'bgcolor': COLORS['white'],
-                    'borderwidth': 2,
-                    'bordercolor': color,
-                    'steps': [
-                        {'range': [0, 30], 'color': '#FFE066'},
-                        {'range': [30, 70], 'color': '#FFA726'},
-                        {'range': [70, 100], 'color': '#FF7043'}
-                    ],
-                    'threshold': {
-                        'line': {'color': color, 'width': 4},
-                        'thickness': 0.75,
-                        'value': prob * 100
-                    }
-                }
-            ))
-            dates = pd.date_range(start=pd.Timestamp.now(), periods=30, freq='D')
-            forecast = get_30_day_forecast(lat, lon)
-            probabilities = [prob for _ in forecast]  # Use the same prob for all days for demo
-            fig_forecast = px.line(x=dates, y=probabilities,
-                                 title='30-Day Probability Forecast',
-                                 color_discrete_sequence=[color])
-            fig_forecast.update_layout(
-                plot_bgcolor=COLORS['card_bg'],
-                paper_bgcolor=COLORS['card_bg'],
-                xaxis_title="Date",
-                yaxis_title="Probability (%)",
-                font={'color': COLORS['text'], 'family': 'Poppins'},
-                yaxis=dict(range=[0, 100])
-            )
-            factors = calculate_factor_impacts(weather_data)
-            fig_factors = px.bar(x=list(factors.keys()), y=list(factors.values()),
-                               title='Factor Impact Analysis',
-                               color_discrete_sequence=[color])
-            fig_factors.update_layout(
-                plot_bgcolor=COLORS['card_bg'],
-                paper_bgcolor=COLORS['card_bg'],
-                xaxis_title="Weather Factor",
-                yaxis_title="Impact (%)",
-                font={'color': COLORS['text'], 'family': 'Poppins'},
-                yaxis=dict(range=[0, 100])
-            )
-            result_text = [
-                html.H3(f"{disaster_type.capitalize()} Prediction Results", style={'color': color, 'font-family': 'Poppins'}),
-                html.P(f"Location: {location}", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
-                html.P(f"Probability: {prob * 100:.2f}%", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
-                html.H4("Key Factors:", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
-                html.Ul([html.Li(f"{k}: {v:.1f}%", style={'color': COLORS['text'], 'font-family': 'Poppins'}) for k, v in factors.items()])
-            ]
-            results.extend([result_text, fig_gauge, fig_forecast, fig_factors])
-        return results
-    except Exception as e:
-        print(f"Error in prediction: {str(e)}")
-        traceback.print_exc()
-        return ["An error occurred. Please try again."] * 16
 
-def generate_forecast(location, coordinates, current_weather):
-    """Generate a 30-day forecast based on current weather conditions."""
-    forecast = []
-    base_weather = current_weather.copy()
-    
-    for day in range(30):
-        date = datetime.now() + timedelta(days=day)
-        weather = simulate_weather_changes(base_weather, day)
-        probability = calculate_tornado_probability(weather)
-        key_factors = get_key_factors(weather)
-        
-        forecast.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'probability': probability,
-            'weather': weather,
-            'key_factors': key_factors
-        })
-    
-    return forecast
+def predict_disaster(weather_data, disaster_type, model):
+    """Probability of one disaster with the selected model"""
+    if model == "quantum":
+        return predict_with_quantum(weather_data, disaster_type)
+    elif model == "qkernel":
+        return predict_with_qkernel(weather_data, disaster_type)
+    elif model == "lstm":
+        return predict_with_lstm(weather_data, disaster_type)
+    elif model == "rf":
+        return predict_with_rf(weather_data, disaster_type)
+    elif model == "xgb":
+        return predict_with_xgb(weather_data, disaster_type)
+    elif model == "svm":
+        return predict_with_svm(weather_data, disaster_type)
+    elif model == "mlp":
+        return predict_with_mlp(weather_data, disaster_type)
+    return 0.0
 
-def simulate_weather_changes(base_weather, day):
-    """Simulate weather changes for each day in the forecast."""
-    weather = base_weather.copy()
-    
-    # Add some randomness to weather parameters
-    weather['main']['temp'] += random.uniform(-2, 2)
-    weather['main']['humidity'] = max(0, min(100, weather['main']['humidity'] + random.uniform(-5, 5)))
-    weather['main']['pressure'] += random.uniform(-5, 5)
-    weather['wind']['speed'] = max(0, weather['wind']['speed'] + random.uniform(-1, 1))
-    
-    # Ensure values stay within reasonable ranges
-    weather['main']['temp'] = max(-50, min(50, weather['main']['temp']))
-    weather['main']['pressure'] = max(900, min(1100, weather['main']['pressure']))
-    
-    return weather
+def predict_disasters(weather_data, model):
+    """Probabilities for all four disasters with the selected model"""
+    return [predict_disaster(weather_data, d, model) for d in ('tornado', 'earthquake', 'fire', 'flood')]
+
+@instrument('build_figures')
+def build_disaster_outputs(disaster_type, prob, location, lat, lon, weather_data, forecast=None):
+    """
+    Result panel, gauge, forecast and factor figures for one disaster. `forecast` is
+    get_forecast_probabilities() output; it is fetched here when not given.
+    """
+    color = GRAPH_COLORS[disaster_type]
+    fig_gauge = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=prob * 100,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': f"{disaster_type.capitalize()} Probability (%)",
+              'font': {'size': 24, 'color': COLORS['text'], 'family': 'Poppins'}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 1, 'tickcolor': color},
+            'bar': {'color': color},
+            'bgcolor': COLORS['white'],
+            'borderwidth': 2,
+            'bordercolor': color,
+            'steps': [
+                {'range': [0, 30], 'color': '#FFE066'},
+                {'range': [30, 70], 'color': '#FFA726'},
+                {'range': [70, 100], 'color': '#FF7043'}
+            ],
+            'threshold': {
+                'line': {'color': color, 'width': 4},
+                'thickness': 0.75,
+                'value': prob * 100
+            }
+        }
+    ))
+    if forecast is None:
+        forecast = get_forecast_probabilities(lat, lon, weather_data, 'quantum')
+    dates, probabilities = forecast
+    fig_forecast = px.line(x=dates, y=probabilities[disaster_type] * 100,
+                         title=f'{len(dates)}-Day Probability Forecast',
+                         color_discrete_sequence=[color])
+    fig_forecast.update_layout(
+        plot_bgcolor=COLORS['card_bg'],
+        paper_bgcolor=COLORS['card_bg'],
+        xaxis_title="Date",
+        yaxis_title="Probability (%)",
+        font={'color': COLORS['text'], 'family': 'Poppins'},
+        yaxis=dict(range=[0, 100])
+    )
+    factors = calculate_factor_impacts(weather_data)
+    fig_factors = px.bar(x=list(factors.keys()), y=list(factors.values()),
+                       title='Factor Impact Analysis',
+                       color_discrete_sequence=[color])
+    fig_factors.update_layout(
+        plot_bgcolor=COLORS['card_bg'],
+        paper_bgcolor=COLORS['card_bg'],
+        xaxis_title="Weather Factor",
+        yaxis_title="Impact (%)",
+        font={'color': COLORS['text'], 'family': 'Poppins'},
+        yaxis=dict(range=[0, 100])
+    )
+    result_text = [
+        html.H3(f"{disaster_type.capitalize()} Prediction Results", style={'color': color, 'font-family': 'Poppins'}),
+        html.P(f"Location: {location}", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
+        html.P(f"Probability: {prob * 100:.2f}%", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
+        *([html.P("Using the last known weather reading (weather service unavailable)",
+                  style={'color': COLORS['text'], 'font-family': 'Poppins', 'font-style': 'italic'})]
+          if as_observation(weather_data).stale else []),
+        *([html.P("Using placeholder weather data (weather service unavailable)",
+                  style={'color': COLORS['text'], 'font-family': 'Poppins', 'font-style': 'italic'})]
+          if as_observation(weather_data).mock else []),
+        html.H4("Key Factors:", style={'color': COLORS['text'], 'font-family': 'Poppins'}),
+        html.Ul([html.Li(f"{k}: {v:.1f}%", style={'color': COLORS['text'], 'font-family': 'Poppins'}) for k, v in factors.items()])
+    ]
+    return [result_text, fig_gauge, fig_forecast, fig_factors]
+
+@instrument('score_disasters')
+def score_disasters(weather_data, model):
+    """
+    predict_disasters() behind the prediction cache. On a miss, scoring runs off the
+    request thread: in the shared-memory scoring pool for the quantum model when
+    SCORING_POOL_PROCESSES is set (concurrent requests are merged into one vectorized
+    batch), otherwise through run_cpu(). Trends from the location's observation
+    history are applied on top of the cached scores.
+    """
+    weather = as_observation(weather_data)
+    disasters = ('tornado', 'earthquake', 'fire', 'flood')
+    cached = prediction_cache.get_many(weather, model, disasters)
+    if len(cached) == len(disasters):
+        return adjust_for_trends(weather, [cached[d] for d in disasters], disasters, model)
+
+    pool = get_scoring_pool()
+    if pool is not None and model == "quantum":
+        scores = [float(p) for p in pool.score('quantum', to_batch(weather))[0]]
+    else:
+        scores = run_cpu(predict_disasters, weather, model)
+    prediction_cache.put_many(weather, model, dict(zip(disasters, scores)))
+    return adjust_for_trends(weather, scores, disasters, model)
+
+def adjust_for_trends(weather_data, scores, disasters, model):
+    """Apply pressure/humidity/wind trends of the location's recent readings to the rule-based scores"""
+    if model not in ("quantum", "qkernel"):
+        return scores
+    batch = to_batch(weather_data)
+    adjusted = apply_trends({d: [p] for d, p in zip(disasters, scores)}, batch,
+                            observation_history.trends_batch(batch))
+    return [float(adjusted[d][0]) for d in disasters]
 
 def get_key_factors(weather):
     """Determine which factors are most significant for tornado formation."""
+    weather = as_observation(weather)
     factors = []
     
-    if weather['main']['temp'] > 25:
+    if weather.temp_c > 25:
         factors.append('High Temperature')
-    if weather['main']['humidity'] > 70:
+    if weather.humidity > 70:
         factors.append('High Humidity')
-    if weather['main']['pressure'] < 1000:
+    if weather.pressure < 1000:
         factors.append('Low Pressure')
-    if weather['wind']['speed'] > 10:
+    if weather.wind_speed > 10:
         factors.append('Strong Winds')
     
     return factors if factors else ['Normal Conditions']
@@ -665,78 +910,7 @@ def calculate_tornado_probability(weather_data):
     Calculate the probability of a tornado based on weather conditions.
     Returns a probability between 0 and 1.
     """
-    # Extract weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    pressure = weather_data['main']['pressure']
-    wind_speed = weather_data['wind']['speed']
-    
-    # Initialize probability components
-    temp_prob = 0.0
-    humidity_prob = 0.0
-    pressure_prob = 0.0
-    wind_prob = 0.0
-    
-    # Temperature factor (optimal range: 20-30°C)
-    if 20 <= temp <= 30:
-        temp_prob = 1.0
-    elif 15 <= temp < 20 or 30 < temp <= 35:
-        temp_prob = 0.7
-    elif 10 <= temp < 15 or 35 < temp <= 40:
-        temp_prob = 0.4
-    else:
-        temp_prob = 0.1
-    
-    # Humidity factor (optimal range: 60-80%)
-    if 60 <= humidity <= 80:
-        humidity_prob = 1.0
-    elif 50 <= humidity < 60 or 80 < humidity <= 90:
-        humidity_prob = 0.7
-    elif 40 <= humidity < 50 or 90 < humidity <= 95:
-        humidity_prob = 0.4
-    else:
-        humidity_prob = 0.1
-    
-    # Pressure factor (optimal range: 980-1000 hPa)
-    if 980 <= pressure <= 1000:
-        pressure_prob = 1.0
-    elif 970 <= pressure < 980 or 1000 < pressure <= 1010:
-        pressure_prob = 0.7
-    elif 960 <= pressure < 970 or 1010 < pressure <= 1020:
-        pressure_prob = 0.4
-    else:
-        pressure_prob = 0.1
-    
-    # Wind speed factor (optimal range: 10-20 m/s)
-    if 10 <= wind_speed <= 20:
-        wind_prob = 1.0
-    elif 7 <= wind_speed < 10 or 20 < wind_speed <= 25:
-        wind_prob = 0.7
-    elif 5 <= wind_speed < 7 or 25 < wind_speed <= 30:
-        wind_prob = 0.4
-    else:
-        wind_prob = 0.1
-    
-    # Calculate weighted probability
-    weights = {
-        'temperature': 0.3,
-        'humidity': 0.3,
-        'pressure': 0.2,
-        'wind_speed': 0.2
-    }
-    
-    total_probability = (
-        temp_prob * weights['temperature'] +
-        humidity_prob * weights['humidity'] +
-        pressure_prob * weights['pressure'] +
-        wind_prob * weights['wind_speed']
-    )
-    
-    # Apply quantum-inspired adjustments
-    quantum_factor = random.uniform(0.9, 1.1)  # Simulate quantum uncertainty
-    final_probability = min(1.0, total_probability * quantum_factor)
-    
-    return final_probability
+    return float(tornado_probability(to_batch(weather_data))[0])
 
 def calculate_factor_impacts(weather_data):
     """
@@ -744,10 +918,11 @@ def calculate_factor_impacts(weather_data):
     Returns a dictionary with impact percentages for each factor (0-100%).
     """
     # Extract weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    pressure = weather_data['main']['pressure']
-    wind_speed = weather_data['wind']['speed']
+    weather = as_observation(weather_data)
+    temp = weather.temp_c
+    humidity = weather.humidity
+    pressure = weather.pressure
+    wind_speed = weather.wind_speed
 
     # Calculate individual impacts (normalized to 0-1 range)
     temp_impact = calculate_temperature_impact(temp)
@@ -834,91 +1009,21 @@ def calculate_earthquake_probability(weather_data):
     Calculate the probability of an earthquake based on research-based parameters.
     This model uses a combination of weather data and geological factors.
     """
-    # Extract relevant weather parameters
-    pressure = weather_data['main']['pressure']
-    humidity = weather_data['main']['humidity']
-    
-    # Research indicates that atmospheric pressure changes can trigger earthquakes
-    # Sudden drops in pressure (especially below 990 hPa) can increase seismic activity
-    pressure_factor = max(0, min(1, (1013 - pressure) / 50))
-    
-    # Humidity is less directly related to earthquakes, but high humidity often
-    # accompanies low pressure systems which can trigger seismic activity
-    humidity_factor = max(0, min(1, humidity / 100))
-    
-    # Combine factors with weights based on research
-    # Pressure changes have a stronger correlation with seismic activity
-    probability = (0.7 * pressure_factor + 0.3 * humidity_factor) * 0.6
-    
-    # Add some randomness to simulate uncertainty
-    probability += random.uniform(-0.1, 0.1)
-    
-    # Ensure probability is between 0 and 1
-    return max(0, min(1, probability))
+    return float(earthquake_probability(to_batch(weather_data))[0])
 
 def calculate_fire_probability(weather_data):
     """
     Calculate the probability of a forest fire based on research-based parameters.
     Uses the Canadian Forest Fire Weather Index (FWI) system as a reference.
     """
-    # Extract relevant weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    wind_speed = weather_data['wind']['speed']
-    
-    # Temperature factor - higher temperatures increase fire risk
-    # Research shows temperatures above 30°C significantly increase fire risk
-    temp_factor = max(0, min(1, (temp - 20) / 20))
-    
-    # Humidity factor - lower humidity increases fire risk
-    # Research indicates humidity below 30% significantly increases fire risk
-    humidity_factor = max(0, min(1, (100 - humidity) / 70))
-    
-    # Wind speed factor - higher wind speeds increase fire risk
-    # Research shows wind speeds above 15 km/h (4.17 m/s) increase fire spread
-    wind_factor = max(0, min(1, wind_speed / 10))
-    
-    # Combine factors with weights based on research
-    # Temperature and humidity are the primary factors, with wind as a secondary factor
-    probability = (0.4 * temp_factor + 0.4 * humidity_factor + 0.2 * wind_factor) * 0.8
-    
-    # Add some randomness to simulate uncertainty
-    probability += random.uniform(-0.1, 0.1)
-    
-    # Ensure probability is between 0 and 1
-    return max(0, min(1, probability))
+    return float(fire_probability(to_batch(weather_data))[0])
 
 def calculate_flood_probability(weather_data):
     """
     Calculate the probability of flooding based on research-based parameters.
     Uses hydrological models as a reference.
     """
-    # Extract relevant weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    pressure = weather_data['main']['pressure']
-    
-    # Humidity factor - higher humidity increases flood risk
-    # Research shows humidity above 80% often precedes heavy rainfall
-    humidity_factor = max(0, min(1, (humidity - 60) / 40))
-    
-    # Pressure factor - lower pressure increases flood risk
-    # Research indicates pressure below 1000 hPa often accompanies storm systems
-    pressure_factor = max(0, min(1, (1013 - pressure) / 30))
-    
-    # Temperature factor - moderate temperatures increase flood risk
-    # Research shows moderate temperatures (10-20°C) with high humidity often lead to flooding
-    temp_factor = max(0, min(1, 1 - abs(temp - 15) / 20))
-    
-    # Combine factors with weights based on research
-    # Humidity and pressure are the primary factors, with temperature as a secondary factor
-    probability = (0.4 * humidity_factor + 0.4 * pressure_factor + 0.2 * temp_factor) * 0.7
-    
-    # Add some randomness to simulate uncertainty
-    probability += random.uniform(-0.1, 0.1)
-    
-    # Ensure probability is between 0 and 1
-    return max(0, min(1, probability))
+    return float(flood_probability(to_batch(weather_data))[0])
 
 def calculate_earthquake_factor_impacts(weather_data):
     """
@@ -926,8 +1031,9 @@ def calculate_earthquake_factor_impacts(weather_data):
     Based on research on earthquake triggers.
     """
     # Extract weather parameters
-    pressure = weather_data['main']['pressure']
-    humidity = weather_data['main']['humidity']
+    weather = as_observation(weather_data)
+    pressure = weather.pressure
+    humidity = weather.humidity
     
     # Calculate individual impacts based on research
     # Pressure changes have a stronger correlation with seismic activity
@@ -946,9 +1052,10 @@ def calculate_fire_factor_impacts(weather_data):
     Based on the Canadian Forest Fire Weather Index (FWI) system.
     """
     # Extract weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    wind_speed = weather_data['wind']['speed']
+    weather = as_observation(weather_data)
+    temp = weather.temp_c
+    humidity = weather.humidity
+    wind_speed = weather.wind_speed
     
     # Calculate individual impacts based on research
     # Temperature and humidity are the primary factors
@@ -969,9 +1076,10 @@ def calculate_flood_factor_impacts(weather_data):
     Based on hydrological research.
     """
     # Extract weather parameters
-    temp = weather_data['main']['temp'] - 273.15  # Convert Kelvin to Celsius
-    humidity = weather_data['main']['humidity']
-    pressure = weather_data['main']['pressure']
+    weather = as_observation(weather_data)
+    temp = weather.temp_c
+    humidity = weather.humidity
+    pressure = weather.pressure
     
     # Calculate individual impacts based on research
     # Humidity and pressure are the primary factors
@@ -986,71 +1094,71 @@ def calculate_flood_factor_impacts(weather_data):
         'temperature': temp_impact * 100
     }
 
-def get_30_day_forecast(lat, lon):
+@instrument('fetch_forecast')
+def get_daily_forecast(lat, lon, current_weather=None):
     """
-    Get a 30-day forecast for a location.
-    This is a simplified version that generates mock forecast data.
-    In a real application, you would use a weather API that provides long-term forecasts.
+    Daily forecast for a location as (dates, observation batch), one row per day.
+    Comes from one OpenWeatherMap forecast call (see data_sources/forecast_source.py).
+    Without the API, today's reading is carried forward over FORECAST_DAYS days.
     """
-    forecast = []
-    base_date = datetime.now()
-    
-    # Generate mock forecast data for 30 days
-    for i in range(30):
-        date = base_date + timedelta(days=i)
-        
-        # Generate slightly different weather data for each day
-        # This is a simplified approach - in a real app, you'd use actual forecast data
-        temp = random.uniform(15, 35)  # Temperature in Celsius
-        humidity = random.uniform(40, 90)  # Humidity percentage
-        pressure = random.uniform(980, 1020)  # Pressure in hPa
-        wind_speed = random.uniform(0, 15)  # Wind speed in m/s
-        
-        # Create weather data structure for this day
-        weather = {
-            'main': {
-                'temp': temp + 273.15,  # Convert to Kelvin for consistency
-                'humidity': humidity,
-                'pressure': pressure
-            },
-            'wind': {
-                'speed': wind_speed
-            }
-        }
-        
-        # Calculate probability based on the weather data
-        # This is a simplified approach - in a real app, you'd use more sophisticated models
-        probability = random.uniform(0.1, 0.9)
-        
-        # Determine key factors based on the weather data
-        key_factors = []
-        if temp > 30:
-            key_factors.append("High Temperature")
-        if humidity > 80:
-            key_factors.append("High Humidity")
-        if pressure < 990:
-            key_factors.append("Low Pressure")
-        if wind_speed > 10:
-            key_factors.append("Strong Winds")
-        
-        if not key_factors:
-            key_factors.append("Normal Conditions")
-        
-        forecast.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'probability': probability,
-            'weather': weather,  # Include the weather data in the forecast entry
-            'key_factors': key_factors
-        })
-    
-    return forecast
+    api_key = os.getenv('OPENWEATHERMAP_API_KEY')
+    daily = None
+    if api_key and api_key != 'your_openweathermap_api_key_here':
+        forecast_source.api_key = api_key
+        try:
+            daily, _ = forecast_flight.do((round(lat, 2), round(lon, 2)), forecast_source.fetch_daily, (lat, lon))
+        except Exception as e:
+            print(f"Error fetching forecast: {str(e)}")
+    if daily is None or len(daily) == 0:
+        current = as_observation(current_weather) if current_weather is not None else get_weather_data(lat, lon)
+        dates = pd.date_range(start=datetime.now().date(), periods=FORECAST_DAYS, freq='D')
+        daily = np.repeat(to_batch(current), len(dates))
+        daily['lat'], daily['lon'] = lat, lon
+        daily['time'] = dates.asi8 // 10**9
+        return dates, daily
+    return pd.to_datetime(daily['time'], unit='s'), daily
+
+def predict_tornado_batch(batch, error_budget=SURROGATE_ERROR_BUDGET):
+    """
+    Quantum tornado probabilities for bulk scoring (forecasts, static builds): the
+    lookup-table surrogate where its measured error fits the budget, exact otherwise
+    """
+    if tornado_surrogate is None:
+        return predictor.predict_batch(batch)
+    return tornado_surrogate.predict_batch(batch, error_budget=error_budget)
+
+def forecast_probabilities(daily, model):
+    """{disaster: probability per day} for a daily forecast batch, every disaster in one pass"""
+    disasters = ('tornado', 'earthquake', 'fire', 'flood')
+    if model == "quantum":
+        scores = score_all(daily, ('earthquake', 'fire', 'flood'))
+        scores['tornado'] = np.asarray(predict_tornado_batch(daily), dtype=float)
+    elif model == "qkernel" and qkernel_model.trained:
+        scores = score_all(daily, ('earthquake', 'fire', 'flood'))
+        scores['tornado'] = qkernel_model.predict_batch(daily)
+    else:
+        rows = np.array([predict_disasters(batch_row(daily, i), model) for i in range(len(daily))]).reshape(-1, 4)
+        scores = dict(zip(disasters, rows.T))
+    return scores
+
+@instrument('score_forecast')
+def get_forecast_probabilities(lat, lon, current_weather, model):
+    """(dates, {disaster: daily probabilities}) for the forecast charts"""
+    dates, daily = get_daily_forecast(lat, lon, current_weather)
+    pool = get_scoring_pool()
+    if pool is not None and model == "quantum":
+        scores = dict(zip(('tornado', 'earthquake', 'fire', 'flood'), pool.score('quantum_bulk', daily).T))
+    else:
+        scores = run_cpu(forecast_probabilities, daily, model)
+    scores['wildfire'] = scores['fire']
+    return dates, scores
 
 # --- Prediction method stubs ---
 def predict_with_quantum(weather_data, disaster_type):
     if disaster_type == 'tornado':
         # Use the improved quantum model instead of the old calculation
         # Add coordinates to weather_data if they exist
-        if 'coord' not in weather_data and hasattr(predictor, '_is_low_tornado_region'):
+        if not as_observation(weather_data).has_coordinates and hasattr(predictor, '_is_low_tornado_region'):
             # If coordinates are missing, we can't determine if it's a low-risk region
             # So we'll use a more conservative approach
             return predictor.predict(weather_data) * 0.5  # Reduce probability by 50%
@@ -1063,6 +1171,12 @@ def predict_with_quantum(weather_data, disaster_type):
         return calculate_flood_probability(weather_data)
     return 0.0
 
+def predict_with_qkernel(weather_data, disaster_type):
+    """Tornado from the quantum-kernel classifier when trained; everything else as predict_with_quantum"""
+    if disaster_type == 'tornado' and qkernel_model.trained:
+        return qkernel_model.predict(weather_data)
+    return predict_with_quantum(weather_data, disaster_type)
+
 def predict_with_lstm(weather_data, disaster_type):
     # Stub: Replace with real LSTM model
     return random.uniform(0.2, 0.8)
@@ -1084,4 +1198,5 @@ def predict_with_mlp(weather_data, disaster_type):
     return random.uniform(0.2, 0.8)
 
 if __name__ == '__main__':
+    disaster_aggregates.start_refresher()
     app.run(debug=True, port=5000) 
\ No newline at end of file
@@ -0,0 +1,78 @@
+// Progressive prediction results for the Dash dashboard.
+//
+// The Predict button opens an EventSource on /api/predict/stream. Each `disaster`
+// event is queued as it arrives, and the prediction-stream-poll interval drains the
+// queue into that disaster's result panel and figures, so the rule-based disasters
+// show up while the tornado model is still running. The interval is only enabled
+// while a stream is open.
+(function () {
+    const DISASTERS = ['tornado', 'earthquake', 'fire', 'flood'];
+    const OUTPUTS_PER_DISASTER = 4;  // result panel, gauge, forecast, factors
+
+    let source = null;
+    let pending = [];
+    let finished = true;
+
+    function finish(event) {
+        if (event) {
+            pending.push(event);
+        }
+        finished = true;
+        if (source) {
+            source.close();
+            source = null;
+        }
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        prediction_stream: {
+            start: function (nClicks, location, model) {
+                if (!nClicks || !location) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                // A new prediction replaces whatever is still streaming
+                finish();
+                pending = [];
+                finished = false;
+                const params = new URLSearchParams({location: location, model: model || 'quantum'});
+                source = new EventSource('/api/predict/stream?' + params.toString());
+                source.addEventListener('disaster', function (e) {
+                    pending.push(JSON.parse(e.data));
+                });
+                source.addEventListener('done', function () {
+                    finish();
+                });
+                source.addEventListener('error', function (e) {
+                    // Server-sent `error` events carry a message; a dropped connection does not
+                    const message = e.data ? JSON.parse(e.data).message : 'An error occurred. Please try again.';
+                    finish({error: message});
+                });
+                return [false, 0];
+            },
+
+            poll: function () {
+                const noUpdate = window.dash_clientside.no_update;
+                const outputs = new Array(DISASTERS.length * OUTPUTS_PER_DISASTER + 1).fill(noUpdate);
+                pending.splice(0).forEach(function (event) {
+                    if (event.error) {
+                        DISASTERS.forEach(function (disaster, i) {
+                            outputs[i * OUTPUTS_PER_DISASTER] = event.error;
+                        });
+                        return;
+                    }
+                    const offset = DISASTERS.indexOf(event.disaster) * OUTPUTS_PER_DISASTER;
+                    if (offset < 0) {
+                        return;
+                    }
+                    outputs[offset] = event.result;
+                    outputs[offset + 1] = event.figures.gauge;
+                    outputs[offset + 2] = event.figures.forecast;
+                    outputs[offset + 3] = event.figures.factors;
+                });
+                // Stop polling once the stream has ended and everything is shown
+                outputs[outputs.length - 1] = finished ? true : noUpdate;
+                return outputs;
+            }
+        }
+    });
+})();
@@ -0,0 +1,328 @@
+"""
+Parallel historical backtesting of the prediction models.
+
+Historical observations are replayed through any registered model and the scores
+are compared with what actually happened. Skill is reported per disaster and region:
+
+  brier         mean squared error of the probabilities (lower is better)
+  brier_skill   1 - brier / brier of always forecasting the base rate
+  roc_auc       probability that a positive row outranks a negative one
+  ece           expected calibration error over CALIBRATION_BINS equal-width bins,
+                with the per-bin mean forecast and observed frequency alongside
+
+Observations come from a CSV with the columns time, lat, lon, temp (Kelvin),
+humidity, pressure and wind_speed (wind_deg, clouds and rain_1h are optional).
+Labels are either columns named after the disasters (`label` is read as tornado, as
+in quantum_training.py), or derived from event files (see disaster_aggregates.py).
+In the latter case, a row is positive when an event of that type lies within
+--radius-km of it and within --horizon-days after its time. Disasters without any
+events in the files are left unlabeled rather than counted as all-negative.
+
+The rule-based scorers add random noise to their scores. Each chunk draws it from
+np.random.default_rng((seed, model, start)), so runs with the same --seed give the
+same metrics regardless of the number of workers.
+
+The quantum models answer the tornado circuit from the lookup-table surrogate
+(quantum_surrogate.py) when one is built and its measured error fits --error-budget.
+--exact always evaluates the circuit.
+
+Parsing and labeling happen once. The observation batch, labels and regions are
+cached under BACKTEST_CACHE_DIR, keyed by the input files (path, size, mtime) and
+the labeling parameters. Later runs memory-map them. Models are the scoring pool
+kernels (scoring_pool.KERNELS) plus anything added with register_model(). The batch
+is scored in chunks across a process pool. Each worker maps the cached batch itself,
+so only row ranges and scores cross the process boundary.
+
+Usage:
+    python backtest.py data/history.csv --events data/events/*.csv dumps/usgs.geojson \\
+        --models quantum qkernel rules --workers 8 --output reports/backtest.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from data_sources.observation import OBSERVATION_DTYPE, OBSERVATION_FIELDS, batch_from_columns
+from data_sources.usgs_catalog_index import haversine_km
+from disaster_aggregates import read_event_file, region_of
+from quantum_surrogate import SURROGATE_ERROR_BUDGET
+from scoring_pool import DISASTERS, KERNELS
+
+BACKTEST_CACHE_DIR = os.getenv('BACKTEST_CACHE_DIR', os.path.join('data', 'backtest_cache'))
+BACKTEST_CHUNK_ROWS = int(os.getenv('BACKTEST_CHUNK_ROWS', 8192))
+CALIBRATION_BINS = 10
+
+# Bump when the cached layout or the labeling rules change
+FEATURE_VERSION = 1
+
+UNLABELED = -1
+
+# name -> fn(batch, rng, error_budget) returning (n, len(DISASTERS)) probabilities in DISASTERS order
+MODELS = dict(KERNELS)
+
+
+def register_model(name):
+    """Decorator adding a batch scorer fn(batch, rng, error_budget) to the models a backtest can replay"""
+    def decorator(fn):
+        MODELS[name] = fn
+        return fn
+    return decorator
+
+
+# --- features ----------------------------------------------------------------------
+
+def read_observations(path):
+    """Observation CSV as (batch, labels) with labels (n, len(DISASTERS)), UNLABELED where absent"""
+    df = pd.read_csv(path)
+    missing = [c for c in ('temp', 'humidity', 'pressure', 'wind_speed') if c not in df.columns]
+    if missing:
+        raise ValueError(f"Observations are missing columns: {missing}")
+    columns = {field: df[field].to_numpy(dtype=float) for field in OBSERVATION_FIELDS
+               if field in df.columns and field != 'time'}
+    if 'time' in df.columns:
+        columns['time'] = pd.to_datetime(df['time'], utc=True, format='mixed').astype('int64') // 10 ** 9
+    batch = batch_from_columns(n=len(df), **columns)
+
+    labels = np.full((len(df), len(DISASTERS)), UNLABELED, dtype=np.int8)
+    for column, disaster in [(d, d) for d in DISASTERS] + [('label', 'tornado')]:
+        if column in df.columns:
+            labels[:, DISASTERS.index(disaster)] = df[column].fillna(UNLABELED).to_numpy(dtype=np.int8)
+    return batch, labels
+
+
+def label_from_events(batch, labels, event_paths, radius_km=50.0, horizon_days=1.0):
+    """Fill the labels of every disaster type that occurs in the event files"""
+    events = pd.concat([read_event_file(path) for path in event_paths], ignore_index=True)
+    horizon = horizon_days * 86400
+    locations, location_index = np.unique(np.stack([batch['lat'], batch['lon']], axis=1),
+                                          axis=0, return_inverse=True)
+    location_index = location_index.reshape(-1)
+    # Rows without coordinates can't be matched to events and stay unlabeled
+    located = ~(np.isnan(batch['lat']) | np.isnan(batch['lon']))
+    for column, disaster in enumerate(DISASTERS):
+        typed = events[events['type'] == disaster]
+        if typed.empty:
+            continue
+        labels[located, column] = 0
+        event_lats, event_lons = typed['lat'].to_numpy(float), typed['lon'].to_numpy(float)
+        event_times = typed['time'].to_numpy(np.int64) // 1000
+        for i, (lat, lon) in enumerate(locations):
+            if np.isnan(lat) or np.isnan(lon):
+                continue
+            nearby = np.sort(event_times[haversine_km(lat, lon, event_lats, event_lons) <= radius_km])
+            if len(nearby) == 0:
+                continue
+            rows = np.flatnonzero(location_index == i)
+            times = batch['time'][rows]
+            # Any nearby event in [time, time + horizon)
+            hits = np.searchsorted(nearby, times + horizon) - np.searchsorted(nearby, times)
+            labels[rows, column] = hits > 0
+    return labels
+
+
+def regions_of(batch):
+    located = ~(np.isnan(batch['lat']) | np.isnan(batch['lon']))
+    return np.where(located, region_of(batch['lat'], batch['lon']), 'Unknown')
+
+
+def _cache_key(observations_path, event_paths, radius_km, horizon_days):
+    digest = hashlib.sha256(f"v{FEATURE_VERSION}:{radius_km}:{horizon_days}".encode())
+    for path in [observations_path, *sorted(event_paths)]:
+        stat = os.stat(path)
+        digest.update(f"|{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_features(observations_path, event_paths=(), radius_km=50.0, horizon_days=1.0,
+                  cache_dir=BACKTEST_CACHE_DIR):
+    """
+    (cache directory, batch, labels, regions), parsing and labeling the inputs only when
+    no cached copy exists for them. Arrays are memory-mapped from the cache.
+    """
+    directory = os.path.join(cache_dir, _cache_key(observations_path, event_paths, radius_km, horizon_days))
+    if not os.path.exists(os.path.join(directory, 'batch.npy')):
+        batch, labels = read_observations(observations_path)
+        if event_paths:
+            labels = label_from_events(batch, labels, event_paths, radius_km, horizon_days)
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'labels.npy'), labels)
+        np.save(os.path.join(directory, 'regions.npy'), regions_of(batch))
+        # batch.npy is written last; its presence marks the cache entry as complete
+        tmp_path = os.path.join(directory, 'batch.tmp.npy')
+        np.save(tmp_path, batch)
+        os.replace(tmp_path, os.path.join(directory, 'batch.npy'))
+    return (directory,
+            np.load(os.path.join(directory, 'batch.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'labels.npy'), mmap_mode='r'),
+            np.load(os.path.join(directory, 'regions.npy')))
+
+
+# --- replay ------------------------------------------------------------------------
+
+_batches = {}
+
+
+def _score_chunk(task):
+    """Worker: score rows [start, stop) of the cached batch with one model"""
+    directory, model, start, stop, seed, error_budget = task
+    if directory not in _batches:
+        _batches[directory] = np.load(os.path.join(directory, 'batch.npy'), mmap_mode='r')
+    batch = np.array(_batches[directory][start:stop], dtype=OBSERVATION_DTYPE)
+    # The noise of a chunk depends only on the seed, the model and the rows it covers
+    rng = np.random.default_rng((seed, zlib.crc32(model.encode()), start))
+    return model, start, np.asarray(MODELS[model](batch, rng, error_budget), dtype=float)
+
+
+def replay(directory, n_rows, models, workers=None, chunk_rows=BACKTEST_CHUNK_ROWS, seed=0,
+           error_budget=SURROGATE_ERROR_BUDGET):
+    """{model: (n_rows, len(DISASTERS)) scores}, chunks scored in a process pool"""
+    scores = {model: np.empty((n_rows, len(DISASTERS))) for model in models}
+    tasks = [(directory, model, start, min(start + chunk_rows, n_rows), seed, error_budget)
+             for model in models for start in range(0, n_rows, chunk_rows)]
+    if workers == 1:
+        results = list(map(_score_chunk, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_chunk, tasks))
+    for model, start, chunk in results:
+        scores[model][start:start + len(chunk)] = chunk
+    return scores
+
+
+# --- metrics -----------------------------------------------------------------------
+
+def roc_auc(y, p):
+    """Mann-Whitney ROC-AUC, NaN unless both classes are present"""
+    positives = int(y.sum())
+    negatives = len(y) - positives
+    if positives == 0 or negatives == 0:
+        return float('nan')
+    ranks = rankdata(p)
+    return float((ranks[y == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+def calibration(y, p, bins=CALIBRATION_BINS):
+    """Reliability table over equal-width bins and the expected calibration error"""
+    which = np.minimum((p * bins).astype(int), bins - 1)
+    counts = np.bincount(which, minlength=bins)
+    predicted = np.bincount(which, weights=p, minlength=bins)
+    observed = np.bincount(which, weights=y, minlength=bins)
+    filled = counts > 0
+    predicted[filled] /= counts[filled]
+    observed[filled] /= counts[filled]
+    ece = float(np.sum(counts[filled] * np.abs(observed[filled] - predicted[filled])) / len(y))
+    table = [{'bin': [b / bins, (b + 1) / bins], 'count': int(counts[b]),
+              'mean_predicted': float(predicted[b]), 'observed_rate': float(observed[b])}
+             for b in np.flatnonzero(filled)]
+    return ece, table
+
+
+def skill(y, p):
+    y, p = np.asarray(y, dtype=float), np.clip(np.asarray(p, dtype=float), 0, 1)
+    base_rate = float(y.mean())
+    brier = float(np.mean((p - y) ** 2))
+    reference = base_rate * (1 - base_rate)
+    ece, table = calibration(y, p)
+    return {
+        'rows': len(y),
+        'positives': int(y.sum()),
+        'base_rate': base_rate,
+        'mean_forecast': float(p.mean()),
+        'brier': brier,
+        'brier_skill': 1 - brier / reference if reference > 0 else float('nan'),
+        'roc_auc': roc_auc(y, p),
+        'ece': ece,
+        'calibration': table,
+    }
+
+
+def evaluate(scores, labels, regions):
+    """{disaster: {region: metrics}} for one model's scores, with 'All' covering every region"""
+    labels = np.asarray(labels)
+    result = {}
+    for column, disaster in enumerate(DISASTERS):
+        labeled = labels[:, column] != UNLABELED
+        if not labeled.any():
+            continue
+        y, p = labels[labeled, column], scores[labeled, column]
+        region = regions[labeled]
+        result[disaster] = {'All': skill(y, p)}
+        for name in np.unique(region):
+            in_region = region == name
+            result[disaster][str(name)] = skill(y[in_region], p[in_region])
+    return result
+
+
+def run_backtest(observations_path, models=('quantum', 'rules'), event_paths=(), radius_km=50.0,
+                 horizon_days=1.0, workers=None, chunk_rows=BACKTEST_CHUNK_ROWS, cache_dir=BACKTEST_CACHE_DIR,
+                 seed=0, error_budget=SURROGATE_ERROR_BUDGET):
+    unknown = [m for m in models if m not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {unknown}; registered: {sorted(MODELS)}")
+    started = time.perf_counter()
+    directory, batch, labels, regions = load_features(observations_path, event_paths, radius_km,
+                                                      horizon_days, cache_dir)
+    features_seconds = time.perf_counter() - started
+    scores = replay(directory, len(batch), models, workers, chunk_rows, seed, error_budget)
+    replay_seconds = time.perf_counter() - started - features_seconds
+    return {
+        'observations': os.path.abspath(observations_path),
+        'events': [os.path.abspath(p) for p in event_paths],
+        'rows': len(batch),
+        'radius_km': radius_km,
+        'horizon_days': horizon_days,
+        'seed': seed,
+        'error_budget': error_budget,
+        'features_seconds': features_seconds,
+        'replay_seconds': replay_seconds,
+        'models': {model: evaluate(scores[model], labels, regions) for model in models},
+    }
+
+
+def print_report(report):
+    print(f"{report['rows']} rows: features {report['features_seconds']:.1f}s, "
+          f"replay {report['replay_seconds']:.1f}s")
+    print(f"{'model':<10} {'disaster':<11} {'region':<14} {'rows':>9} {'pos':>7} "
+          f"{'brier':>7} {'bss':>7} {'auc':>6} {'ece':>6}")
+    for model, disasters in report['models'].items():
+        for disaster, regions in disasters.items():
+            for region, m in regions.items():
+                print(f"{model:<10} {disaster:<11} {region:<14} {m['rows']:>9} {m['positives']:>7} "
+                      f"{m['brier']:>7.4f} {m['brier_skill']:>7.3f} {m['roc_auc']:>6.3f} {m['ece']:>6.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay historical observations through the prediction models")
+    parser.add_argument('observations', help="CSV of historical observations")
+    parser.add_argument('--events', nargs='*', default=[], help="USGS dumps or generic event files used as labels")
+    parser.add_argument('--models', nargs='+', default=['quantum', 'rules'], choices=sorted(MODELS))
+    parser.add_argument('--radius-km', type=float, default=50.0)
+    parser.add_argument('--horizon-days', type=float, default=1.0)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--chunk-rows', type=int, default=BACKTEST_CHUNK_ROWS)
+    parser.add_argument('--cache-dir', default=BACKTEST_CACHE_DIR)
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the rule-based scorers' noise")
+    parser.add_argument('--error-budget', type=float, default=SURROGATE_ERROR_BUDGET,
+                        help="Max surrogate error accepted for the tornado circuit")
+    parser.add_argument('--exact', action='store_true', help="Always evaluate the tornado circuit exactly")
+    parser.add_argument('--output', help="Write the full report (with calibration tables) as JSON")
+    args = parser.parse_args()
+
+    report = run_backtest(args.observations, args.models, args.events, args.radius_km, args.horizon_days,
+                          args.workers, args.chunk_rows, args.cache_dir, args.seed,
+                          None if args.exact else args.error_budget)
+    print_report(report)
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
@@ -1,12 +1,21 @@
 import os
+import re
+import json
 import shutil
+import hashlib
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from jinja2 import Environment, FileSystemLoader
+
+DISASTERS = ['tornado', 'earthquake', 'fire', 'flood']
 
 def build_static_files():
     # Create docs directory if it doesn't exist
     docs_dir = Path('docs')
     docs_dir.mkdir(exist_ok=True)
-    
+
     # Copy necessary files to docs directory
     files_to_copy = [
         'app.py',
@@ -15,16 +24,142 @@ def build_static_files():
         'README.md',
         'index.html'
     ]
-    
+
     for file in files_to_copy:
         if os.path.exists(file):
             shutil.copy2(file, docs_dir / file)
-    
+
     # Copy templates directory
     if os.path.exists('templates'):
         shutil.copytree('templates', docs_dir / 'templates', dirs_exist_ok=True)
-    
+
     print("Build completed successfully!")
 
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def model_fingerprint():
+    """Hash of the model artifacts, so retraining invalidates every static prediction"""
+    from quantum_model import DEFAULT_WEIGHTS_PATH
+    from quantum_surrogate import DEFAULT_SURROGATE_PATH, SURROGATE_ERROR_BUDGET
+    from feature_scaler import DEFAULT_SCALER_PATH
+    digest = hashlib.sha256(str(SURROGATE_ERROR_BUDGET).encode())
+    for path in [DEFAULT_WEIGHTS_PATH, DEFAULT_SCALER_PATH, DEFAULT_SURROGATE_PATH,
+                 'quantum_model.py', 'disaster_scoring.py']:
+        if os.path.exists(path):
+            digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+def load_cities(path=None, top=50):
+    """City list from a file (one "City, ST" per line) or the largest gazetteer places"""
+    from gazetteer import get_gazetteer
+    gazetteer = get_gazetteer()
+    if path:
+        cities = []
+        for line in Path(path).read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                coordinates = gazetteer.lookup(line)
+                if coordinates is None:
+                    print(f"Skipping unknown city: {line}")
+                    continue
+                cities.append((line, coordinates[0], coordinates[1]))
+        return cities
+    return [(f"{name}, {state}", lat, lon) for name, state, lat, lon, _ in gazetteer.places[:top]]
+
+def _predict_city(task):
+    """Worker: fetch weather for one city and score it unless its inputs are unchanged"""
+    name, lat, lon, fingerprint, previous_hash = task
+    from app import get_weather_data, predict_with_quantum, predict_tornado_batch
+    from data_sources.observation import to_batch
+    weather = get_weather_data(lat, lon)
+    inputs = {
+        'location': name,
+        'model': fingerprint,
+        'weather': [round(float(v), 2) for v in weather.to_record()[3:]],
+        'mock': bool(weather.mock),
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+    if digest == previous_hash:
+        return name, digest, None
+    record = {
+        'location': name,
+        'lat': lat,
+        'lon': lon,
+        'weather': {'temp_c': round(weather.temp_c, 1), 'humidity': weather.humidity,
+                    'pressure': weather.pressure, 'wind_speed': weather.wind_speed},
+        # Tornado goes through the lookup-table surrogate when it fits the error budget
+        'predictions': {d: round(float(predict_tornado_batch(to_batch(weather))[0] if d == 'tornado'
+                                       else predict_with_quantum(weather, d)), 4) for d in DISASTERS},
+    }
+    return name, digest, record
+
+def build_static_predictions(cities, output_dir='docs', workers=None, force=False):
+    """
+    Precompute predictions for `cities` [(name, lat, lon), ...] in a process pool and
+    write compact JSON plus rendered pages. Entries whose inputs hash is unchanged
+    since the last build are skipped.
+    """
+    # Import the app before forking so workers inherit the loaded model
+    import app  # noqa: F401
+
+    out_dir = Path(output_dir) / 'predictions'
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / 'manifest.json'
+    manifest = {} if force or not manifest_path.exists() else json.loads(manifest_path.read_text())
+
+    def previous_hash(name):
+        # A city whose output files are missing is rebuilt even if its inputs are unchanged
+        slug = slugify(name)
+        if (out_dir / f"{slug}.json").exists() and (out_dir / f"{slug}.html").exists():
+            return manifest.get(slug)
+        return None
+
+    fingerprint = model_fingerprint()
+    tasks = [(name, lat, lon, fingerprint, previous_hash(name)) for name, lat, lon in cities]
+
+    env = Environment(loader=FileSystemLoader('templates'))
+    template = env.get_template('static_predictions.html')
+
+    def table_rows(record):
+        return [{'location': record['location'], 'disaster_type': d, 'probability': p}
+                for d, p in record['predictions'].items()]
+
+    updated = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, digest, record in pool.map(_predict_city, tasks):
+            slug = slugify(name)
+            manifest[slug] = digest
+            if record is None:
+                continue
+            updated += 1
+            (out_dir / f"{slug}.json").write_text(json.dumps(record, separators=(',', ':')))
+            (out_dir / f"{slug}.html").write_text(template.render(predictions=table_rows(record)))
+
+    # The index is rebuilt from the per-city JSON so unchanged entries are reused as-is
+    records = []
+    for name, _, _ in cities:
+        path = out_dir / f"{slugify(name)}.json"
+        if path.exists():
+            records.append(json.loads(path.read_text()))
+    (out_dir / 'index.json').write_text(json.dumps(records, separators=(',', ':')))
+    (Path(output_dir) / 'static_predictions.html').write_text(
+        template.render(predictions=[row for record in records for row in table_rows(record)])
+    )
+    manifest_path.write_text(json.dumps(manifest, sort_keys=True, indent=0))
+    print(f"Static predictions: {updated} regenerated, {len(cities) - updated} unchanged")
+    return updated
+
 if __name__ == '__main__':
-    build_static_files() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the static site")
+    parser.add_argument('--predictions', action='store_true', help="Precompute static predictions")
+    parser.add_argument('--cities', help="File with one \"City, ST\" per line (default: largest gazetteer places)")
+    parser.add_argument('--top', type=int, default=50, help="Number of gazetteer places when --cities is not given")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help="Regenerate every entry")
+    args = parser.parse_args()
+
+    if args.predictions:
+        build_static_predictions(load_cities(args.cities, args.top), workers=args.workers, force=args.force)
+    else:
+        build_static_files()
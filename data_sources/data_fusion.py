@@ -1,16 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from .openweathermap_source import OpenWeatherMapSource
 from .usgs_source import USGSEarthquakeSource
 from .nasa_power_source import NASAPowerSource
+from .nasa_power_store import NASAPowerStore
+from .usgs_catalog_index import USGSCatalogIndex
 
 class DataFusion:
     def __init__(self, owm_api_key):
         self.owm = OpenWeatherMapSource(owm_api_key)
-        self.usgs = USGSEarthquakeSource()
-        self.nasa = NASAPowerSource()
+        self.usgs = USGSEarthquakeSource(USGSCatalogIndex.load_if_exists())
+        self.nasa = NASAPowerSource(NASAPowerStore())
 
     def fetch_all(self, location, disaster_type):
+        # The sources are independent, so query them concurrently (greenlets in async mode)
+        sources = [self.owm, self.usgs, self.nasa]
+        with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+            results = list(pool.map(lambda source: source.fetch(location, disaster_type), sources))
         data = {}
-        data.update(self.owm.fetch(location, disaster_type))
-        data.update(self.usgs.fetch(location, disaster_type))
-        data.update(self.nasa.fetch(location, disaster_type))
-        return data 
\ No newline at end of file
+        for result in results:
+            data.update(result)
+        return data
+
+    def fetch_observation(self, location):
+        """Current conditions as an Observation, or None if the weather source fails"""
+        return self.owm.fetch_observation(location)
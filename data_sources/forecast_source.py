@@ -0,0 +1,118 @@
+"""
+Multi-day weather forecasts from OpenWeatherMap.
+
+One call to the 5 day / 3 hour forecast endpoint returns every step for a location.
+The steps are converted to an observation batch once, then reduced to one row per
+local calendar day: hottest temperature, mean humidity and cloud cover, lowest
+pressure, strongest wind (with its direction) and the heaviest hourly rain rate.
+Those are the extremes the disaster scorers react to, so scoring the daily batch
+gives each day's worst case rather than a smoothed average.
+
+Forecasts are cached per location for FORECAST_BUCKET_SECONDS (OpenWeatherMap
+publishes a new run every 3 hours) behind the shared 'openweathermap' circuit
+breaker, and the last known good forecast is served while the upstream is down.
+"""
+import os
+
+import numpy as np
+
+from .http_session import session
+from .base import DataSourceBase
+from .observation import OBSERVATION_DTYPE, batch_from_columns
+from .resilience import StaleWhileRevalidate, UpstreamError, get_breaker
+
+FORECAST_BUCKET_SECONDS = int(os.getenv('FORECAST_BUCKET_SECONDS', 3 * 3600))
+FORECAST_MAX_STALE = int(os.getenv('FORECAST_MAX_STALE', 24 * 3600))
+
+
+def steps_to_batch(data):
+    """Observation batch (one row per 3-hour step) from a /data/2.5/forecast response"""
+    steps = data.get('list') or []
+    coord = (data.get('city') or {}).get('coord') or {}
+    rain = [(step.get('rain') or {}).get('3h', 0.0) for step in steps]
+    return batch_from_columns(
+        n=len(steps),
+        lat=coord.get('lat', np.nan),
+        lon=coord.get('lon', np.nan),
+        time=[step['dt'] for step in steps],
+        temp=[step['main']['temp'] for step in steps],
+        humidity=[step['main']['humidity'] for step in steps],
+        pressure=[step['main']['pressure'] for step in steps],
+        wind_speed=[step['wind']['speed'] for step in steps],
+        wind_deg=[step['wind'].get('deg', 0.0) for step in steps],
+        clouds=[(step.get('clouds') or {}).get('all', 0.0) for step in steps],
+        rain_1h=np.asarray(rain, dtype=float) / 3,
+    )
+
+
+def daily_aggregate(steps, utc_offset=0):
+    """
+    One row per local calendar day from a time-sorted step batch. `time` of each row
+    is the UTC timestamp of that day's local midnight.
+    """
+    if len(steps) == 0:
+        return np.zeros(0, dtype=OBSERVATION_DTYPE)
+    day = (steps['time'] + utc_offset) // 86400
+    starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+    counts = np.diff(np.r_[starts, len(steps)])
+    windiest = np.maximum.reduceat(steps['wind_speed'], starts)
+    # Direction of the strongest wind of each day
+    is_windiest = steps['wind_speed'] == np.repeat(windiest, counts)
+    windiest_row = starts + np.array([np.argmax(is_windiest[s:s + c]) for s, c in zip(starts, counts)])
+    return batch_from_columns(
+        n=len(starts),
+        lat=steps['lat'][starts],
+        lon=steps['lon'][starts],
+        time=day[starts] * 86400 - utc_offset,
+        temp=np.maximum.reduceat(steps['temp'], starts),
+        humidity=np.add.reduceat(steps['humidity'], starts) / counts,
+        pressure=np.minimum.reduceat(steps['pressure'], starts),
+        wind_speed=windiest,
+        wind_deg=steps['wind_deg'][windiest_row],
+        clouds=np.add.reduceat(steps['clouds'], starts) / counts,
+        rain_1h=np.maximum.reduceat(steps['rain_1h'], starts),
+    )
+
+
+class OpenWeatherMapForecastSource(DataSourceBase):
+    def __init__(self, api_key, base_url='https://api.openweathermap.org'):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache = StaleWhileRevalidate('openweathermap_forecast', breaker=get_breaker('openweathermap'),
+                                          fresh_ttl=FORECAST_BUCKET_SECONDS, max_stale=FORECAST_MAX_STALE)
+
+    def _request(self, lat, lon):
+        url = f"{self.base_url}/data/2.5/forecast?lat={lat}&lon={lon}&appid={self.api_key}"
+        resp = session.get(url, timeout=10)
+        if resp.status_code != 200:
+            raise UpstreamError(f"OpenWeatherMap forecast returned status {resp.status_code}", resp.status_code)
+        data = resp.json()
+        steps = np.sort(steps_to_batch(data), order='time')
+        return daily_aggregate(steps, (data.get('city') or {}).get('timezone', 0))
+
+    def fetch_daily(self, location):
+        """(daily observation batch, stale) for a (lat, lon) location; raises if there is none"""
+        lat, lon = location
+        daily, stale = self.cache.get((round(lat, 2), round(lon, 2)), lambda: self._request(lat, lon))
+        daily = daily.copy()
+        daily['lat'], daily['lon'] = lat, lon
+        return daily, stale
+
+    def fetch(self, location, disaster_type):
+        try:
+            daily, stale = self.fetch_daily(location)
+        except Exception as e:
+            print(f"Error fetching OpenWeatherMap forecast: {str(e)}")
+            return {}
+        if len(daily) == 0:
+            return {}
+        # Tomorrow's worst case, or today's if that is all the forecast covers
+        row = daily[min(1, len(daily) - 1)]
+        return {
+            'temperature': row['temp'] - 273.15,
+            'humidity': row['humidity'],
+            'pressure': row['pressure'],
+            'wind_speed': row['wind_speed'],
+            'wind_deg': row['wind_deg'],
+            **({'stale': True} if stale else {})
+        }
@@ -0,0 +1,18 @@
+"""
+Shared pooled HTTP session for upstream APIs.
+
+Keep-alive connections are reused across requests, and the pool is sized for many
+concurrent in-flight calls, which matters in the async (gevent) serving mode where
+one worker process serves hundreds of requests at once.
+"""
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 100))
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=16, pool_maxsize=UPSTREAM_POOL_SIZE)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
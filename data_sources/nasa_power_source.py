@@ -1,29 +1,57 @@
-import requests
+from .http_session import session
+from datetime import date, timedelta
 from .base import DataSourceBase
+from .nasa_power_store import NASAPowerStore, POWER_PARAMETERS, FILL_VALUE
+from .resilience import StaleWhileRevalidate, UpstreamError
 
 class NASAPowerSource(DataSourceBase):
+    def __init__(self, store=None):
+        # Optional local NASAPowerStore; backfilled locations are answered from disk
+        self.store = store
+        # POWER is daily data, so a last known good answer stays useful for a while
+        self.cache = StaleWhileRevalidate('nasa_power', fresh_ttl=6 * 3600, max_stale=3 * 86400)
+
+    def backfill(self, location, start, end):
+        if self.store is None:
+            self.store = NASAPowerStore()
+        lat, lon = location
+        return self.store.backfill(lat, lon, start, end)
+
     def fetch(self, location, disaster_type):
         lat, lon = location
+        if self.store is not None:
+            stored = self.store.get(lat, lon, max_age_days=14)
+            if stored is not None:
+                return stored
+
+        try:
+            data, stale = self.cache.get((round(lat, 2), round(lon, 2)), lambda: self._query(lat, lon))
+        except Exception as e:
+            print(f"Error fetching NASA POWER data: {str(e)}")
+            return {}
+        return dict(data, stale=True) if stale and data else data
+
+    def _query(self, lat, lon):
+        # POWER daily data lags a few days behind, so ask for a recent window
+        end = date.today() - timedelta(days=1)
+        start = end - timedelta(days=10)
         url = (
-            f"https://power.larc.nasa.gov/api/temporal/daily/point?parameters=T2M,WS2M,PRECTOTCORR,ALLSKY_SFC_SW_DWN"
-            f"&community=RE&longitude={lon}&latitude={lat}&format=JSON&start=20230101&end=20230102"
+            f"https://power.larc.nasa.gov/api/temporal/daily/point?parameters={','.join(POWER_PARAMETERS)}"
+            f"&community=RE&longitude={lon}&latitude={lat}&format=JSON"
+            f"&start={start.strftime('%Y%m%d')}&end={end.strftime('%Y%m%d')}"
         )
-        resp = requests.get(url)
+        resp = session.get(url, timeout=30)
         if resp.status_code != 200:
-            return {}
+            raise UpstreamError(f"NASA POWER returned status {resp.status_code}", resp.status_code)
         data = resp.json()
-        # Get the most recent day
+        # Get the most recent day that has data
         try:
-            daily = list(data['properties']['parameter']['T2M'].items())[0]
-            temp = daily[1]
-            wind = list(data['properties']['parameter']['WS2M'].values())[0]
-            precip = list(data['properties']['parameter']['PRECTOTCORR'].values())[0]
-            solar = list(data['properties']['parameter']['ALLSKY_SFC_SW_DWN'].values())[0]
+            series = data['properties']['parameter']
+            result = {}
+            for parameter, feature in POWER_PARAMETERS.items():
+                values = [v for _, v in sorted(series[parameter].items()) if v != FILL_VALUE]
+                if values:
+                    result[feature] = values[-1]
         except Exception:
             return {}
-        return {
-            'nasa_temperature': temp,
-            'nasa_wind_speed': wind,
-            'nasa_precipitation': precip,
-            'nasa_solar_radiation': solar
-        } 
\ No newline at end of file
+        return result
@@ -0,0 +1,192 @@
+"""
+Columnar local store for NASA POWER daily history.
+
+backfill() pulls multi-year date ranges for a location in chunked requests and writes
+one .npy file per variable (plus dates.npy) under a directory per POWER grid cell.
+Reads memory-map those files, so point-in-time and range queries are served from
+disk without calling the API.
+
+Usage:
+    python -m data_sources.nasa_power_store 35.47 -97.52 --start 2015-01-01 --end 2024-12-31
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from .http_session import session
+
+POWER_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+
+# POWER parameter -> feature name returned by NASAPowerSource
+POWER_PARAMETERS = {
+    'T2M': 'nasa_temperature',
+    'WS2M': 'nasa_wind_speed',
+    'PRECTOTCORR': 'nasa_precipitation',
+    'ALLSKY_SFC_SW_DWN': 'nasa_solar_radiation',
+}
+
+# POWER marks missing days with -999
+FILL_VALUE = -999.0
+
+# Native resolution of the POWER meteorology grid (degrees)
+GRID_LAT_STEP = 0.5
+GRID_LON_STEP = 0.625
+
+DEFAULT_STORE_DIR = os.getenv('NASA_POWER_STORE', os.path.join('data', 'nasa_power'))
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).replace('-', ''), '%Y%m%d').date()
+
+
+class NASAPowerStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, chunk_days=366, timeout=60):
+        self.root = root
+        self.chunk_days = chunk_days
+        self.timeout = timeout
+        self._cache = {}  # cell directory -> (dates, {parameter: array}), memory-mapped
+
+    def grid_cell(self, lat, lon):
+        """Snap a location to the POWER grid so nearby points share one series"""
+        return (round(round(lat / GRID_LAT_STEP) * GRID_LAT_STEP, 3),
+                round(round(lon / GRID_LON_STEP) * GRID_LON_STEP, 3))
+
+    def _cell_dir(self, lat, lon):
+        cell_lat, cell_lon = self.grid_cell(lat, lon)
+        return os.path.join(self.root, f"{cell_lat:.3f}_{cell_lon:.3f}")
+
+    def has_location(self, lat, lon):
+        return os.path.exists(os.path.join(self._cell_dir(lat, lon), 'dates.npy'))
+
+    def _fetch_chunk(self, lat, lon, start, end):
+        params = {
+            'parameters': ','.join(POWER_PARAMETERS),
+            'community': 'RE',
+            'latitude': lat,
+            'longitude': lon,
+            'format': 'JSON',
+            'start': start.strftime('%Y%m%d'),
+            'end': end.strftime('%Y%m%d'),
+        }
+        resp = session.get(POWER_URL, params=params, timeout=self.timeout)
+        resp.raise_for_status()
+        series = resp.json()['properties']['parameter']
+        days = sorted(series[next(iter(POWER_PARAMETERS))].keys())
+        dates = np.array([datetime.strptime(d, '%Y%m%d').date() for d in days], dtype='datetime64[D]')
+        columns = {}
+        for parameter in POWER_PARAMETERS:
+            values = np.array([series[parameter].get(d, FILL_VALUE) for d in days], dtype=np.float32)
+            values[values == FILL_VALUE] = np.nan
+            columns[parameter] = values
+        return dates, columns
+
+    def backfill(self, lat, lon, start, end):
+        """Download [start, end] for a location in chunks and merge it into the store"""
+        start, end = _to_date(start), _to_date(end)
+        cell_lat, cell_lon = self.grid_cell(lat, lon)
+        chunk_dates, chunk_columns = [], {p: [] for p in POWER_PARAMETERS}
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, chunk_start + timedelta(days=self.chunk_days - 1))
+            print(f"Fetching NASA POWER {chunk_start} to {chunk_end} for ({cell_lat}, {cell_lon})")
+            try:
+                dates, columns = self._fetch_chunk(cell_lat, cell_lon, chunk_start, chunk_end)
+                chunk_dates.append(dates)
+                for parameter, values in columns.items():
+                    chunk_columns[parameter].append(values)
+            except Exception as e:
+                print(f"Error fetching NASA POWER chunk {chunk_start} to {chunk_end}: {str(e)}")
+            chunk_start = chunk_end + timedelta(days=1)
+
+        if not chunk_dates:
+            return 0
+        new_dates = np.concatenate(chunk_dates)
+        new_columns = {p: np.concatenate(v) for p, v in chunk_columns.items()}
+        self._merge_and_write(lat, lon, new_dates, new_columns)
+        return len(new_dates)
+
+    def _merge_and_write(self, lat, lon, new_dates, new_columns):
+        cell_dir = self._cell_dir(lat, lon)
+        os.makedirs(cell_dir, exist_ok=True)
+        existing = self.load(lat, lon)
+        if existing is not None:
+            old_dates, old_columns = existing
+            # New rows go first so np.unique keeps them over older copies of the same day
+            dates = np.concatenate([new_dates, np.asarray(old_dates)])
+            columns = {p: np.concatenate([new_columns[p], np.asarray(old_columns[p])]) for p in POWER_PARAMETERS}
+        else:
+            dates, columns = new_dates, new_columns
+        dates, keep = np.unique(dates, return_index=True)
+        self._cache.pop(cell_dir, None)
+        for parameter in POWER_PARAMETERS:
+            self._write_array(cell_dir, parameter, columns[parameter][keep])
+        # dates.npy is written last; its presence marks the cell as complete
+        self._write_array(cell_dir, 'dates', dates)
+
+    def _write_array(self, cell_dir, name, values):
+        path = os.path.join(cell_dir, f"{name}.npy")
+        tmp_path = os.path.join(cell_dir, f"{name}.tmp.npy")
+        np.save(tmp_path, values)
+        os.replace(tmp_path, path)
+
+    def load(self, lat, lon):
+        """Return (dates, {parameter: values}) memory-mapped from disk, or None"""
+        cell_dir = self._cell_dir(lat, lon)
+        if cell_dir in self._cache:
+            return self._cache[cell_dir]
+        if not self.has_location(lat, lon):
+            return None
+        dates = np.load(os.path.join(cell_dir, 'dates.npy'), mmap_mode='r')
+        columns = {p: np.load(os.path.join(cell_dir, f"{p}.npy"), mmap_mode='r') for p in POWER_PARAMETERS}
+        self._cache[cell_dir] = (dates, columns)
+        return dates, columns
+
+    def get_range(self, lat, lon, start, end):
+        """All stored days in [start, end] as {'date': ..., feature_name: array}"""
+        stored = self.load(lat, lon)
+        if stored is None:
+            return None
+        dates, columns = stored
+        lo = np.searchsorted(dates, np.datetime64(_to_date(start), 'D'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(_to_date(end), 'D'), side='right')
+        result = {'date': dates[lo:hi]}
+        for parameter, feature in POWER_PARAMETERS.items():
+            result[feature] = columns[parameter][lo:hi]
+        return result
+
+    def get(self, lat, lon, when=None, max_age_days=None):
+        """
+        Most recent stored day on or before `when` (default today) as a feature dict.
+        With max_age_days, days older than that relative to `when` are not returned.
+        """
+        stored = self.load(lat, lon)
+        if stored is None:
+            return None
+        dates, columns = stored
+        when = _to_date(when or date.today())
+        idx = np.searchsorted(dates, np.datetime64(when, 'D'), side='right') - 1
+        if idx < 0:
+            return None
+        if max_age_days is not None and (np.datetime64(when, 'D') - dates[idx]).astype(int) > max_age_days:
+            return None
+        return {feature: float(columns[parameter][idx]) for parameter, feature in POWER_PARAMETERS.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill NASA POWER daily history into the local store")
+    parser.add_argument('lat', type=float)
+    parser.add_argument('lon', type=float)
+    parser.add_argument('--start', required=True, help="YYYY-MM-DD")
+    parser.add_argument('--end', default=(date.today() - timedelta(days=1)).isoformat(), help="YYYY-MM-DD")
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--chunk-days', type=int, default=366)
+    args = parser.parse_args()
+
+    store = NASAPowerStore(args.store, chunk_days=args.chunk_days)
+    n_days = store.backfill(args.lat, args.lon, args.start, args.end)
+    print(f"Stored {n_days} days for {store.grid_cell(args.lat, args.lon)} in {args.store}")
@@ -0,0 +1,149 @@
+"""
+Compact weather observation records.
+
+Observation is a __slots__ record for a single reading; batches of readings are
+NumPy structured arrays with OBSERVATION_DTYPE, so scoring and forecasting can work
+column-wise without allocating a nested dict per row. Temperatures are in Kelvin,
+matching what OpenWeatherMap returns by default.
+
+from_owm()/to_owm() convert to and from the legacy OpenWeatherMap dict shape
+(weather_data['main']['temp'], weather_data['wind']['speed'], ...).
+"""
+import math
+
+import numpy as np
+
+OBSERVATION_FIELDS = ('lat', 'lon', 'time', 'temp', 'humidity', 'pressure',
+                      'wind_speed', 'wind_deg', 'clouds', 'rain_1h')
+
+OBSERVATION_DTYPE = np.dtype([
+    ('lat', 'f8'),
+    ('lon', 'f8'),
+    ('time', 'i8'),        # Unix seconds
+    ('temp', 'f8'),        # Kelvin
+    ('humidity', 'f8'),    # %
+    ('pressure', 'f8'),    # hPa
+    ('wind_speed', 'f8'),  # m/s
+    ('wind_deg', 'f8'),
+    ('clouds', 'f8'),      # % cloud cover
+    ('rain_1h', 'f8'),     # mm
+])
+
+
+class Observation:
+    __slots__ = OBSERVATION_FIELDS + ('mock', 'stale')
+
+    def __init__(self, temp, humidity, pressure, wind_speed, wind_deg=0.0, clouds=0.0,
+                 rain_1h=0.0, lat=math.nan, lon=math.nan, time=0, mock=False, stale=False):
+        self.lat = lat
+        self.lon = lon
+        self.time = time
+        self.temp = temp
+        self.humidity = humidity
+        self.pressure = pressure
+        self.wind_speed = wind_speed
+        self.wind_deg = wind_deg
+        self.clouds = clouds
+        self.rain_1h = rain_1h
+        self.mock = mock
+        # Last known good reading served while the upstream is unavailable
+        self.stale = stale
+
+    @property
+    def temp_c(self):
+        return self.temp - 273.15
+
+    @property
+    def has_coordinates(self):
+        return not (math.isnan(self.lat) or math.isnan(self.lon))
+
+    @classmethod
+    def from_owm(cls, data):
+        """Build an observation from an OpenWeatherMap current-weather dict (Kelvin)"""
+        coord = data.get('coord') or {}
+        return cls(
+            temp=data['main']['temp'],
+            humidity=data['main']['humidity'],
+            pressure=data['main']['pressure'],
+            wind_speed=data['wind']['speed'],
+            wind_deg=data['wind'].get('deg', 0.0),
+            clouds=(data.get('clouds') or {}).get('all', 0.0),
+            rain_1h=(data.get('rain') or {}).get('1h', 0.0),
+            lat=coord.get('lat', math.nan),
+            lon=coord.get('lon', math.nan),
+            time=data.get('dt', 0),
+            mock=data.get('mock_data', False),
+            stale=data.get('stale_data', False),
+        )
+
+    def to_owm(self):
+        """Convert back to the legacy nested dict shape"""
+        data = {
+            'main': {'temp': self.temp, 'humidity': self.humidity, 'pressure': self.pressure},
+            'wind': {'speed': self.wind_speed, 'deg': self.wind_deg},
+            'clouds': {'all': self.clouds},
+            'rain': {'1h': self.rain_1h},
+            'dt': self.time,
+        }
+        if self.has_coordinates:
+            data['coord'] = {'lat': self.lat, 'lon': self.lon}
+        if self.mock:
+            data['mock_data'] = True
+        if self.stale:
+            data['stale_data'] = True
+        return data
+
+    def copy(self):
+        return Observation(self.temp, self.humidity, self.pressure, self.wind_speed, self.wind_deg,
+                           self.clouds, self.rain_1h, self.lat, self.lon, self.time, self.mock, self.stale)
+
+    def to_record(self):
+        return tuple(getattr(self, f) for f in OBSERVATION_FIELDS)
+
+    def __repr__(self):
+        return (f"Observation(lat={self.lat}, lon={self.lon}, temp={self.temp:.2f}K, "
+                f"humidity={self.humidity}, pressure={self.pressure}, wind_speed={self.wind_speed})")
+
+
+def as_observation(weather):
+    """Accept an Observation or a legacy OpenWeatherMap dict"""
+    if isinstance(weather, Observation):
+        return weather
+    return Observation.from_owm(weather)
+
+
+def empty_batch(n):
+    batch = np.zeros(n, dtype=OBSERVATION_DTYPE)
+    batch['lat'] = np.nan
+    batch['lon'] = np.nan
+    return batch
+
+
+def to_batch(observations):
+    """Structured array from one or more Observations / legacy dicts"""
+    if isinstance(observations, np.ndarray) and observations.dtype == OBSERVATION_DTYPE:
+        return observations
+    if isinstance(observations, (Observation, dict)):
+        observations = [observations]
+    return np.array([as_observation(o).to_record() for o in observations], dtype=OBSERVATION_DTYPE)
+
+
+def batch_from_columns(n=None, **columns):
+    """Structured array from column arrays; fields not given are left at zero (NaN for lat/lon)"""
+    if n is None:
+        n = len(next(iter(columns.values())))
+    batch = empty_batch(n)
+    for name, values in columns.items():
+        batch[name] = values
+    return batch
+
+
+def batch_row(batch, i):
+    """Observation for row i of a batch"""
+    row = batch[i]
+    return Observation(**{f: row[f].item() for f in OBSERVATION_FIELDS})
+
+
+def batch_to_owm(batch):
+    """Legacy dicts for every row of a batch"""
+    return [batch_row(batch, i).to_owm() for i in range(len(batch))]
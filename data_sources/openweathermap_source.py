@@ -1,22 +1,49 @@
-import requests
+from .http_session import session
 from .base import DataSourceBase
+from .observation import Observation
+from .resilience import StaleWhileRevalidate, UpstreamError
 
 class OpenWeatherMapSource(DataSourceBase):
     def __init__(self, api_key):
         self.api_key = api_key
+        # Shares the 'openweathermap' breaker with the app's own weather lookups
+        self.cache = StaleWhileRevalidate('openweathermap', fresh_ttl=600)
 
-    def fetch(self, location, disaster_type):
-        # For simplicity, location is a tuple (lat, lon)
-        lat, lon = location
+    def _request(self, lat, lon):
         url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={self.api_key}&units=metric"
-        resp = requests.get(url)
+        resp = session.get(url, timeout=10)
         if resp.status_code != 200:
+            raise UpstreamError(f"OpenWeatherMap returned status {resp.status_code}", resp.status_code)
+        return resp.json()
+
+    def _get(self, location):
+        # For simplicity, location is a tuple (lat, lon)
+        lat, lon = location
+        try:
+            data, stale = self.cache.get((round(lat, 2), round(lon, 2)), lambda: self._request(lat, lon))
+        except Exception as e:
+            print(f"Error fetching OpenWeatherMap data: {str(e)}")
+            return None
+        return dict(data, stale_data=True) if stale else data
+
+    def fetch_observation(self, location):
+        data = self._get(location)
+        if data is None:
+            return None
+        obs = Observation.from_owm(data)
+        obs.temp += 273.15  # Requested in metric units; observations are in Kelvin
+        obs.lat, obs.lon = location
+        return obs
+
+    def fetch(self, location, disaster_type):
+        data = self._get(location)
+        if data is None:
             return {}
-        data = resp.json()
         return {
             'temperature': data['main']['temp'],
             'humidity': data['main']['humidity'],
             'pressure': data['main']['pressure'],
             'wind_speed': data['wind']['speed'],
-            'wind_deg': data['wind'].get('deg', 0)
+            'wind_deg': data['wind'].get('deg', 0),
+            **({'stale': True} if data.get('stale_data') else {})
         } 
\ No newline at end of file
@@ -0,0 +1,229 @@
+"""
+Circuit breakers and stale-while-revalidate for upstream sources.
+
+Each upstream (OpenWeatherMap, NASA POWER, USGS, Nominatim) has a named
+CircuitBreaker. After `failure_threshold` consecutive failures it opens, and calls
+fail immediately with CircuitOpenError instead of waiting out a timeout. After
+`reset_timeout` seconds one trial call is let through (half-open), and it closes
+the breaker again if it succeeds. Only outages count as failures: timeouts,
+connection errors and 5xx/429 answers. An upstream that answers 401 or 404 is up.
+
+StaleWhileRevalidate keeps the last known good value per key. Fresh values are
+served directly. Values older than `fresh_ttl` but younger than `max_stale` are
+served while a background refresh runs. A value is flagged stale only when it is
+served because the upstream failed or the breaker is open.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))
+
+
+class UpstreamError(Exception):
+    """An upstream answered, but not with usable data"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def outage(self):
+        """Whether the answer means the upstream is unavailable (5xx or rate limited)"""
+        return self.status is not None and (self.status >= 500 or self.status == 429)
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit is open; retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+_OUTAGE_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                  GeocoderTimedOut, GeocoderUnavailable, GeocoderRateLimited)
+
+
+def is_outage(exc):
+    """Whether an exception from an upstream call should count against its breaker"""
+    if isinstance(exc, UpstreamError):
+        return exc.outage
+    return isinstance(exc, _OUTAGE_ERRORS)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def allow(self):
+        """Whether a call may go upstream now; raises CircuitOpenError otherwise"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"Circuit breaker for {self.name} opened after {self.failures} failure(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        self.allow()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            # The upstream answered (e.g. 401/404): it is up, the request was wrong
+            if is_outage(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'name': self.name, 'state': self.state, 'failures': self.failures,
+                    'rejected': self.rejected}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Process-wide breaker for an upstream, created on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+
+def breaker_stats():
+    with _breakers_lock:
+        return [breaker.stats() for breaker in _breakers.values()]
+
+
+class StaleWhileRevalidate:
+    def __init__(self, name, breaker=None, fresh_ttl=600, max_stale=6 * 3600, max_entries=10000):
+        self.name = name
+        self.breaker = breaker or get_breaker(name)
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._refreshing = set()
+        self._failed = set()  # keys whose last refresh failed
+        self.stale_served = 0
+        self.revalidated = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._failed.discard(evicted)
+
+    def _fetch(self, key, fetch):
+        try:
+            value = self.breaker.call(fetch)
+        except Exception:
+            with self._lock:
+                if key in self._entries:
+                    self._failed.add(key)
+            raise
+        self.put(key, value)
+        with self._lock:
+            self._failed.discard(key)
+        return value
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self._fetch(key, fetch)
+            except Exception as e:
+                print(f"Background refresh of {self.name} {key} failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f'{self.name}-refresh', daemon=True).start()
+
+    def get(self, key, fetch):
+        """
+        (value, stale) for `key`. `fetch()` must return a value or raise. `stale` is
+        True only when the value is a fallback for a failed fetch or an open breaker.
+        Raises only when there is no last known good value to fall back on.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age <= self.fresh_ttl:
+                return value, False
+            if age <= self.max_stale:
+                with self._lock:
+                    failed = key in self._failed
+                self._refresh_in_background(key, fetch)
+                if failed or self.breaker.state != CircuitBreaker.CLOSED:
+                    self.stale_served += 1
+                    return value, True
+                # Upstream is healthy; this is the normal refresh, not a fallback
+                self.revalidated += 1
+                return value, False
+        try:
+            return self._fetch(key, fetch), False
+        except Exception:
+            if entry is None:
+                raise
+            # Upstream is down: an old answer for the right place beats none
+            self.stale_served += 1
+            return entry[0], True
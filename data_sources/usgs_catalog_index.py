@@ -0,0 +1,191 @@
+"""
+Local spatio-temporal index of the USGS earthquake catalog.
+
+The ingest job loads catalog dumps (GeoJSON FeatureCollections or the USGS CSV
+export) into time-sorted arrays plus a haversine BallTree and saves them to disk.
+Radius and time-window queries such as "all M3+ within 200 km in the last 30 days"
+are then answered locally without a network call.
+
+Usage:
+    python -m data_sources.usgs_catalog_index dumps/all_month.geojson dumps/2000-2024.csv
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+DEFAULT_INDEX_DIR = os.getenv('USGS_CATALOG_INDEX', os.path.join('data', 'usgs'))
+
+# Below this many events in the time window it is cheaper to scan the slice
+# directly than to walk the tree and filter
+_SCAN_THRESHOLD = 4096
+
+_COLUMNS = ['time', 'lat', 'lon', 'depth', 'mag']
+
+
+def read_catalog(path):
+    """Read a USGS GeoJSON or CSV dump into a DataFrame with id, time (ms), lat, lon, depth, mag"""
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path)
+        return pd.DataFrame({
+            'id': df['id'].astype(str),
+            'time': pd.to_datetime(df['time'], utc=True).astype('int64') // 1_000_000,
+            'lat': df['latitude'],
+            'lon': df['longitude'],
+            'depth': df['depth'],
+            'mag': df['mag'],
+        })
+
+    with open(path) as f:
+        features = json.load(f)['features']
+    rows = []
+    for feature in features:
+        props = feature['properties']
+        lon, lat, depth = (feature['geometry']['coordinates'] + [0, 0, 0])[:3]
+        rows.append((feature.get('id'), props.get('time'), lat, lon, depth, props.get('mag')))
+    return pd.DataFrame(rows, columns=['id'] + _COLUMNS)
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = (np.sin((lats - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class USGSCatalogIndex:
+    def __init__(self, ids, times, lats, lons, depths, mags, tree=None):
+        self.ids = ids
+        self.times = times
+        self.lats = lats
+        self.lons = lons
+        self.depths = depths
+        self.mags = mags
+        self.tree = tree if tree is not None else BallTree(
+            np.radians(np.column_stack([lats, lons])), metric='haversine'
+        )
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.dropna(subset=['time', 'lat', 'lon'])
+        df = df.drop_duplicates(subset='id', keep='last').sort_values('time', kind='stable')
+        return cls(
+            df['id'].to_numpy(dtype=str),
+            df['time'].to_numpy(dtype=np.int64),
+            df['lat'].to_numpy(dtype=np.float64),
+            df['lon'].to_numpy(dtype=np.float64),
+            df['depth'].fillna(0).to_numpy(dtype=np.float32),
+            df['mag'].fillna(0).to_numpy(dtype=np.float32),
+        )
+
+    @classmethod
+    def ingest(cls, paths, existing=None):
+        """Build an index from catalog dumps, merged with an existing index if given"""
+        frames = [read_catalog(p) for p in paths]
+        if existing is not None:
+            frames.insert(0, existing.to_frame())
+        return cls.from_frame(pd.concat(frames, ignore_index=True))
+
+    def to_frame(self):
+        return pd.DataFrame({'id': self.ids, 'time': self.times, 'lat': self.lats,
+                             'lon': self.lons, 'depth': self.depths, 'mag': self.mags})
+
+    def save(self, directory=DEFAULT_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+        for name in ['ids', 'times', 'lats', 'lons', 'depths', 'mags']:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, 'balltree.pkl'), 'wb') as f:
+            pickle.dump(self.tree, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory=DEFAULT_INDEX_DIR):
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+                  for name in ['times', 'lats', 'lons', 'depths', 'mags']}
+        ids = np.load(os.path.join(directory, 'ids.npy'))
+        with open(os.path.join(directory, 'balltree.pkl'), 'rb') as f:
+            tree = pickle.load(f)
+        return cls(ids, arrays['times'], arrays['lats'], arrays['lons'],
+                   arrays['depths'], arrays['mags'], tree=tree)
+
+    @classmethod
+    def load_if_exists(cls, directory=DEFAULT_INDEX_DIR):
+        if not os.path.exists(os.path.join(directory, 'balltree.pkl')):
+            return None
+        try:
+            return cls.load(directory)
+        except Exception as e:
+            print(f"Error loading USGS catalog index from {directory}: {str(e)}")
+            return None
+
+    def query(self, lat, lon, radius_km, start=None, end=None, min_magnitude=None):
+        """
+        Indices of events within radius_km of (lat, lon), optionally restricted to
+        [start, end] (epoch milliseconds) and magnitude >= min_magnitude.
+        Indices are in time order, so the last one is the most recent event.
+        """
+        lo = 0 if start is None else np.searchsorted(self.times, start, side='left')
+        hi = len(self.times) if end is None else np.searchsorted(self.times, end, side='right')
+        if hi <= lo:
+            return np.empty(0, dtype=np.intp)
+
+        if hi - lo <= _SCAN_THRESHOLD:
+            idx = np.arange(lo, hi)
+            idx = idx[haversine_km(lat, lon, self.lats[lo:hi], self.lons[lo:hi]) <= radius_km]
+        else:
+            point = np.radians([[lat, lon]])
+            idx = np.sort(self.tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM)[0])
+            idx = idx[(idx >= lo) & (idx < hi)]
+
+        if min_magnitude is not None:
+            idx = idx[self.mags[idx] >= min_magnitude]
+        return idx
+
+    def event(self, i):
+        return {
+            'id': str(self.ids[i]),
+            'time': int(self.times[i]),
+            'latitude': float(self.lats[i]),
+            'longitude': float(self.lons[i]),
+            'depth': float(self.depths[i]),
+            'magnitude': float(self.mags[i]),
+        }
+
+    def seismic_features(self, lat, lon, now_ms=None, radius_km=200, days=30, min_magnitude=3.0):
+        """Summary of recent activity around a location, for use as model features"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        idx = self.query(lat, lon, radius_km, start=now_ms - days * 86_400_000, end=now_ms,
+                         min_magnitude=min_magnitude)
+        if len(idx) == 0:
+            return {'recent_quake_count': 0, 'recent_max_magnitude': 0.0,
+                    'recent_energy_index': 0.0, 'days_since_last_quake': None}
+        mags = np.asarray(self.mags[idx], dtype=np.float64)
+        return {
+            'recent_quake_count': int(len(idx)),
+            'recent_max_magnitude': float(mags.max()),
+            # Radiated energy grows as 10^(1.5 M); summing it weights big events properly
+            'recent_energy_index': float(np.log10(np.sum(10 ** (1.5 * mags))) / 1.5),
+            'days_since_last_quake': (now_ms - int(self.times[idx[-1]])) / 86_400_000,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest USGS catalog dumps into the local index")
+    parser.add_argument('paths', nargs='+', help="GeoJSON or CSV catalog dumps")
+    parser.add_argument('--index', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the existing index instead of merging")
+    args = parser.parse_args()
+
+    existing = None if args.rebuild else USGSCatalogIndex.load_if_exists(args.index)
+    index = USGSCatalogIndex.ingest(args.paths, existing=existing)
+    index.save(args.index)
+    print(f"Indexed {len(index)} events in {args.index}")
@@ -1,25 +1,56 @@
-import requests
+from .http_session import session
 from .base import DataSourceBase
+from .resilience import StaleWhileRevalidate, UpstreamError
 
 class USGSEarthquakeSource(DataSourceBase):
+    def __init__(self, index=None):
+        # Optional local USGSCatalogIndex; when present no live FDSN query is made
+        self.index = index
+        # Recent-quake answers change slowly; the last one is served while USGS is down
+        self.cache = StaleWhileRevalidate('usgs', fresh_ttl=900)
+
     def fetch(self, location, disaster_type):
         # Only fetch if disaster_type is earthquake
         if disaster_type != 'earthquake':
             return {}
         lat, lon = location
+        if self.index is not None:
+            return self._fetch_from_index(lat, lon)
+        try:
+            data, stale = self.cache.get((round(lat, 2), round(lon, 2)), lambda: self._query(lat, lon))
+        except Exception as e:
+            print(f"Error fetching USGS data: {str(e)}")
+            return {}
+        return dict(data, stale=True) if stale and data else data
+
+    def _query(self, lat, lon):
         url = (
             f"https://earthquake.usgs.gov/fdsnws/event/1/query?format=geojson"
             f"&latitude={lat}&longitude={lon}&maxradiuskm=100&limit=1&orderby=time"
         )
-        resp = requests.get(url)
+        resp = session.get(url, timeout=30)
         if resp.status_code != 200:
-            return {}
+            raise UpstreamError(f"USGS returned status {resp.status_code}", resp.status_code)
         data = resp.json()
         if not data['features']:
             return {}
         quake = data['features'][0]['properties']
+        coordinates = data['features'][0].get('geometry', {}).get('coordinates', [])
         return {
             'magnitude': quake.get('mag', 0),
-            'depth': quake.get('depth', 0),
+            'depth': coordinates[2] if len(coordinates) > 2 else 0,
             'time': quake.get('time', 0)
-        } 
\ No newline at end of file
+        }
+
+    def _fetch_from_index(self, lat, lon):
+        data = self.index.seismic_features(lat, lon)
+        # Latest quake within 100 km, same as the live query
+        nearby = self.index.query(lat, lon, 100)
+        if len(nearby):
+            quake = self.index.event(nearby[-1])
+            data.update({
+                'magnitude': quake['magnitude'],
+                'depth': quake['depth'],
+                'time': quake['time']
+            })
+        return data
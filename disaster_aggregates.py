@@ -0,0 +1,314 @@
+"""
+Materialized global-disaster aggregates.
+
+Event catalogs are ingested from local files: USGS earthquake dumps (GeoJSON or the
+CSV export) and generic event files (CSV or JSON records with type, time, lat, lon
+and optional id, title, magnitude, source). Each new event is folded into rollups
+keyed by (disaster type, region, granularity, period) at the time it is ingested:
+
+  day    2024-05-20
+  month  2024-05
+  year   2024
+
+Each rollup holds an event count and the largest magnitude. A bounded table of
+the most recent events per type backs the dashboard list. Events are de-duplicated
+by id, so re-ingesting a file that has grown only adds its new events. Dashboard
+queries read the rollup and recent tables only; raw events are never scanned.
+
+Everything lives in one SQLite file (DISASTER_AGGREGATES_PATH, WAL mode) shared by
+all gunicorn workers. refresh() ingests files in DISASTER_EVENTS_DIR that are new or
+changed since the last ingest. It runs every DISASTER_REFRESH_SECONDS in a background
+thread (start_refresher()) or from cron via this script, never inside a request.
+
+Usage:
+    python disaster_aggregates.py dumps/all_month.geojson events/floods.csv
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from data_sources.usgs_catalog_index import read_catalog
+
+DISASTER_AGGREGATES_PATH = os.getenv('DISASTER_AGGREGATES_PATH', os.path.join('data', 'disaster_aggregates.sqlite'))
+DISASTER_EVENTS_DIR = os.getenv('DISASTER_EVENTS_DIR', os.path.join('data', 'events'))
+DISASTER_REFRESH_SECONDS = int(os.getenv('DISASTER_REFRESH_SECONDS', 60))
+RECENT_PER_TYPE = int(os.getenv('DISASTER_RECENT_PER_TYPE', 50))
+
+GRANULARITIES = {'day': '%Y-%m-%d', 'month': '%Y-%m', 'year': '%Y'}
+
+# Coarse continental boxes, checked in order; anything else is 'Oceans'
+REGIONS = [
+    ('Antarctica', -90, -60, -180, 180),
+    ('North America', 7, 84, -170, -50),
+    ('South America', -60, 13, -93, -30),
+    ('Europe', 35, 72, -25, 45),
+    ('Africa', -36, 38, -20, 52),
+    ('Asia', -11, 82, 45, 180),
+    ('Oceania', -50, -11, 110, 180),
+]
+
+TYPE_ALIASES = {'wildfire': 'fire', 'quake': 'earthquake', 'floods': 'flood', 'tornadoes': 'tornado'}
+
+
+def region_of(lats, lons):
+    """Region name for every (lat, lon) pair"""
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    conditions = [(lats >= s) & (lats <= n) & (lons >= w) & (lons <= e) for _, s, n, w, e in REGIONS]
+    return np.select(conditions, [name for name, *_ in REGIONS], default='Oceans')
+
+
+def read_usgs(path):
+    """USGS dump as normalized events"""
+    df = read_catalog(path)
+    return pd.DataFrame({
+        'id': 'usgs:' + df['id'].astype(str),
+        'type': 'earthquake',
+        'time': df['time'],
+        'lat': df['lat'],
+        'lon': df['lon'],
+        'magnitude': df['mag'],
+        'title': [f"M {mag:.1f} Earthquake" for mag in df['mag'].astype(float)],
+        'source': 'USGS',
+    })
+
+
+def read_events(path):
+    """Generic event file (CSV or JSON list of records) as normalized events"""
+    if path.lower().endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        with open(path) as f:
+            df = pd.DataFrame(json.load(f))
+    source = os.path.splitext(os.path.basename(path))[0]
+    types = df['type'].astype(str).str.lower().replace(TYPE_ALIASES)
+    times = pd.to_datetime(df['time'], utc=True, format='mixed').astype('int64') // 1_000_000
+    ids = df['id'].astype(str) if 'id' in df else (types + ':' + times.astype(str) + ':'
+                                                    + df['lat'].round(3).astype(str) + ':'
+                                                    + df['lon'].round(3).astype(str))
+    return pd.DataFrame({
+        'id': source + ':' + ids,
+        'type': types,
+        'time': times,
+        'lat': df['lat'].astype(float),
+        'lon': df['lon'].astype(float),
+        'magnitude': df['magnitude'].astype(float) if 'magnitude' in df else np.nan,
+        'title': df['title'].astype(str) if 'title' in df else types.str.capitalize(),
+        'source': df['source'].astype(str) if 'source' in df else source,
+    })
+
+
+def read_event_file(path):
+    """USGS dumps are .geojson files or files named usgs*; anything else is a generic event file"""
+    name = os.path.basename(path).lower()
+    if name.endswith('.geojson') or name.startswith('usgs'):
+        return read_usgs(path)
+    return read_events(path)
+
+
+class DisasterAggregates:
+    def __init__(self, path=DISASTER_AGGREGATES_PATH, events_dir=DISASTER_EVENTS_DIR,
+                 recent_per_type=RECENT_PER_TYPE):
+        self.path = path
+        self.events_dir = events_dir
+        self.recent_per_type = recent_per_type
+        self._local = threading.local()
+        self._refresh_lock = threading.Lock()
+        self._refresher = None
+        self._init_db()
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.executescript("""
+            CREATE TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS rollups (
+                type TEXT NOT NULL, region TEXT NOT NULL, granularity TEXT NOT NULL,
+                period TEXT NOT NULL, count INTEGER NOT NULL, max_magnitude REAL,
+                PRIMARY KEY (type, region, granularity, period)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS recent (
+                id TEXT PRIMARY KEY, type TEXT NOT NULL, time INTEGER NOT NULL, lat REAL, lon REAL,
+                magnitude REAL, title TEXT, source TEXT, region TEXT);
+            CREATE INDEX IF NOT EXISTS recent_type_time ON recent (type, time);
+            CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime REAL, size INTEGER);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # --- ingest ----------------------------------------------------------------
+
+    def ingest(self, events):
+        """Fold normalized events into the rollups; returns how many were new"""
+        events = events.dropna(subset=['id', 'type', 'time', 'lat', 'lon'])
+        events = events.drop_duplicates(subset='id')
+        if events.empty:
+            return 0
+        db = self._db()
+        with db:
+            # BEGIN IMMEDIATE: concurrent ingests serialize instead of double counting
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (id TEXT PRIMARY KEY)")
+            db.execute("DELETE FROM incoming")
+            db.executemany("INSERT INTO incoming VALUES (?)", ((i,) for i in events['id']))
+            known = {row[0] for row in db.execute("SELECT id FROM incoming JOIN seen USING (id)")}
+            new = events[~events['id'].isin(known)].copy()
+            if new.empty:
+                return 0
+            db.executemany("INSERT INTO seen VALUES (?)", ((i,) for i in new['id']))
+
+            new['region'] = region_of(new['lat'], new['lon'])
+            moments = pd.to_datetime(new['time'], unit='ms', utc=True)
+            for granularity, fmt in GRANULARITIES.items():
+                new['period'] = moments.dt.strftime(fmt)
+                grouped = new.groupby(['type', 'region', 'period'], sort=False)['magnitude'].agg(['size', 'max'])
+                db.executemany(
+                    "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (type, region, granularity, period) DO UPDATE SET "
+                    "count = count + excluded.count, "
+                    "max_magnitude = max(coalesce(max_magnitude, excluded.max_magnitude), "
+                    "coalesce(excluded.max_magnitude, max_magnitude))",
+                    ((t, r, granularity, p, int(size), None if pd.isna(mx) else float(mx))
+                     for (t, r, p), size, mx in zip(grouped.index, grouped['size'], grouped['max'])))
+
+            latest = new.sort_values('time').groupby('type').tail(self.recent_per_type)
+            db.executemany(
+                "INSERT OR REPLACE INTO recent VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((r.id, r.type, int(r.time), float(r.lat), float(r.lon),
+                  None if pd.isna(r.magnitude) else float(r.magnitude), r.title, r.source, r.region)
+                 for r in latest.itertuples()))
+            for disaster in latest['type'].unique():
+                db.execute("DELETE FROM recent WHERE type = ? AND id NOT IN "
+                           "(SELECT id FROM recent WHERE type = ? ORDER BY time DESC LIMIT ?)",
+                           (disaster, disaster, self.recent_per_type))
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('updated', ?)", (str(time.time()),))
+        return len(new)
+
+    def ingest_file(self, path):
+        added = self.ingest(read_event_file(path))
+        stat = os.stat(path)
+        db = self._db()
+        with db:
+            db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                       (os.path.abspath(path), stat.st_mtime, stat.st_size))
+        return added
+
+    def refresh(self):
+        """Ingest new or changed files from events_dir"""
+        if not self.events_dir or not os.path.isdir(self.events_dir):
+            return 0
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            known = {path: (mtime, size) for path, mtime, size in
+                     self._db().execute("SELECT path, mtime, size FROM files")}
+            added = 0
+            for name in sorted(os.listdir(self.events_dir)):
+                path = os.path.join(self.events_dir, name)
+                if not name.lower().endswith(('.csv', '.json', '.geojson')):
+                    continue
+                stat = os.stat(path)
+                if known.get(os.path.abspath(path)) == (stat.st_mtime, stat.st_size):
+                    continue
+                try:
+                    added += self.ingest_file(path)
+                except Exception as e:
+                    print(f"Error ingesting disaster events from {path}: {str(e)}")
+            return added
+        finally:
+            self._refresh_lock.release()
+
+    def start_refresher(self, interval=DISASTER_REFRESH_SECONDS):
+        """Run refresh() every `interval` seconds in a daemon thread; 0 leaves it to cron"""
+        if interval <= 0 or self._refresher is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Error refreshing disaster aggregates: {str(e)}")
+                time.sleep(interval)
+
+        self._refresher = threading.Thread(target=run, name='disaster-aggregates', daemon=True)
+        self._refresher.start()
+
+    # --- queries ---------------------------------------------------------------
+
+    def rollups(self, granularity='month', since=None, disaster=None, region=None):
+        """Rollup rows as dicts, oldest period first; `since` is an inclusive period string"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        query = "SELECT type, region, period, count, max_magnitude FROM rollups WHERE granularity = ?"
+        params = [granularity]
+        for column, value, op in (('period', since, '>='), ('type', disaster, '='), ('region', region, '=')):
+            if value is not None:
+                query += f" AND {column} {op} ?"
+                params.append(value)
+        rows = self._db().execute(query + " ORDER BY period", params).fetchall()
+        return [{'type': t, 'region': r, 'period': p, 'count': c, 'max_magnitude': m}
+                for t, r, p, c, m in rows]
+
+    def recent(self, limit=50, disaster=None):
+        query = "SELECT id, type, time, lat, lon, magnitude, title, source, region FROM recent"
+        params = []
+        if disaster is not None:
+            query += " WHERE type = ?"
+            params.append(disaster)
+        rows = self._db().execute(query + " ORDER BY time DESC LIMIT ?", (*params, limit)).fetchall()
+        return [{'id': i, 'type': t.capitalize(), 'title': title,
+                 'date': datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat(),
+                 'coordinates': {'lat': lat, 'lon': lon}, 'magnitude': mag, 'source': source,
+                 'region': region}
+                for i, t, ms, lat, lon, mag, title, source, region in rows]
+
+    def updated(self):
+        row = self._db().execute("SELECT value FROM meta WHERE key = 'updated'").fetchone()
+        return float(row[0]) if row else None
+
+    def summary(self, days=30, limit=50):
+        """Dashboard payload: totals by type and region over the last `days` days, plus recent events"""
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime(GRANULARITIES['day'])
+        by_type, by_region = {}, {}
+        for row in self.rollups('day', since=since):
+            by_type[row['type']] = by_type.get(row['type'], 0) + row['count']
+            by_region[row['region']] = by_region.get(row['region'], 0) + row['count']
+        updated = self.updated()
+        return {
+            'days': days,
+            'total': sum(by_type.values()),
+            'by_type': by_type,
+            'by_region': by_region,
+            'disasters': self.recent(limit),
+            'updated': datetime.fromtimestamp(updated, timezone.utc).isoformat() if updated else None,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest disaster event files into the aggregate rollups")
+    parser.add_argument('paths', nargs='*', help="USGS dumps or generic event files")
+    parser.add_argument('--db', default=DISASTER_AGGREGATES_PATH)
+    args = parser.parse_args()
+
+    aggregates = DisasterAggregates(args.db)
+    for path in args.paths:
+        print(f"{path}: {aggregates.ingest_file(path)} new event(s)")
+    if not args.paths:
+        print(f"{aggregates.refresh()} new event(s) from {aggregates.events_dir}")
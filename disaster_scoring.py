@@ -0,0 +1,127 @@
+"""
+Vectorized rule-based disaster scorers.
+
+Each scorer takes a batch of observations (a structured array with
+data_sources.observation.OBSERVATION_DTYPE) and returns one probability per row.
+The scalar calculate_*_probability helpers in app.py are thin wrappers around these,
+and forecasts score every day in a single call.
+"""
+import numpy as np
+
+from data_sources.observation import to_batch
+
+_rng = np.random.default_rng()
+
+
+def _band_score(values, optimal, good, moderate):
+    """
+    1.0 inside the optimal band, 0.7 in the good bands, 0.4 in the moderate bands
+    and 0.1 elsewhere. good/moderate are ((lo, hi), (lo, hi)) pairs below/above optimal.
+    """
+    def inside(band, closed_low=True, closed_high=True):
+        lo, hi = band
+        above = values >= lo if closed_low else values > lo
+        below = values <= hi if closed_high else values < hi
+        return above & below
+
+    return np.select(
+        [
+            inside(optimal),
+            inside(good[0], closed_high=False) | inside(good[1], closed_low=False),
+            inside(moderate[0], closed_high=False) | inside(moderate[1], closed_low=False),
+        ],
+        [1.0, 0.7, 0.4],
+        default=0.1,
+    )
+
+
+def tornado_factor_scores(batch):
+    """Per-factor tornado suitability (0-1) for temperature, humidity, pressure and wind speed"""
+    batch = to_batch(batch)
+    return {
+        'temperature': _band_score(batch['temp'] - 273.15, (20, 30), ((15, 20), (30, 35)), ((10, 15), (35, 40))),
+        'humidity': _band_score(batch['humidity'], (60, 80), ((50, 60), (80, 90)), ((40, 50), (90, 95))),
+        'pressure': _band_score(batch['pressure'], (980, 1000), ((970, 980), (1000, 1010)), ((960, 970), (1010, 1020))),
+        'wind_speed': _band_score(batch['wind_speed'], (10, 20), ((7, 10), (20, 25)), ((5, 7), (25, 30))),
+    }
+
+
+def tornado_probability(batch, rng=None):
+    rng = rng or _rng
+    factors = tornado_factor_scores(batch)
+    total = (factors['temperature'] * 0.3 + factors['humidity'] * 0.3
+             + factors['pressure'] * 0.2 + factors['wind_speed'] * 0.2)
+    # Apply quantum-inspired adjustments (simulated quantum uncertainty)
+    quantum_factor = rng.uniform(0.9, 1.1, size=len(total))
+    return np.minimum(1.0, total * quantum_factor)
+
+
+def earthquake_probability(batch, rng=None):
+    rng = rng or _rng
+    batch = to_batch(batch)
+    # Sudden drops in pressure (especially below 990 hPa) can increase seismic activity
+    pressure_factor = np.clip((1013 - batch['pressure']) / 50, 0, 1)
+    humidity_factor = np.clip(batch['humidity'] / 100, 0, 1)
+    probability = (0.7 * pressure_factor + 0.3 * humidity_factor) * 0.6
+    probability += rng.uniform(-0.1, 0.1, size=len(batch))
+    return np.clip(probability, 0, 1)
+
+
+def fire_probability(batch, rng=None):
+    rng = rng or _rng
+    batch = to_batch(batch)
+    # Canadian Forest Fire Weather Index inspired factors
+    temp_factor = np.clip((batch['temp'] - 273.15 - 20) / 20, 0, 1)
+    humidity_factor = np.clip((100 - batch['humidity']) / 70, 0, 1)
+    wind_factor = np.clip(batch['wind_speed'] / 10, 0, 1)
+    probability = (0.4 * temp_factor + 0.4 * humidity_factor + 0.2 * wind_factor) * 0.8
+    probability += rng.uniform(-0.1, 0.1, size=len(batch))
+    return np.clip(probability, 0, 1)
+
+
+def flood_probability(batch, rng=None):
+    rng = rng or _rng
+    batch = to_batch(batch)
+    humidity_factor = np.clip((batch['humidity'] - 60) / 40, 0, 1)
+    pressure_factor = np.clip((1013 - batch['pressure']) / 30, 0, 1)
+    temp_factor = np.clip(1 - np.abs(batch['temp'] - 273.15 - 15) / 20, 0, 1)
+    probability = (0.4 * humidity_factor + 0.4 * pressure_factor + 0.2 * temp_factor) * 0.7
+    probability += rng.uniform(-0.1, 0.1, size=len(batch))
+    return np.clip(probability, 0, 1)
+
+
+SCORERS = {
+    'tornado': tornado_probability,
+    'earthquake': earthquake_probability,
+    'fire': fire_probability,
+    'wildfire': fire_probability,
+    'flood': flood_probability,
+}
+
+
+def score_all(batch, disasters=('tornado', 'earthquake', 'fire', 'flood'), rng=None):
+    """Score every disaster over a batch in one pass: {disaster: probabilities}"""
+    batch = to_batch(batch)
+    return {disaster: SCORERS[disaster](batch, rng) for disaster in disasters}
+
+
+def apply_trends(scores, batch, trends):
+    """
+    Adjust scores with observation-history trends (observation_history.TREND_DTYPE).
+    A falling barometer raises earthquake and flood risk, rising humidity raises flood
+    risk and recent strong wind raises fire risk. Rows without enough history
+    (NaN trends) are left unchanged.
+    """
+    batch = to_batch(batch)
+    falling = np.clip(-np.nan_to_num(trends['pressure_tendency']) / 2, 0, 1)  # 2 hPa/h is a sharp fall
+    moistening = np.clip(np.nan_to_num(trends['humidity_trend']) / 5, 0, 1)
+    gusts = np.clip(np.fmax(trends['max_wind_speed'], batch['wind_speed']) / 10, 0, 1)
+    adjustments = {
+        'earthquake': 0.1 * falling,
+        'flood': 0.1 * falling + 0.05 * moistening,
+        # Same weight as the wind term of fire_probability, using the window's strongest wind
+        'fire': 0.16 * (gusts - np.clip(batch['wind_speed'] / 10, 0, 1)),
+    }
+    adjustments['wildfire'] = adjustments['fire']
+    return {disaster: np.clip(np.asarray(probabilities, dtype=float) + adjustments.get(disaster, 0.0), 0, 1)
+            for disaster, probabilities in scores.items()}
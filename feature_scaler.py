@@ -0,0 +1,199 @@
+"""
+Fitted, persisted min-max normalization for the model input features.
+
+The scaler is fitted once (or updated incrementally with partial_fit while streaming
+over historical data), saved to disk and then applied as a vectorized transform, so
+normalizing a request is a constant-time lookup per feature rather than a refit.
+
+Usage:
+    python feature_scaler.py data/tornado_history.csv --chunksize 100000
+"""
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+FEATURE_NAMES = ['temperature', 'humidity', 'pressure', 'wind_speed', 'wind_deg']
+
+# Ranges used until the scaler has seen any data (typical tornado conditions,
+# temperature in Celsius). These match the ranges predict() used to hard-code.
+DEFAULT_FEATURE_RANGES = {
+    'temperature': (15.0, 45.0),
+    'humidity': (40.0, 80.0),
+    'pressure': (980.0, 1020.0),
+    'wind_speed': (0.0, 20.0),
+    'wind_deg': (0.0, 360.0),
+}
+
+DEFAULT_SCALER_PATH = os.getenv('FEATURE_SCALER_PATH', os.path.join('models', 'feature_scaler.npz'))
+
+
+class StreamingFeatureScaler:
+    def __init__(self, feature_names=FEATURE_NAMES):
+        self.feature_names = list(feature_names)
+        self._index = {name: i for i, name in enumerate(self.feature_names)}
+        self.reset()
+
+    def reset(self):
+        """Forget everything seen so far and go back to the default ranges"""
+        self.n_samples_seen = 0
+        self.data_min_ = np.array([DEFAULT_FEATURE_RANGES[f][0] for f in self.feature_names])
+        self.data_max_ = np.array([DEFAULT_FEATURE_RANGES[f][1] for f in self.feature_names])
+        self.mean_ = np.zeros(len(self.feature_names))
+        self.var_ = np.zeros(len(self.feature_names))
+        self._update_scale()
+
+    @property
+    def fitted(self):
+        return self.n_samples_seen > 0
+
+    def _update_scale(self):
+        data_range = self.data_max_ - self.data_min_
+        # Constant features map to 0 instead of dividing by zero
+        self.scale_ = np.where(data_range > 0, 1.0 / np.where(data_range > 0, data_range, 1.0), 0.0)
+
+    def partial_fit(self, X):
+        """Update the running min/max and mean/variance with a batch of rows"""
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got {X.shape[1]}")
+        X = X[~np.isnan(X).any(axis=1)]
+        n_batch = len(X)
+        if n_batch == 0:
+            return self
+
+        batch_min = X.min(axis=0)
+        batch_max = X.max(axis=0)
+        batch_mean = X.mean(axis=0)
+        batch_var = X.var(axis=0)
+
+        if self.n_samples_seen == 0:
+            self.data_min_, self.data_max_ = batch_min, batch_max
+            self.mean_, self.var_ = batch_mean, batch_var
+        else:
+            self.data_min_ = np.minimum(self.data_min_, batch_min)
+            self.data_max_ = np.maximum(self.data_max_, batch_max)
+            # Chan et al. parallel update of mean and variance
+            n_total = self.n_samples_seen + n_batch
+            delta = batch_mean - self.mean_
+            m2 = (self.var_ * self.n_samples_seen + batch_var * n_batch
+                  + delta ** 2 * self.n_samples_seen * n_batch / n_total)
+            self.mean_ = self.mean_ + delta * n_batch / n_total
+            self.var_ = m2 / n_total
+
+        self.n_samples_seen += n_batch
+        self._update_scale()
+        return self
+
+    def fit(self, X):
+        self.reset()
+        return self.partial_fit(X)
+
+    def fingerprint(self):
+        """
+        Hash of the fitted encoding (feature names and ranges). Artifacts trained on
+        scaled features record it, and are rejected when loaded under another scaler.
+        """
+        digest = hashlib.sha256(','.join(self.feature_names).encode())
+        digest.update(np.ascontiguousarray(self.data_min_, dtype=float).tobytes())
+        digest.update(np.ascontiguousarray(self.data_max_, dtype=float).tobytes())
+        return digest.hexdigest()[:16]
+
+    def transform(self, X, features=None):
+        """
+        Scale X to [0, 1] using the fitted ranges. X has shape (..., n_features), or
+        (..., len(features)) when a subset of feature names is given.
+        """
+        X = np.asarray(X, dtype=float)
+        if features is None:
+            return (X - self.data_min_) * self.scale_
+        idx = [self._index[f] for f in features]
+        return (X - self.data_min_[idx]) * self.scale_[idx]
+
+    def transform_dict(self, values):
+        """Scale a {feature_name: value} dict; missing features are treated as 0"""
+        row = np.array([values.get(f, 0) for f in self.feature_names], dtype=float)
+        return self.transform(row)
+
+    def save(self, path=DEFAULT_SCALER_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, feature_names=np.array(self.feature_names), n_samples_seen=self.n_samples_seen,
+                 data_min=self.data_min_, data_max=self.data_max_, mean=self.mean_, var=self.var_)
+
+    @classmethod
+    def load(cls, path=DEFAULT_SCALER_PATH):
+        data = np.load(path)
+        scaler = cls([str(f) for f in data['feature_names']])
+        scaler.n_samples_seen = int(data['n_samples_seen'])
+        scaler.data_min_ = data['data_min']
+        scaler.data_max_ = data['data_max']
+        scaler.mean_ = data['mean']
+        scaler.var_ = data['var']
+        scaler._update_scale()
+        return scaler
+
+    @classmethod
+    def load_or_default(cls, path=DEFAULT_SCALER_PATH):
+        if path and os.path.exists(path):
+            try:
+                return cls.load(path)
+            except Exception as e:
+                print(f"Error loading feature scaler from {path}: {str(e)}")
+        return cls()
+
+
+def frame_to_features(df, feature_names=FEATURE_NAMES):
+    """
+    Pull the feature columns out of a history frame. Temperature may be given as
+    'temperature' in Celsius or as OpenWeatherMap's 'temp' in Kelvin.
+    """
+    columns = []
+    for name in feature_names:
+        if name in df.columns:
+            columns.append(df[name].to_numpy(dtype=float))
+        elif name == 'temperature' and 'temp' in df.columns:
+            columns.append(df['temp'].to_numpy(dtype=float) - 273.15)
+        else:
+            columns.append(np.full(len(df), np.nan))
+    return np.stack(columns, axis=-1)
+
+
+def fit_scaler_from_csv(path, chunksize=100000, feature_names=FEATURE_NAMES):
+    """Stream a CSV through partial_fit without loading it all into memory"""
+    scaler = StreamingFeatureScaler(feature_names)
+    defaults = StreamingFeatureScaler(feature_names)
+    # First pass over just the feature columns: a column is absent only if it has no
+    # value anywhere in the file, not merely in the first chunk
+    wanted = set(feature_names) | {'temp'}
+    absent = np.ones(len(feature_names), dtype=bool)
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=lambda column: column in wanted):
+        absent &= np.isnan(frame_to_features(chunk, feature_names)).all(axis=0)
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        features = frame_to_features(chunk, feature_names)
+        # Fill columns the history does not have so their rows are not dropped
+        features[:, absent] = 0.0
+        scaler.partial_fit(features)
+    if absent.any():
+        # ...and give those columns back their default range
+        scaler.data_min_[absent] = defaults.data_min_[absent]
+        scaler.data_max_[absent] = defaults.data_max_[absent]
+        scaler._update_scale()
+    return scaler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit the feature scaler on historical observations")
+    parser.add_argument('data', help="CSV of historical observations")
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--output', default=DEFAULT_SCALER_PATH)
+    args = parser.parse_args()
+
+    scaler = fit_scaler_from_csv(args.data, chunksize=args.chunksize)
+    scaler.save(args.output)
+    print(f"Fitted scaler on {scaler.n_samples_seen} samples, saved to {args.output}")
+    for name, lo, hi in zip(scaler.feature_names, scaler.data_min_, scaler.data_max_):
+        print(f"  {name}: {lo:.2f} .. {hi:.2f}")
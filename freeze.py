@@ -1,7 +1,14 @@
+import sys
+
 from flask_frozen import Freezer
 from app import app
 
 freezer = Freezer(app)
 
 if __name__ == '__main__':
-    freezer.freeze() 
\ No newline at end of file
+    if '--predictions' in sys.argv:
+        # Only precompute the static prediction pages (see build.py --predictions)
+        from build import build_static_predictions, load_cities
+        build_static_predictions(load_cities())
+    else:
+        freezer.freeze()
\ No newline at end of file
@@ -0,0 +1,127 @@
+"""
+Offline US gazetteer with a sorted-array prefix index.
+
+Places are loaded once from a bundled CSV (data/us_places.csv) or from the Census
+Bureau national places gazetteer file (GAZETTEER_PATH, tab-separated). Every place
+is indexed under several normalized keys ("tulsa", "tulsa, ok", "tulsa, oklahoma")
+in one sorted list, so exact lookups are a dict hit and prefix queries are a
+bisect plus a short scan. Short prefixes are memoized since they match the most keys.
+"""
+import bisect
+import csv
+import os
+import re
+
+DEFAULT_GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'us_places.csv'))
+
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'PR': 'Puerto Rico', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+
+# Legal/statistical area suffixes used in Census place names ("Tulsa city")
+_CENSUS_SUFFIX = re.compile(r'\s+(city|town|village|borough|CDP|municipality|city and borough|'
+                            r'consolidated government|metropolitan government|unified government)(\s*\(.*\))?$')
+
+_MEMO_PREFIX_LEN = 3
+
+
+def normalize(text):
+    text = text.lower().replace('.', '').replace(',', ', ')
+    text = re.sub(r'\s+', ' ', text).strip()
+    return re.sub(r'\s*,\s*', ', ', text).rstrip(', ')
+
+
+class Gazetteer:
+    def __init__(self, places):
+        # places: list of (name, state, lat, lon, size) where size ranks ambiguous/prefix matches
+        self.places = sorted(places, key=lambda p: -p[4])
+        self.exact = {}
+        pairs = []
+        for i, (name, state, _, _, _) in enumerate(self.places):
+            keys = {normalize(name), normalize(f"{name}, {state}")}
+            if state in US_STATES:
+                keys.add(normalize(f"{name}, {US_STATES[state]}"))
+            for key in keys:
+                # Places are sorted by size, so an ambiguous name keeps the largest
+                self.exact.setdefault(key, i)
+                pairs.append((key, i))
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.key_places = [i for _, i in pairs]
+        self._memo = {}
+
+    @classmethod
+    def load(cls, path=DEFAULT_GAZETTEER_PATH):
+        places = []
+        with open(path, newline='', encoding='utf-8') as f:
+            if path.endswith('.txt'):
+                # Census national places gazetteer
+                reader = csv.DictReader(f, delimiter='\t')
+                for row in reader:
+                    row = {k.strip(): v for k, v in row.items()}
+                    name = _CENSUS_SUFFIX.sub('', row['NAME'])
+                    # The Census file has no population column; land area stands in for size
+                    places.append((name, row['USPS'], float(row['INTPTLAT']), float(row['INTPTLONG']),
+                                   float(row.get('ALAND_SQMI') or 0)))
+            else:
+                for row in csv.DictReader(f):
+                    places.append((row['name'], row['state'], float(row['lat']), float(row['lon']),
+                                   int(row.get('population') or 0)))
+        return cls(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _describe(self, i):
+        name, state, lat, lon, _ = self.places[i]
+        return {'name': f"{name}, {state}", 'lat': lat, 'lon': lon}
+
+    def lookup(self, query):
+        """Exact lookup of "City", "City, ST" or "City, State"; returns (lat, lon) or None"""
+        i = self.exact.get(normalize(query))
+        if i is None:
+            return None
+        return self.places[i][2], self.places[i][3]
+
+    def autocomplete(self, prefix, limit=8):
+        """Up to `limit` places whose name starts with `prefix`, largest first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= _MEMO_PREFIX_LEN and (prefix, limit) in self._memo:
+            return self._memo[(prefix, limit)]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+        # Place indices are size ranks, so the smallest indices are the best matches
+        matches = sorted(set(self.key_places[start:end]))[:limit]
+        result = [self._describe(i) for i in matches]
+
+        if len(prefix) <= _MEMO_PREFIX_LEN:
+            self._memo[(prefix, limit)] = result
+        return result
+
+
+_gazetteer = None
+
+
+def get_gazetteer():
+    """Process-wide gazetteer, loaded on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        try:
+            _gazetteer = Gazetteer.load()
+        except Exception as e:
+            print(f"Error loading gazetteer from {DEFAULT_GAZETTEER_PATH}: {str(e)}")
+            _gazetteer = Gazetteer([])
+    return _gazetteer
@@ -0,0 +1,21 @@
+# Gunicorn settings; SERVING_MODE selects threaded (default) or async (gevent) workers
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+timeout = 120
+
+if os.getenv('SERVING_MODE', 'threaded') == 'async':
+    # gevent monkey-patches the worker, so upstream I/O no longer blocks a thread
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+else:
+    worker_class = 'gthread'
+    threads = int(os.getenv('WEB_THREADS', 4))
+
+
+def post_worker_init(worker):
+    # After the app is loaded (and gevent has patched the worker), so the thread is
+    # a greenlet in async mode; importing app here only returns the loaded module
+    import app
+    app.disaster_aggregates.start_refresher()
@@ -0,0 +1,84 @@
+"""
+Response compression and HTTP caching for the Flask server behind Dash.
+
+Compression (brotli, falling back to gzip) applies to every JSON/HTML/JS/CSS
+response above COMPRESS_MIN_SIZE bytes, which mostly means the Plotly figure
+payloads returned from /_dash-update-component. Figures are serialized with
+orjson when it is installed.
+
+cacheable() adds Cache-Control and an ETag to GET routes and answers matching
+If-None-Match requests with 304 Not Modified. enable_revalidation() does the same
+for Dash's own layout/dependency endpoints, which change only on deploy.
+"""
+import functools
+import os
+
+from flask import make_response, request
+from flask_compress import Compress
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Brotli quality 11 is far too slow for per-request compression; 4 is close to gzip speed
+COMPRESS_BR_LEVEL = int(os.getenv('COMPRESS_BR_LEVEL', 4))
+
+DASH_REVALIDATE_PATHS = ('/_dash-layout', '/_dash-dependencies')
+
+
+def init_compression(server):
+    server.config.update(
+        COMPRESS_ALGORITHM=['br', 'gzip'],
+        COMPRESS_MIN_SIZE=COMPRESS_MIN_SIZE,
+        COMPRESS_BR_LEVEL=COMPRESS_BR_LEVEL,
+        # Streamed responses (event streams) must reach the client as they are produced
+        COMPRESS_STREAMS=False,
+    )
+    Compress(server)
+
+
+def use_fast_json():
+    """Serialize Plotly figures (and so Dash callback responses) with orjson if available"""
+    import plotly.io as pio
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    pio.json.config.default_engine = 'orjson'
+    return True
+
+
+def _add_validators(response, max_age, public):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.is_streamed:
+        return response
+    if max_age:
+        response.cache_control.max_age = max_age
+        response.cache_control.public = public
+    else:
+        # Always revalidate, but let the client reuse its copy when the ETag matches
+        response.cache_control.no_cache = True
+    if not response.get_etag()[0]:
+        response.add_etag()
+    # flask-compress appends the encoding to the ETag (":gzip", ":br"); compare without it
+    etag = response.get_etag()[0]
+    if any(tag.split(':')[0] == etag for tag in request.if_none_match.as_set()):
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+    return response
+
+
+def cacheable(max_age=300, public=True):
+    """Decorator for GET views: Cache-Control max-age, an ETag and 304 handling"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            return _add_validators(make_response(view(*args, **kwargs)), max_age, public)
+        return wrapper
+    return decorator
+
+
+def enable_revalidation(server, paths=DASH_REVALIDATE_PATHS):
+    """ETag + no-cache for responses on `paths`, so repeat loads are answered with 304"""
+    @server.after_request
+    def _revalidate(response):
+        if request.path in paths:
+            return _add_validators(response, 0, True)
+        return response
@@ -0,0 +1,309 @@
+"""
+Offline load test for the full gunicorn + Dash/Flask stack.
+
+Starts a local stand-in for OpenWeatherMap and Nominatim with configurable latency,
+then for each worker count boots `gunicorn app:server -c gunicorn.conf.py` pointed
+at it and drives a realistic request mix for a fixed duration:
+
+  - predict:      the streamed prediction the Predict button opens
+                  (GET /api/predict/stream, read until `event: done`)
+  - suggest:      the location autocomplete callback
+  - autocomplete: GET /api/autocomplete
+
+Locations mix popular cities (repeats, coalesced/cached), long-tail gazetteer
+places and unknown places that fall through to the geocoder stand-in.
+
+    python load_test.py --workers 1 2 4 --concurrency 32 --duration 30 --latency 0.2
+    python load_test.py --mode async --workers 1 --concurrency 200
+
+Reports throughput, latency percentiles and error rate per worker count and endpoint.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import requests
+
+from gazetteer import get_gazetteer
+
+DEFAULT_MIX = {'predict': 0.6, 'suggest': 0.25, 'autocomplete': 0.15}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class UpstreamStub:
+    """OpenWeatherMap current weather and forecast + Nominatim search, with latency and an error rate"""
+
+    def __init__(self, latency=0.1, jitter=0.5, error_rate=0.0, port=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.port = port or _free_port()
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(max(0.0, random.gauss(stub.latency, stub.latency * stub.jitter)))
+                if random.random() < stub.error_rate:
+                    return self._send(503, {'message': 'stand-in error'})
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/data/2.5/weather':
+                    return self._send(200, stub.weather(float(query['lat'][0]), float(query['lon'][0])))
+                if url.path == '/data/2.5/forecast':
+                    return self._send(200, stub.forecast(float(query['lat'][0]), float(query['lon'][0])))
+                if url.path == '/search':
+                    return self._send(200, stub.search(query.get('q', [''])[0]))
+                self._send(404, {'message': 'not found'})
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self.server.daemon_threads = True
+
+    @staticmethod
+    def weather(lat, lon):
+        return {
+            'coord': {'lat': lat, 'lon': lon},
+            'main': {'temp': random.uniform(265, 310), 'humidity': random.uniform(20, 95),
+                     'pressure': random.uniform(985, 1030)},
+            'wind': {'speed': random.uniform(0, 20), 'deg': random.uniform(0, 360)},
+            'clouds': {'all': random.uniform(0, 100)},
+            'dt': int(time.time()),
+        }
+
+    @classmethod
+    def forecast(cls, lat, lon):
+        now = int(time.time()) // 10800 * 10800
+        steps = [dict(cls.weather(lat, lon), dt=now + i * 10800) for i in range(40)]
+        return {'list': steps, 'city': {'coord': {'lat': lat, 'lon': lon}, 'timezone': 0}}
+
+    @staticmethod
+    def search(q):
+        # Stable pseudo-coordinates inside the continental US for any query
+        rng = random.Random(q)
+        lat, lon = rng.uniform(25, 49), rng.uniform(-124, -67)
+        return [{'lat': str(lat), 'lon': str(lon), 'display_name': q, 'place_id': rng.randint(1, 10**9),
+                 'boundingbox': [str(lat - 0.1), str(lat + 0.1), str(lon - 0.1), str(lon + 0.1)]}]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def location_mix(n_popular=20, n_tail=200, n_unknown=50, seed=0):
+    """(locations, weights): popular cities dominate, with a long tail and unknown places"""
+    rng = random.Random(seed)
+    places = get_gazetteer().places
+    popular = [f"{name}, {state}" for name, state, *_ in places[:n_popular]]
+    tail = [f"{name}, {state}" for name, state, *_ in places[n_popular:n_popular + n_tail]]
+    unknown = [f"Testville {i}, {rng.choice(['OK', 'KS', 'TX', 'NE'])}" for i in range(n_unknown)]
+    locations = popular + tail + unknown
+    # Zipf-like weights over popular cities, flat over the tail and unknown places
+    weights = [1.0 / (i + 1) for i in range(len(popular))] + [0.02] * len(tail) + [0.01] * len(unknown)
+    return locations, weights
+
+
+def dash_payload(output, outputs, inputs, state=()):
+    return {
+        'output': output,
+        'outputs': outputs,
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': [f"{inputs[0][0]}.{inputs[0][1]}"],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+    }
+
+
+def suggest_payload(prefix):
+    return dash_payload('location-suggestions.children', {'id': 'location-suggestions', 'property': 'children'},
+                        [('location-input', 'value', prefix)])
+
+
+class LoadGenerator:
+    def __init__(self, base_url, concurrency=16, duration=30, mix=DEFAULT_MIX, timeout=60, seed=0):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.duration = duration
+        self.mix = mix
+        self.timeout = timeout
+        self.locations, self.weights = location_mix(seed=seed)
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.samples = []  # (endpoint, latency_s, ok)
+
+    def _predict(self, session, location, model='quantum'):
+        """Read one prediction stream to its end; an `error` event counts as a failure"""
+        with session.get(f"{self.base_url}/api/predict/stream", params={'location': location, 'model': model},
+                         stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                return False
+            for line in response.iter_lines(decode_unicode=True):
+                if line == 'event: done':
+                    return True
+                if line == 'event: error':
+                    return False
+        # Stream ended without `done`
+        return False
+
+    def _request(self, session, rng, endpoint):
+        """Whether one request of `endpoint` succeeded"""
+        location = rng.choices(self.locations, self.weights)[0]
+        if endpoint == 'predict':
+            return self._predict(session, location)
+        headers = {'Accept-Encoding': 'br, gzip'}
+        prefix = location[:rng.randint(2, 5)]
+        if endpoint == 'suggest':
+            response = session.post(f"{self.base_url}/_dash-update-component", json=suggest_payload(prefix),
+                                    headers=headers, timeout=self.timeout)
+        else:
+            response = session.get(f"{self.base_url}/api/autocomplete", params={'q': prefix},
+                                   headers=headers, timeout=self.timeout)
+        return response.status_code == 200
+
+    def _client(self, client_id, deadline):
+        rng = random.Random(self.seed * 100003 + client_id)
+        endpoints, weights = list(self.mix), list(self.mix.values())
+        session = requests.Session()
+        samples = []
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            start = time.perf_counter()
+            try:
+                ok = self._request(session, rng, endpoint)
+            except requests.RequestException:
+                ok = False
+            samples.append((endpoint, time.perf_counter() - start, ok))
+        with self.lock:
+            self.samples.extend(samples)
+
+    def run(self):
+        deadline = time.monotonic() + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for i in range(self.concurrency):
+                pool.submit(self._client, i, deadline)
+        return summarize(self.samples, self.duration)
+
+
+def summarize(samples, duration):
+    """Per-endpoint and overall throughput, latency percentiles (ms) and error rate"""
+    report = {}
+    for endpoint in sorted({s[0] for s in samples}) + ['all']:
+        rows = [s for s in samples if endpoint == 'all' or s[0] == endpoint]
+        latencies = np.array([s[1] for s in rows]) * 1000
+        errors = sum(1 for s in rows if not s[2])
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if len(rows) else (0, 0, 0)
+        report[endpoint] = {
+            'requests': len(rows),
+            'rps': len(rows) / duration,
+            'p50_ms': float(p50),
+            'p90_ms': float(p90),
+            'p99_ms': float(p99),
+            'max_ms': float(latencies.max()) if len(rows) else 0.0,
+            'error_rate': errors / len(rows) if rows else 0.0,
+        }
+    return report
+
+
+def start_server(workers, port, upstream_port, mode='threaded', threads=4, startup_timeout=180):
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers),
+               WEB_THREADS=str(threads),
+               SERVING_MODE=mode,
+               PORT=str(port),
+               OWM_BASE_URL=f"http://127.0.0.1:{upstream_port}",
+               NOMINATIM_DOMAIN=f"127.0.0.1:{upstream_port}",
+               NOMINATIM_SCHEME='http',
+               OPENWEATHERMAP_API_KEY='load-test')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:server', '-c', 'gunicorn.conf.py',
+                                '--bind', f"127.0.0.1:{port}"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/autocomplete?q=ne", timeout=2).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def print_report(results):
+    print(f"{'workers':>7} {'endpoint':<13} {'requests':>8} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for workers, report in results:
+        for endpoint, r in report.items():
+            print(f"{workers:>7} {endpoint:<13} {r['requests']:>8} {r['rps']:>8.1f} {r['p50_ms']:>8.0f} "
+                  f"{r['p90_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['max_ms']:>8.0f} {r['error_rate']:>7.1%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline load test for app:server")
+    parser.add_argument('--workers', type=int, nargs='+', default=[2], help="Worker counts to compare")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker (threaded mode)")
+    parser.add_argument('--mode', choices=['threaded', 'async'], default='threaded')
+    parser.add_argument('--concurrency', type=int, default=16, help="Concurrent simulated clients")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds per worker count")
+    parser.add_argument('--warmup', type=float, default=5, help="Unmeasured seconds before each run")
+    parser.add_argument('--latency', type=float, default=0.1, help="Mean upstream latency in seconds")
+    parser.add_argument('--upstream-errors', type=float, default=0.0, help="Upstream error rate (0-1)")
+    parser.add_argument('--mix', default=None, help='Endpoint weights as JSON, e.g. \'{"predict": 1}\'')
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    upstream = UpstreamStub(latency=args.latency, error_rate=args.upstream_errors).start()
+    mix = json.loads(args.mix) if args.mix else DEFAULT_MIX
+    results = []
+    try:
+        for workers in args.workers:
+            port = _free_port()
+            print(f"Starting gunicorn: {workers} {args.mode} worker(s) on port {port}...")
+            server = start_server(workers, port, upstream.port, args.mode, args.threads)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                if args.warmup:
+                    LoadGenerator(base_url, args.concurrency, args.warmup, mix).run()
+                report = LoadGenerator(base_url, args.concurrency, args.duration, mix).run()
+                results.append((workers, report))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        upstream.stop()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'mode': args.mode, 'concurrency': args.concurrency, 'latency': args.latency,
+                       'results': [{'workers': w, 'report': r} for w, r in results]}, f, indent=2)
@@ -0,0 +1,202 @@
+"""
+Opt-in memory instrumentation and leak detection.
+
+Set MEMORY_PROFILING=1 to trace allocations with tracemalloc. Tracing makes a
+prediction about 4x slower with the default single frame per allocation
+(MEMORY_PROFILING_FRAMES=1), and much slower with deeper tracebacks, so it is off by
+default. When it is off, @instrument costs one attribute check per call. Raise
+MEMORY_PROFILING_FRAMES only to see full tracebacks (?group=traceback) for a site
+that is already known to grow.
+
+Sections wrapped with @instrument('name') record, per call:
+
+  retained  traced memory still allocated when the call returns, minus before it
+  peak      highest traced memory during the call, minus before it
+
+Every MEMORY_SNAPSHOT_EVERY-th call of a section is also bracketed by snapshots. The
+call sites that grew most during that call are kept as the section's top allocators.
+
+report() adds the process RSS and the top allocation sites since the baseline (taken
+at start, or with reset_baseline()). Sites that keep growing across reports are leak
+candidates. Traced memory is process-wide. With concurrent requests, a section's
+numbers include whatever other requests allocated meanwhile. Profile with one
+thread (WEB_THREADS=1) when attributing growth to a single path.
+"""
+import functools
+import gc
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+MEMORY_PROFILING = os.getenv('MEMORY_PROFILING', '0').lower() in ('1', 'true', 'yes')
+MEMORY_PROFILING_FRAMES = int(os.getenv('MEMORY_PROFILING_FRAMES', 1))
+MEMORY_SNAPSHOT_EVERY = int(os.getenv('MEMORY_SNAPSHOT_EVERY', 20))
+
+# tracemalloc's own bookkeeping (including our snapshots) and import machinery are
+# noise in every report. They are dropped from the grouped statistics rather than
+# with Snapshot.filter_traces, which matches every trace and takes seconds
+_IGNORED_FILES = (tracemalloc.__file__, __file__, '<frozen importlib._bootstrap>',
+                  '<frozen importlib._bootstrap_external>', '<unknown>')
+
+
+def _relevant(stats, limit):
+    return [s for s in stats if s.traceback[0].filename not in _IGNORED_FILES][:limit]
+
+
+class _SectionStats:
+    __slots__ = ('calls', 'retained_total', 'retained_max', 'peak_max', 'seconds', 'top_sites')
+
+    def __init__(self):
+        self.calls = 0
+        self.retained_total = 0
+        self.retained_max = 0
+        self.peak_max = 0
+        self.seconds = 0.0
+        self.top_sites = []
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'retained_bytes_total': self.retained_total,
+            'retained_bytes_mean': self.retained_total / self.calls if self.calls else 0.0,
+            'retained_bytes_max': self.retained_max,
+            'peak_bytes_max': self.peak_max,
+            'seconds_mean': self.seconds / self.calls if self.calls else 0.0,
+            'top_sites': self.top_sites,
+        }
+
+
+_sections = {}
+_lock = threading.Lock()
+_baseline = None
+_started_at = None
+
+
+def enabled():
+    return tracemalloc.is_tracing()
+
+
+def start(frames=MEMORY_PROFILING_FRAMES):
+    """Start tracing and take the baseline snapshot (no-op if already tracing)"""
+    global _started_at
+    if tracemalloc.is_tracing():
+        return
+    tracemalloc.start(frames)
+    _started_at = time.time()
+    reset_baseline()
+
+
+def stop():
+    global _baseline
+    tracemalloc.stop()
+    _baseline = None
+    with _lock:
+        _sections.clear()
+
+
+def reset_baseline():
+    """Measure growth in report() from now on"""
+    global _baseline
+    gc.collect()
+    _baseline = _snapshot()
+
+
+def _snapshot():
+    return tracemalloc.take_snapshot()
+
+
+def _format_site(stat):
+    frame = stat.traceback[0]
+    entry = {'site': f"{frame.filename}:{frame.lineno}", 'size_diff': stat.size_diff,
+             'count_diff': stat.count_diff, 'size': stat.size}
+    if len(stat.traceback) > 1:
+        entry['traceback'] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+    return entry
+
+
+def _top_growth(before, after, limit, group_by='lineno'):
+    stats = [stat for stat in after.compare_to(before, group_by) if stat.size_diff > 0]
+    return [_format_site(stat) for stat in _relevant(stats, limit)]
+
+
+def instrument(name):
+    """Decorator recording retained/peak traced memory of each call under `name`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracemalloc.is_tracing():
+                return fn(*args, **kwargs)
+            with _lock:
+                stats = _sections.setdefault(name, _SectionStats())
+                sample = MEMORY_SNAPSHOT_EVERY > 0 and stats.calls % MEMORY_SNAPSHOT_EVERY == 0
+            before_snapshot = _snapshot() if sample else None
+            before, _ = tracemalloc.get_traced_memory()
+            peak_before = _peak_window_start(before)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                after, peak = tracemalloc.get_traced_memory()
+                top_sites = _top_growth(before_snapshot, _snapshot(), 10) if sample else None
+                with _lock:
+                    stats.calls += 1
+                    stats.retained_total += after - before
+                    stats.retained_max = max(stats.retained_max, after - before)
+                    stats.peak_max = max(stats.peak_max, peak - peak_before)
+                    stats.seconds += elapsed
+                    if top_sites is not None:
+                        stats.top_sites = top_sites
+        return wrapper
+    return decorator
+
+
+def _peak_window_start(current):
+    """
+    Reset the peak counter where supported (Python 3.9+), so the next reading is the
+    peak of this call. Otherwise the peak is since tracing began. A nested section
+    restarts the window, so an outer section's peak only covers what follows it.
+    """
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+        return current
+    return 0
+
+
+def rss_bytes():
+    """Current resident set size (from /proc where available, else the peak)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is KiB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def report(top=25, group_by='lineno'):
+    """Sections, RSS and the top growth sites since the baseline"""
+    result = {'pid': os.getpid(), 'enabled': enabled(), 'rss_bytes': rss_bytes()}
+    if not enabled():
+        return result
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = _snapshot()
+    with _lock:
+        sections = {name: stats.to_dict() for name, stats in _sections.items()}
+    result.update({
+        'traced_bytes': current,
+        'traced_peak_bytes': peak,
+        'tracing_since': _started_at,
+        'sections': sections,
+        'growth_since_baseline': _top_growth(_baseline, snapshot, top, group_by) if _baseline else [],
+        'top_allocations': [{'site': f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                             'size': s.size, 'count': s.count}
+                            for s in _relevant(snapshot.statistics(group_by), top)],
+    })
+    return result
+
+
+if MEMORY_PROFILING:
+    start()
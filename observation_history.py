@@ -0,0 +1,268 @@
+"""
+Rolling per-location observation history with O(1) trend statistics.
+
+Each location (lat/lon rounded to 0.01°, the same cell the weather cache uses) owns
+a fixed-size ring buffer of OBSERVATION_HISTORY_SIZE observations. All buffers live
+in one (max_locations, size) structured array. With OBSERVATION_HISTORY_PATH set, the
+array is a memory-mapped .npy file, so history survives restarts. Locations beyond
+max_locations evict the least recently updated one.
+
+The slot index lives in process memory, so a file must never be shared. Each process
+claims its own file by taking an exclusive lock on `<path>.lock`, or on
+`<name>.1.npy.lock`, `<name>.2.npy.lock`, ... when that one is held. Each gunicorn
+worker therefore keeps the history of the readings it fetched, and a restarted worker
+takes over a released file along with its history.
+
+Running statistics are updated as each observation is added and as the oldest one
+falls out of the window, so reading them never rescans the buffer:
+
+  pressure_tendency  least-squares slope of pressure over the window, hPa/hour
+  humidity_trend     least-squares slope of relative humidity, %/hour
+  max_wind_speed     rolling maximum wind speed (monotonic deque)
+
+The slope sums are rebuilt from the buffer every REBUILD_EVERY evictions so that
+floating-point error from repeated subtraction can't accumulate.
+"""
+import fcntl
+import os
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from data_sources.observation import OBSERVATION_DTYPE, as_observation, to_batch
+
+OBSERVATION_HISTORY_SIZE = int(os.getenv('OBSERVATION_HISTORY_SIZE', 48))
+OBSERVATION_HISTORY_LOCATIONS = int(os.getenv('OBSERVATION_HISTORY_LOCATIONS', 4096))
+OBSERVATION_HISTORY_PATH = os.getenv('OBSERVATION_HISTORY_PATH') or None
+
+# Trends over less than this span are noise, not tendency
+MIN_TREND_HOURS = 1.0
+REBUILD_EVERY = 1000
+# Most history files (one per concurrently running process) tried by _claim_path
+MAX_HISTORY_FILES = 64
+
+TREND_DTYPE = np.dtype([
+    ('pressure_tendency', 'f8'),  # hPa/hour, negative = falling
+    ('humidity_trend', 'f8'),     # %/hour
+    ('max_wind_speed', 'f8'),     # m/s over the window
+    ('samples', 'i8'),
+    ('span_hours', 'f8'),
+])
+
+
+def location_key(lat, lon):
+    return (round(float(lat), 2), round(float(lon), 2))
+
+
+def empty_trends(n):
+    trends = np.zeros(n, dtype=TREND_DTYPE)
+    for field in ('pressure_tendency', 'humidity_trend', 'max_wind_speed', 'span_hours'):
+        trends[field] = np.nan
+    return trends
+
+
+class _Series:
+    """Ring-buffer cursor and running sums for one location"""
+    __slots__ = ('slot', 'head', 'count', 'origin', 'seq', 'evictions', 'sums', 'wind')
+
+    def __init__(self, slot, origin):
+        self.slot = slot
+        self.head = 0          # Next row to write; the oldest row once the buffer is full
+        self.count = 0
+        self.origin = origin   # Unix seconds; times are kept in hours relative to this
+        self.seq = 0           # Observations ever added, used to age out the wind deque
+        self.evictions = 0
+        # n, Σt, Σt², Σp, Σtp, Σh, Σth
+        self.sums = np.zeros(7)
+        self.wind = deque()    # (seq, wind_speed), wind speeds strictly decreasing
+
+    def terms(self, row):
+        t = (int(row['time']) - self.origin) / 3600.0
+        p, h = float(row['pressure']), float(row['humidity'])
+        return np.array([1.0, t, t * t, p, t * p, h, t * h])
+
+
+class ObservationHistory:
+    def __init__(self, size=OBSERVATION_HISTORY_SIZE, max_locations=OBSERVATION_HISTORY_LOCATIONS,
+                 path=OBSERVATION_HISTORY_PATH):
+        self.size = size
+        self.max_locations = max_locations
+        self.path = path
+        self._lock = threading.Lock()
+        self._series = OrderedDict()  # location key -> _Series, least recently updated first
+        self._free = list(range(max_locations - 1, -1, -1))
+        self.recorded = 0
+        self._lock_file = None
+        if path:
+            self.path = path = self._claim_path(path)
+            self._data = self._open_memmap(path)
+            self._restore()
+        else:
+            self._data = np.zeros((max_locations, size), dtype=OBSERVATION_DTYPE)
+
+    # --- storage -------------------------------------------------------------
+
+    def _claim_path(self, path):
+        """The first of path, <name>.1.npy, <name>.2.npy, ... whose lock no other process holds"""
+        root, ext = os.path.splitext(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        for i in range(MAX_HISTORY_FILES):
+            candidate = path if i == 0 else f"{root}.{i}{ext}"
+            lock_file = open(candidate + '.lock', 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                continue
+            # Held (and the file kept open) for the life of the process
+            self._lock_file = lock_file
+            return candidate
+        raise RuntimeError(f"All {MAX_HISTORY_FILES} observation history files at {path} are in use")
+
+    def _open_memmap(self, path):
+        shape = (self.max_locations, self.size)
+        if os.path.exists(path):
+            data = np.lib.format.open_memmap(path, mode='r+')
+            if data.dtype == OBSERVATION_DTYPE and data.shape == shape:
+                return data
+            print(f"Observation history at {path} has a different layout; starting a new one")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        return np.lib.format.open_memmap(path, mode='w+', dtype=OBSERVATION_DTYPE, shape=shape)
+
+    def _restore(self):
+        """Rebuild the location index and running statistics from a memory-mapped file"""
+        restored = []
+        for slot in range(self.max_locations):
+            rows = self._data[slot]
+            filled = np.flatnonzero(rows['time'] > 0)
+            if len(filled) == 0:
+                continue
+            newest = filled[np.argmax(rows['time'][filled])]
+            restored.append((int(rows['time'][newest]), slot, newest, len(filled)))
+        # Oldest-updated first, so LRU order survives the restart
+        for _, slot, newest, count in sorted(restored):
+            row = self._data[slot][newest]
+            series = _Series(slot, int(row['time']))
+            series.count = count
+            series.head = (newest + 1) % self.size
+            self._rebuild(series)
+            self._series[location_key(row['lat'], row['lon'])] = series
+            self._free.remove(slot)
+
+    def _ordered_rows(self, series):
+        """The series' rows, oldest first"""
+        rows = self._data[series.slot]
+        start = series.head if series.count == self.size else 0
+        return rows[(start + np.arange(series.count)) % self.size]
+
+    def _rebuild(self, series):
+        rows = self._ordered_rows(series)
+        series.sums = sum((series.terms(row) for row in rows), np.zeros(7))
+        series.seq = len(rows)
+        series.wind = deque()
+        for seq, wind in enumerate(rows['wind_speed']):
+            while series.wind and series.wind[-1][1] <= wind:
+                series.wind.pop()
+            series.wind.append((seq, float(wind)))
+
+    def _series_for(self, key, time):
+        series = self._series.get(key)
+        if series is not None:
+            self._series.move_to_end(key)
+            return series
+        if self._free:
+            slot = self._free.pop()
+        else:
+            _, evicted = self._series.popitem(last=False)
+            slot = evicted.slot
+        self._data[slot] = np.zeros(self.size, dtype=OBSERVATION_DTYPE)
+        series = self._series[key] = _Series(slot, time)
+        return series
+
+    # --- public API ----------------------------------------------------------
+
+    def record(self, weather):
+        """
+        Add a fetched observation. Mock and stale readings, readings without
+        coordinates or a timestamp, and repeats of the last reading are ignored.
+        Returns whether it was recorded.
+        """
+        weather = as_observation(weather)
+        if weather.mock or weather.stale or not weather.has_coordinates or weather.time <= 0:
+            return False
+        row = to_batch(weather)[0]
+        with self._lock:
+            series = self._series_for(location_key(weather.lat, weather.lon), int(weather.time))
+            rows = self._data[series.slot]
+            if series.count and int(weather.time) <= int(rows[(series.head - 1) % self.size]['time']):
+                return False
+            if series.count == self.size:
+                # The oldest reading drops out of the window
+                series.sums -= series.terms(rows[series.head])
+                if series.wind and series.wind[0][0] == series.seq - self.size:
+                    series.wind.popleft()
+                series.evictions += 1
+            else:
+                series.count += 1
+            rows[series.head] = row
+            series.head = (series.head + 1) % self.size
+            series.sums += series.terms(row)
+            while series.wind and series.wind[-1][1] <= weather.wind_speed:
+                series.wind.pop()
+            series.wind.append((series.seq, float(weather.wind_speed)))
+            series.seq += 1
+            if series.evictions and series.evictions % REBUILD_EVERY == 0:
+                self._rebuild(series)
+            self.recorded += 1
+        return True
+
+    def trends(self, lat, lon):
+        """TREND_DTYPE record for a location; slopes are NaN until there is enough history"""
+        trends = empty_trends(1)[0]
+        with self._lock:
+            series = self._series.get(location_key(lat, lon))
+            if series is None or series.count == 0:
+                return trends
+            n, st, stt, sp, stp, sh, sth = series.sums
+            rows = self._data[series.slot]
+            oldest = rows[series.head if series.count == self.size else 0]
+            newest = rows[(series.head - 1) % self.size]
+            trends['samples'] = series.count
+            trends['span_hours'] = (int(newest['time']) - int(oldest['time'])) / 3600.0
+            trends['max_wind_speed'] = series.wind[0][1]
+        denominator = n * stt - st * st
+        if n >= 2 and trends['span_hours'] >= MIN_TREND_HOURS and denominator > 0:
+            trends['pressure_tendency'] = (n * stp - st * sp) / denominator
+            trends['humidity_trend'] = (n * sth - st * sh) / denominator
+        return trends
+
+    def trends_batch(self, batch):
+        """Trends for every row of an observation batch (NaN where lat/lon are missing)"""
+        batch = to_batch(batch)
+        trends = empty_trends(len(batch))
+        for i, (lat, lon) in enumerate(zip(batch['lat'], batch['lon'])):
+            if not (np.isnan(lat) or np.isnan(lon)):
+                trends[i] = self.trends(lat, lon)
+        return trends
+
+    def history(self, lat, lon):
+        """The location's observations as a batch, oldest first"""
+        with self._lock:
+            series = self._series.get(location_key(lat, lon))
+            if series is None:
+                return np.zeros(0, dtype=OBSERVATION_DTYPE)
+            return self._ordered_rows(series).copy()
+
+    def flush(self):
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+
+    def stats(self):
+        with self._lock:
+            return {'locations': len(self._series), 'recorded': self.recorded,
+                    'size': self.size, 'persistent': bool(self.path), 'file': self.path}
@@ -0,0 +1,232 @@
+"""
+Two-tier cache of prediction results.
+
+Probabilities are cached per (grid cell, model, disaster, time bucket). The grid cell
+is lat/lon quantized to PREDICTION_CELL_DEG degrees, and the time bucket is
+PREDICTION_BUCKET_SECONDS long. Each entry also records a digest of the weather
+inputs it was computed from, and a lookup only hits when that digest matches the
+current weather. An entry computed from other inputs is therefore never served, and
+nearby locations in the same cell with different readings don't evict each other:
+each entry is checked against its own digest and ages out with its bucket.
+
+The rendered dashboard outputs (result panels and figures, serialized to JSON) are
+cached the same way per (cell, model, location, time bucket), so a repeat request
+for a hot location skips scoring, the forecast and figure building altogether. Their
+digest also covers the stale/mock flags shown in the result panels.
+
+  L1: in-process LRUs (OrderedDict), PREDICTION_CACHE_L1_SIZE probabilities and
+      PREDICTION_CACHE_L1_OUTPUTS rendered outputs
+  L2: SQLite file in WAL mode (PREDICTION_CACHE_PATH), shared by all gunicorn workers
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PREDICTION_CACHE_PATH = os.getenv('PREDICTION_CACHE_PATH', os.path.join('data', 'prediction_cache.sqlite'))
+PREDICTION_CELL_DEG = float(os.getenv('PREDICTION_CELL_DEG', 0.1))
+PREDICTION_BUCKET_SECONDS = int(os.getenv('PREDICTION_BUCKET_SECONDS', 600))
+PREDICTION_CACHE_L1_SIZE = int(os.getenv('PREDICTION_CACHE_L1_SIZE', 4096))
+PREDICTION_CACHE_L1_OUTPUTS = int(os.getenv('PREDICTION_CACHE_L1_OUTPUTS', 256))
+
+
+def weather_digest(weather):
+    """Digest of the quantized model inputs of an observation"""
+    key = (round(weather.temp, 1), round(weather.humidity), round(weather.pressure * 2) / 2,
+           round(weather.wind_speed, 1), round(weather.wind_deg / 10) * 10,
+           round(weather.clouds), round(weather.rain_1h, 1))
+    return hashlib.blake2b(repr(key).encode(), digest_size=8).hexdigest()
+
+
+def outputs_digest(weather):
+    """weather_digest() plus the flags the rendered outputs depend on"""
+    return f"{weather_digest(weather)}:{int(bool(weather.stale))}{int(bool(weather.mock))}"
+
+
+class PredictionCache:
+    def __init__(self, path=PREDICTION_CACHE_PATH, cell_deg=PREDICTION_CELL_DEG,
+                 bucket_seconds=PREDICTION_BUCKET_SECONDS, l1_size=PREDICTION_CACHE_L1_SIZE,
+                 l1_outputs=PREDICTION_CACHE_L1_OUTPUTS):
+        self.path = path
+        self.cell_deg = cell_deg
+        self.bucket_seconds = bucket_seconds
+        self.l1_size = l1_size
+        self.l1_outputs = l1_outputs
+        self._l1 = OrderedDict()
+        self._l1_rendered = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = {'l1': 0, 'l2': 0}
+        self.misses = 0
+        self.output_hits = {'l1': 0, 'l2': 0}
+        self.output_misses = 0
+        self._purged_bucket = None
+        if path:
+            self._init_db()
+
+    # --- keys ----------------------------------------------------------------
+
+    def cell(self, lat, lon):
+        return f"{round(lat / self.cell_deg)}:{round(lon / self.cell_deg)}"
+
+    def bucket(self, now=None):
+        return int((now if now is not None else time.time()) // self.bucket_seconds)
+
+    def _key(self, cell, model, disaster, bucket):
+        return f"{cell}|{model}|{disaster}|{bucket}"
+
+    def _outputs_key(self, cell, model, location, bucket):
+        return f"{cell}|{model}|{' '.join(location.lower().split())}|{bucket}"
+
+    # --- L2 ------------------------------------------------------------------
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute("CREATE TABLE IF NOT EXISTS predictions ("
+                   "key TEXT PRIMARY KEY, cell TEXT NOT NULL, digest TEXT NOT NULL, "
+                   "probability REAL NOT NULL, expires REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS outputs ("
+                   "key TEXT PRIMARY KEY, digest TEXT NOT NULL, payload TEXT NOT NULL, "
+                   "expires REAL NOT NULL)")
+        db.commit()
+
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    # --- L1 ------------------------------------------------------------------
+
+    def _l1_get(self, key, l1=None):
+        l1 = self._l1 if l1 is None else l1
+        with self._lock:
+            value = l1.get(key)
+            if value is not None:
+                l1.move_to_end(key)
+            return value
+
+    def _l1_put(self, key, value, l1=None, size=None):
+        l1, size = (self._l1, self.l1_size) if l1 is None else (l1, size)
+        with self._lock:
+            l1[key] = value
+            l1.move_to_end(key)
+            while len(l1) > size:
+                l1.popitem(last=False)
+
+    # --- public API ----------------------------------------------------------
+
+    def get_many(self, weather, model, disasters):
+        """Cached probabilities {disaster: p} for this observation's cell; missing ones are omitted"""
+        if not weather.has_coordinates:
+            return {}
+        cell, bucket, digest = self.cell(weather.lat, weather.lon), self.bucket(), weather_digest(weather)
+        found, missing = {}, []
+        for disaster in disasters:
+            key = self._key(cell, model, disaster, bucket)
+            value = self._l1_get(key)
+            if value is not None and value[0] == digest:
+                found[disaster] = value[1]
+                self.hits['l1'] += 1
+            else:
+                missing.append(key)
+        if missing and self.path:
+            placeholders = ','.join('?' * len(missing))
+            try:
+                rows = self._db().execute(
+                    f"SELECT key, digest, probability FROM predictions WHERE key IN ({placeholders}) "
+                    f"AND expires > ?", (*missing, time.time())).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading prediction cache: {str(e)}")
+                rows = []
+            for key, row_digest, probability in rows:
+                if row_digest == digest:
+                    found[key.split('|')[2]] = probability
+                    self._l1_put(key, (digest, probability))
+                    self.hits['l2'] += 1
+        self.misses += len(disasters) - len(found)
+        return found
+
+    def put_many(self, weather, model, probabilities):
+        if not weather.has_coordinates:
+            return
+        cell, bucket, digest = self.cell(weather.lat, weather.lon), self.bucket(), weather_digest(weather)
+        expires = (bucket + 1) * self.bucket_seconds
+        rows = []
+        for disaster, probability in probabilities.items():
+            key = self._key(cell, model, disaster, bucket)
+            self._l1_put(key, (digest, float(probability)))
+            rows.append((key, cell, digest, float(probability), expires))
+        if self.path:
+            try:
+                db = self._db()
+                db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)", rows)
+                db.commit()
+                if self._purged_bucket != bucket:
+                    # Once per bucket, drop whatever expired in the previous ones
+                    self._purged_bucket = bucket
+                    self.purge_expired()
+            except sqlite3.Error as e:
+                print(f"Error writing prediction cache: {str(e)}")
+
+    def get_outputs(self, weather, model, location):
+        """Serialized dashboard outputs for this observation and location, or None"""
+        if not weather.has_coordinates:
+            return None
+        bucket, digest = self.bucket(), outputs_digest(weather)
+        key = self._outputs_key(self.cell(weather.lat, weather.lon), model, location, bucket)
+        value = self._l1_get(key, self._l1_rendered)
+        if value is not None and value[0] == digest:
+            self.output_hits['l1'] += 1
+            return value[1]
+        if self.path:
+            try:
+                row = self._db().execute("SELECT digest, payload FROM outputs WHERE key = ? AND expires > ?",
+                                         (key, time.time())).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error reading prediction cache: {str(e)}")
+                row = None
+            if row is not None and row[0] == digest:
+                self._l1_put(key, row, self._l1_rendered, self.l1_outputs)
+                self.output_hits['l2'] += 1
+                return row[1]
+        self.output_misses += 1
+        return None
+
+    def put_outputs(self, weather, model, location, payload):
+        if not weather.has_coordinates:
+            return
+        bucket, digest = self.bucket(), outputs_digest(weather)
+        key = self._outputs_key(self.cell(weather.lat, weather.lon), model, location, bucket)
+        self._l1_put(key, (digest, payload), self._l1_rendered, self.l1_outputs)
+        if self.path:
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                           (key, digest, payload, (bucket + 1) * self.bucket_seconds))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing prediction cache: {str(e)}")
+
+    def purge_expired(self):
+        if self.path:
+            db = self._db()
+            now = time.time()
+            db.execute("DELETE FROM predictions WHERE expires <= ?", (now,))
+            db.execute("DELETE FROM outputs WHERE expires <= ?", (now,))
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            l1_entries, l1_outputs = len(self._l1), len(self._l1_rendered)
+        return {'l1_entries': l1_entries, 'hits': dict(self.hits), 'misses': self.misses,
+                'l1_outputs': l1_outputs, 'output_hits': dict(self.output_hits),
+                'output_misses': self.output_misses}
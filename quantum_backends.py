@@ -0,0 +1,389 @@
+"""
+Simulator backends for the tornado circuits.
+
+The same two circuits can run on several local simulators:
+
+  default.qubit    PennyLane's reference simulator (parameter broadcasting)
+  lightning.qubit  PennyLane Lightning (C++), when pennylane-lightning is installed
+  numpy            Batched NumPy statevector, written for these 4-wire circuits
+  statevector      In-place simulator from statevector.py (complex128; 'statevector.c64'
+                   for complex64), the path for circuits wider than 4 wires
+  qiskit.aer       Qiskit Aer statevector simulator, when qiskit-aer is installed
+
+Every backend implements the same two calls for encoded features of shape (n, 4):
+
+  expvals(features)               <Z_i> on each wire of the angle-encoding circuit, (n, 4)
+  variational(features, weights)  <Z_0> of the trained circuit, (n,)
+
+Training still runs on PennyLane, because it needs gradients. The backends are for
+inference only.
+
+autotune() times each available backend at the deployment's typical batch size and
+checks it against default.qubit. The fastest backend that agrees is recorded in
+QUANTUM_BACKEND_PATH. select_backend() uses the QUANTUM_BACKEND environment variable
+when it is set. The value is a backend name, or 'auto' to autotune at startup, once
+per process however many predictors are created. Otherwise the recorded choice is used, and default.qubit when nothing is recorded.
+
+Usage:
+    python quantum_backends.py --batch-size 64 --repeats 5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import threading
+import time
+
+import numpy as np
+
+from statevector import StatevectorSimulator, batch_capacity
+
+QUANTUM_BACKEND_PATH = os.getenv('QUANTUM_BACKEND_PATH', os.path.join('models', 'quantum_backend.json'))
+QUANTUM_AUTOTUNE_BATCH = int(os.getenv('QUANTUM_AUTOTUNE_BATCH', 8))
+DEFAULT_BACKEND = 'default.qubit'
+
+N_WIRES = 4
+# Backends whose results differ from default.qubit by more than this are not selected
+AGREEMENT_TOLERANCE = 1e-6
+
+
+def entangling_ranges(n_layers, n_wires=N_WIRES):
+    """CNOT ranges of qml.StronglyEntanglingLayers with its default `ranges`"""
+    return [(layer % (n_wires - 1)) + 1 for layer in range(n_layers)]
+
+
+class PennyLaneBackend:
+    def __init__(self, device_name, predictor):
+        import pennylane as qml
+        self.name = device_name
+        dev = qml.device(device_name, wires=N_WIRES)
+        self._circuit = qml.QNode(predictor.quantum_circuit, dev)
+        self._variational = qml.QNode(predictor.variational_circuit, dev)
+
+    @staticmethod
+    def available(device_name):
+        import pennylane as qml
+        try:
+            qml.device(device_name, wires=N_WIRES)
+        except Exception:
+            return False
+        return True
+
+    def expvals(self, features):
+        # RY rotations broadcast over the batch; one array of n per wire
+        return np.stack([np.asarray(e) for e in self._circuit(np.atleast_2d(features).T)], axis=-1)
+
+    def variational(self, features, weights):
+        return np.asarray(self._variational(np.atleast_2d(features), weights)).reshape(-1)
+
+
+class NumpyBackend:
+    """
+    Statevector of shape (n, 2, 2, 2, 2); axis w+1 is wire w, with wire 0 the most
+    significant qubit as in PennyLane. The encoding circuit only uses RY and CNOT,
+    so its amplitudes stay real and are simulated in float64.
+    """
+    name = 'numpy'
+
+    def __init__(self, predictor=None):
+        pass
+
+    @staticmethod
+    def available():
+        return True
+
+    @staticmethod
+    def _zero_state(n, dtype):
+        state = np.zeros((n,) + (2,) * N_WIRES, dtype=dtype)
+        state[(slice(None),) + (0,) * N_WIRES] = 1
+        return state
+
+    @staticmethod
+    def _apply_1q(state, matrix, wire):
+        """matrix: (2, 2) shared, or (n, 2, 2) per sample"""
+        moved = np.moveaxis(state, wire + 1, -1)
+        if matrix.ndim == 2:
+            result = moved @ matrix.T
+        else:
+            result = np.einsum('n...j,nij->n...i', moved, matrix)
+        return np.moveaxis(result, -1, wire + 1)
+
+    @staticmethod
+    def _apply_cnot(state, control, target):
+        index = [slice(None)] * (N_WIRES + 1)
+        index[control + 1] = 1
+        index = tuple(index)
+        # The control axis is gone in the sliced view, so later axes shift down by one
+        axis = target + 1 if target < control else target
+        state[index] = np.flip(state[index], axis=axis)
+
+    @staticmethod
+    def _ry_matrices(angles):
+        c, s = np.cos(angles / 2), np.sin(angles / 2)
+        return np.stack([np.stack([c, -s], -1), np.stack([s, c], -1)], -2)
+
+    @staticmethod
+    def _rot_matrix(phi, theta, omega):
+        # qml.Rot(phi, theta, omega) = RZ(omega) RY(theta) RZ(phi)
+        c, s = np.cos(theta / 2), np.sin(theta / 2)
+        return np.array([
+            [np.exp(-0.5j * (phi + omega)) * c, -np.exp(0.5j * (phi - omega)) * s],
+            [np.exp(-0.5j * (phi - omega)) * s, np.exp(0.5j * (phi + omega)) * c],
+        ])
+
+    @staticmethod
+    def _z_expvals(state, wires):
+        probabilities = np.abs(state) ** 2 if np.iscomplexobj(state) else state ** 2
+        result = []
+        for wire in wires:
+            marginal = np.moveaxis(probabilities, wire + 1, 1).reshape(len(state), 2, -1).sum(axis=2)
+            result.append(marginal[:, 0] - marginal[:, 1])
+        return np.stack(result, axis=-1)
+
+    def _encode(self, features, dtype):
+        features = np.atleast_2d(features)
+        state = self._zero_state(len(features), dtype)
+        for wire in range(N_WIRES):
+            state = self._apply_1q(state, self._ry_matrices(features[:, wire]).astype(dtype), wire)
+        return state
+
+    def expvals(self, features):
+        state = self._encode(features, np.float64)
+        for wire in range(N_WIRES - 1):
+            self._apply_cnot(state, wire, wire + 1)
+        return self._z_expvals(state, range(N_WIRES))
+
+    def variational(self, features, weights):
+        weights = np.asarray(weights, dtype=float)
+        state = self._encode(features, np.complex128)
+        for layer, r in zip(weights, entangling_ranges(len(weights))):
+            for wire in range(N_WIRES):
+                state = self._apply_1q(state, self._rot_matrix(*layer[wire]), wire)
+            for wire in range(N_WIRES):
+                self._apply_cnot(state, wire, (wire + r) % N_WIRES)
+        return self._z_expvals(state, [0])[:, 0]
+
+
+class StatevectorBackend:
+    """
+    statevector.StatevectorSimulator with its buffers kept between calls. Each thread
+    has its own simulator, since gates update the buffers in place.
+    """
+
+    def __init__(self, predictor=None, dtype=np.complex128):
+        self.dtype = np.dtype(dtype)
+        self.name = 'statevector' if self.dtype == np.complex128 else 'statevector.c64'
+        self._local = threading.local()
+
+    @staticmethod
+    def available():
+        return True
+
+    def _run(self, features, circuit, **kwargs):
+        features = np.atleast_2d(features)
+        if len(features) == 0:
+            return np.empty((0, N_WIRES))
+        simulator = getattr(self._local, 'simulator', None)
+        if simulator is None or simulator.capacity < len(features):
+            capacity = min(len(features), batch_capacity(N_WIRES, self.dtype))
+            if simulator is None or simulator.capacity < capacity:
+                simulator = self._local.simulator = StatevectorSimulator(N_WIRES, capacity, self.dtype)
+        step = simulator.capacity
+        return np.concatenate([getattr(simulator, circuit)(features[i:i + step], **kwargs)
+                               for i in range(0, len(features), step)])
+
+    def expvals(self, features):
+        return self._run(features, 'encoding_circuit')
+
+    def variational(self, features, weights):
+        return self._run(features, 'variational_circuit', weights=np.asarray(weights, dtype=float))[:, 0]
+
+
+class AerBackend:
+    """
+    One Qiskit circuit per sample, all submitted to AerSimulator as a single job.
+    Qiskit orders qubits little-endian (qubit i is bit i of the basis index);
+    <Z_i> is computed from the bits directly, so no reordering is needed.
+    """
+    name = 'qiskit.aer'
+
+    def __init__(self, predictor=None):
+        from qiskit_aer import AerSimulator
+        self._simulator = AerSimulator(method='statevector')
+        self._signs = 1 - 2 * ((np.arange(2 ** N_WIRES)[:, None] >> np.arange(N_WIRES)) & 1)
+
+    @staticmethod
+    def available():
+        return importlib.util.find_spec('qiskit_aer') is not None
+
+    @staticmethod
+    def _encoding(qc, sample):
+        for wire in range(N_WIRES):
+            qc.ry(float(sample[wire]), wire)
+
+    def _statevectors(self, circuits):
+        for qc in circuits:
+            qc.save_statevector()
+        result = self._simulator.run(circuits).result()
+        return np.stack([np.asarray(result.get_statevector(i)) for i in range(len(circuits))])
+
+    def _z_expvals(self, circuits):
+        return (np.abs(self._statevectors(circuits)) ** 2) @ self._signs
+
+    def expvals(self, features):
+        from qiskit import QuantumCircuit
+        circuits = []
+        for sample in np.atleast_2d(features):
+            qc = QuantumCircuit(N_WIRES)
+            self._encoding(qc, sample)
+            for wire in range(N_WIRES - 1):
+                qc.cx(wire, wire + 1)
+            circuits.append(qc)
+        return self._z_expvals(circuits)
+
+    def variational(self, features, weights):
+        from qiskit import QuantumCircuit
+        weights = np.asarray(weights, dtype=float)
+        ranges = entangling_ranges(len(weights))
+        circuits = []
+        for sample in np.atleast_2d(features):
+            qc = QuantumCircuit(N_WIRES)
+            self._encoding(qc, sample)
+            for layer, r in zip(weights, ranges):
+                for wire in range(N_WIRES):
+                    phi, theta, omega = layer[wire]
+                    qc.rz(phi, wire)
+                    qc.ry(theta, wire)
+                    qc.rz(omega, wire)
+                for wire in range(N_WIRES):
+                    qc.cx(wire, (wire + r) % N_WIRES)
+            circuits.append(qc)
+        return self._z_expvals(circuits)[:, 0]
+
+
+BACKENDS = {
+    'default.qubit': (lambda predictor: PennyLaneBackend('default.qubit', predictor),
+                      lambda: PennyLaneBackend.available('default.qubit')),
+    'lightning.qubit': (lambda predictor: PennyLaneBackend('lightning.qubit', predictor),
+                        lambda: PennyLaneBackend.available('lightning.qubit')),
+    'numpy': (NumpyBackend, NumpyBackend.available),
+    'statevector': (StatevectorBackend, StatevectorBackend.available),
+    'statevector.c64': (lambda predictor: StatevectorBackend(predictor, np.complex64), StatevectorBackend.available),
+    'qiskit.aer': (AerBackend, AerBackend.available),
+}
+
+
+def available_backends():
+    return [name for name, (_, available) in BACKENDS.items() if available()]
+
+
+def make_backend(name, predictor):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown quantum backend: {name} (choose from {', '.join(BACKENDS)})")
+    factory, available = BACKENDS[name]
+    if not available():
+        raise ValueError(f"Quantum backend {name} is not installed")
+    return factory(predictor)
+
+
+def _run(backend, features, weights):
+    if weights is None:
+        return backend.expvals(features)
+    return backend.variational(features, weights)
+
+
+def autotune(predictor, batch_size=QUANTUM_AUTOTUNE_BATCH, repeats=5, path=QUANTUM_BACKEND_PATH, seed=0):
+    """
+    Time every available backend on a random batch with the predictor's weights (or
+    the encoding circuit when untrained). Picks the fastest one that matches
+    default.qubit. Records the result to `path` (skipped when path is None) and
+    returns it.
+    """
+    features = np.random.default_rng(seed).uniform(0, 2 * np.pi, (batch_size, N_WIRES))
+    weights = predictor.weights
+    reference = _run(make_backend(DEFAULT_BACKEND, predictor), features, weights)
+    timings, errors = {}, {}
+    for name in available_backends():
+        try:
+            backend = make_backend(name, predictor)
+            result = _run(backend, features, weights)  # warm-up (JIT, compilation, caches)
+            errors[name] = float(np.max(np.abs(np.asarray(result) - reference)))
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _run(backend, features, weights)
+                samples.append(time.perf_counter() - start)
+            timings[name] = float(np.median(samples))
+        except Exception as e:
+            print(f"Quantum backend {name} failed during autotune: {str(e)}")
+    candidates = [name for name in timings if errors[name] <= AGREEMENT_TOLERANCE]
+    choice = min(candidates, key=timings.get) if candidates else DEFAULT_BACKEND
+    record = {
+        'backend': choice,
+        'batch_size': batch_size,
+        'circuit': 'variational' if weights is not None else 'encoding',
+        'seconds_per_batch': timings,
+        'max_abs_error': errors,
+        'platform': platform.platform(),
+        'tuned_at': time.time(),
+    }
+    if path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Workers may tune concurrently; readers only ever see a complete file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp, path)
+    return record
+
+
+def recorded_backend(path=QUANTUM_BACKEND_PATH):
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f).get('backend')
+    except (OSError, ValueError) as e:
+        print(f"Error reading quantum backend choice from {path}: {str(e)}")
+        return None
+
+
+_autotuned = {}  # path -> backend chosen by this process's autotune
+_autotune_lock = threading.Lock()
+
+
+def select_backend(predictor, path=QUANTUM_BACKEND_PATH):
+    """Backend named by QUANTUM_BACKEND, else the recorded autotune choice, else default.qubit"""
+    name = os.getenv('QUANTUM_BACKEND', '').strip()
+    if name == 'auto':
+        with _autotune_lock:
+            if path not in _autotuned:
+                _autotuned[path] = autotune(predictor, path=path)['backend']
+            name = _autotuned[path]
+    elif not name:
+        name = recorded_backend(path) or DEFAULT_BACKEND
+    try:
+        return make_backend(name, predictor)
+    except ValueError as e:
+        print(f"{str(e)}; using {DEFAULT_BACKEND}")
+        return make_backend(DEFAULT_BACKEND, predictor)
+
+
+if __name__ == '__main__':
+    from quantum_model import QuantumTornadoPredictor
+
+    parser = argparse.ArgumentParser(description="Benchmark the quantum simulator backends and record the fastest")
+    parser.add_argument('--batch-size', type=int, default=QUANTUM_AUTOTUNE_BATCH,
+                        help="Typical number of samples per scoring call in this deployment")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default=QUANTUM_BACKEND_PATH)
+    args = parser.parse_args()
+
+    record = autotune(QuantumTornadoPredictor(backend='default.qubit'), args.batch_size, args.repeats, args.output)
+    for name, seconds in sorted(record['seconds_per_batch'].items(), key=lambda item: item[1]):
+        print(f"{name:16s} {seconds * 1e3:9.3f} ms/batch  max error {record['max_abs_error'][name]:.1e}")
+    print(f"Selected {record['backend']} for batches of {args.batch_size} ({record['circuit']} circuit); "
+          f"saved to {args.output}")
@@ -0,0 +1,291 @@
+"""
+Quantum-kernel tornado classifier.
+
+The kernel is the fidelity k(x, y) = |<φ(x)|φ(y)>|² of the feature map in
+QuantumTornadoPredictor._quantum_feature_map: RY(f·π) then RZ(f·π) on wire i for
+normalized feature i. Each sample's statevector is computed once (batched, with
+statevector.py) and cached, so a block of kernel entries is one complex matrix
+product, |S_x^* S_y^T|², instead of a circuit run per pair.
+
+Two fits are supported:
+
+  exact     SVC on the precomputed Gram matrix (O(n²) memory), calibrated with a
+            logistic (Platt) fit on its cross-validated decision values
+  nystrom   m landmark samples, features Φ = K(x, L) K(L, L)^(-1/2) and a logistic
+            regression on Φ (O(n·m) memory), for training sets above max_exact
+
+Both reduce to the same stored model: the statevectors of the support vectors (or
+landmarks), one weight per stored state and an intercept. Predicting a sample is a
+kernel row against the stored states, a dot product and a sigmoid.
+
+Usage:
+    python quantum_kernel.py data/tornado_history.csv --max-exact 5000 --landmarks 500
+"""
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from data_sources.observation import as_observation, to_batch
+from feature_scaler import StreamingFeatureScaler, DEFAULT_SCALER_PATH
+from quantum_model import TORNADO_FEATURES
+from statevector import StatevectorSimulator
+
+DEFAULT_QKERNEL_PATH = os.getenv('TORNADO_QKERNEL_PATH', os.path.join('models', 'tornado_qkernel.npz'))
+QKERNEL_CACHE_SIZE = int(os.getenv('QKERNEL_CACHE_SIZE', 65536))
+
+# Rows of the Gram matrix computed per block, bounding the complex intermediate
+GRAM_BLOCK_ROWS = 2048
+# Statevectors are cached per sample at this angle resolution (radians)
+CACHE_DECIMALS = 6
+
+
+def feature_angles(scaler, temp_c, humidity, pressure, wind_speed):
+    """Feature map angles (normalized value * π) of shape (n, 4)"""
+    raw = np.stack(np.broadcast_arrays(temp_c, humidity, pressure, wind_speed), axis=-1).astype(float)
+    normalized = np.clip(scaler.transform(np.atleast_2d(raw), features=TORNADO_FEATURES), 0, 1)
+    return normalized * np.pi
+
+
+def feature_map_states(angles):
+    """Statevectors RZ(a)·RY(a)|0> on each wire, shape (n, 2**n_features)"""
+    angles = np.atleast_2d(angles)
+    simulator = StatevectorSimulator(angles.shape[1], max(len(angles), 1))
+    simulator.reset(len(angles))
+    for wire in range(angles.shape[1]):
+        simulator.ry(wire, angles[:, wire]).rz(wire, angles[:, wire])
+    return simulator.state.copy()
+
+
+def gram(states_x, states_y, block_rows=GRAM_BLOCK_ROWS):
+    """Fidelity kernel |<x|y>|² between two sets of statevectors, shape (len(x), len(y))"""
+    result = np.empty((len(states_x), len(states_y)))
+    conj_y = states_y.conj().T
+    for start in range(0, len(states_x), block_rows):
+        overlap = states_x[start:start + block_rows] @ conj_y
+        np.square(np.abs(overlap), out=result[start:start + block_rows])
+    return result
+
+
+def _sigmoid(z):
+    return 1 / (1 + np.exp(-z))
+
+
+class StatevectorCache:
+    """LRU of feature map statevectors keyed by rounded angles"""
+
+    def __init__(self, maxsize=QKERNEL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def states(self, angles):
+        angles = np.round(np.atleast_2d(angles), CACHE_DECIMALS)
+        keys = [row.tobytes() for row in angles]
+        found, missing = {}, []
+        with self._lock:
+            for i, key in enumerate(keys):
+                state = self._entries.get(key)
+                if state is None:
+                    missing.append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    found[i] = state
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            # Every miss of the batch goes through one simulator run
+            computed = feature_map_states(angles[missing])
+            with self._lock:
+                for i, state in zip(missing, computed):
+                    found[i] = self._entries[keys[i]] = state
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return np.array([found[i] for i in range(len(keys))])
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class QuantumKernelModel:
+    def __init__(self, scaler=None, cache_size=QKERNEL_CACHE_SIZE):
+        self.scaler = scaler or StreamingFeatureScaler.load_or_default(DEFAULT_SCALER_PATH)
+        self.cache = StatevectorCache(cache_size)
+        self.kind = None
+        self.states = None      # Support vector / landmark statevectors
+        self.alpha = None       # One weight per stored state
+        self.intercept = 0.0
+        self.platt = (1.0, 0.0)
+
+    @property
+    def trained(self):
+        return self.states is not None
+
+    # --- fitting -------------------------------------------------------------
+
+    def fit(self, angles, labels, max_exact=5000, landmarks=500, C=1.0, seed=42):
+        """Exact SVC up to max_exact samples, Nyström with `landmarks` landmarks beyond"""
+        angles = np.atleast_2d(np.asarray(angles, dtype=float))
+        labels = np.asarray(labels, dtype=int)
+        states = feature_map_states(angles)
+        if len(labels) <= max_exact:
+            self._fit_exact(states, labels, C)
+        else:
+            self._fit_nystrom(states, labels, landmarks, C, np.random.default_rng(seed))
+        return self
+
+    def _fit_exact(self, states, labels, C, calibration_folds=5):
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import cross_val_predict
+        from sklearn.svm import SVC
+
+        kernel = gram(states, states)
+        svc = SVC(kernel='precomputed', C=C, class_weight='balanced')
+        # Platt scaling is fitted on out-of-fold decision values. In-sample values are
+        # overconfident on the support vectors and would bias the probabilities
+        folds = min(calibration_folds, int(np.bincount(labels).min()))
+        if folds >= 2:
+            decision = cross_val_predict(svc, kernel, labels, cv=folds, method='decision_function')
+        else:
+            decision = svc.fit(kernel, labels).decision_function(kernel)
+        platt = LogisticRegression().fit(decision.reshape(-1, 1), labels)
+        svc.fit(kernel, labels)
+        self.kind = 'exact'
+        self.states = states[svc.support_]
+        self.alpha = svc.dual_coef_[0].astype(float)
+        self.intercept = float(svc.intercept_[0])
+        self.platt = (float(platt.coef_[0, 0]), float(platt.intercept_[0]))
+
+    def _fit_nystrom(self, states, labels, landmarks, C, rng):
+        from sklearn.linear_model import LogisticRegression
+
+        chosen = rng.choice(len(states), size=min(landmarks, len(states)), replace=False)
+        landmark_states = states[chosen]
+        # K_mm^(-1/2) from the eigendecomposition, dropping near-null directions
+        eigenvalues, eigenvectors = np.linalg.eigh(gram(landmark_states, landmark_states))
+        keep = eigenvalues > eigenvalues.max() * 1e-10
+        projection = eigenvectors[:, keep] / np.sqrt(eigenvalues[keep])
+        phi = gram(states, landmark_states) @ projection
+        logistic = LogisticRegression(C=C, class_weight='balanced', max_iter=1000).fit(phi, labels)
+        self.kind = 'nystrom'
+        self.states = landmark_states
+        # Fold the projection into the weights, so prediction is K(x, L) @ alpha
+        self.alpha = projection @ logistic.coef_[0]
+        self.intercept = float(logistic.intercept_[0])
+        self.platt = (1.0, 0.0)
+
+    # --- inference -----------------------------------------------------------
+
+    def decision_batch(self, angles):
+        if not self.trained:
+            raise ValueError("No quantum kernel model loaded; run quantum_kernel.py first")
+        return gram(self.cache.states(angles), self.states) @ self.alpha + self.intercept
+
+    def predict_proba_batch(self, angles):
+        a, b = self.platt
+        return _sigmoid(a * self.decision_batch(angles) + b)
+
+    def predict_batch(self, batch):
+        """Tornado probabilities for an observation batch (see data_sources.observation)"""
+        batch = to_batch(batch)
+        return self.predict_proba_batch(feature_angles(self.scaler, batch['temp'] - 273.15, batch['humidity'],
+                                                       batch['pressure'], batch['wind_speed']))
+
+    def predict(self, weather_data):
+        weather = as_observation(weather_data)
+        angles = feature_angles(self.scaler, weather.temp_c, weather.humidity, weather.pressure, weather.wind_speed)
+        return float(self.predict_proba_batch(angles)[0])
+
+    # --- persistence ---------------------------------------------------------
+
+    def save(self, path=DEFAULT_QKERNEL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, kind=self.kind, states=self.states, alpha=self.alpha,
+                 intercept=self.intercept, platt=np.asarray(self.platt),
+                 scaler_fingerprint=self.scaler.fingerprint())
+        os.replace(tmp_path, path)
+
+    def load(self, path=DEFAULT_QKERNEL_PATH):
+        data = np.load(path)
+        # Stored states are feature map states of scaled features, so they only match
+        # the scaler they were computed with
+        if str(data['scaler_fingerprint']) != self.scaler.fingerprint():
+            raise ValueError(f"{path} was fitted with a different feature scaler; refit it")
+        self.kind = str(data['kind'])
+        self.states = data['states']
+        self.alpha = data['alpha']
+        self.intercept = float(data['intercept'])
+        self.platt = tuple(float(v) for v in data['platt'])
+        return self
+
+    @classmethod
+    def load_or_untrained(cls, path=DEFAULT_QKERNEL_PATH, scaler=None):
+        model = cls(scaler)
+        if path and os.path.exists(path):
+            try:
+                model.load(path)
+            except Exception as e:
+                print(f"Error loading quantum kernel model from {path}: {str(e)}")
+        return model
+
+    def stats(self):
+        return {'trained': self.trained, 'kind': self.kind,
+                'stored_states': 0 if self.states is None else len(self.states),
+                'cache': self.cache.stats()}
+
+
+def load_kernel_training_data(path, scaler):
+    """Read a labeled CSV (see quantum_training.py) and return (angles, labels)"""
+    import pandas as pd
+
+    from quantum_training import REQUIRED_COLUMNS
+
+    df = pd.read_csv(path)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Training data is missing columns: {missing}")
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+    angles = feature_angles(scaler, df['temp'].to_numpy() - 273.15, df['humidity'].to_numpy(),
+                            df['pressure'].to_numpy(), df['wind_speed'].to_numpy())
+    return angles, df['label'].to_numpy(dtype=int)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fit the quantum-kernel tornado classifier")
+    parser.add_argument('data', help="CSV of labeled historical observations")
+    parser.add_argument('--max-exact', type=int, default=5000,
+                        help="Largest training set fitted with the exact Gram matrix")
+    parser.add_argument('--landmarks', type=int, default=500, help="Nyström landmarks beyond --max-exact")
+    parser.add_argument('-C', type=float, default=1.0, help="Regularization strength (inverse)")
+    parser.add_argument('--validation-split', type=float, default=0.1)
+    parser.add_argument('--output', default=DEFAULT_QKERNEL_PATH)
+    args = parser.parse_args()
+
+    model = QuantumKernelModel()
+    X, y = load_kernel_training_data(args.data, model.scaler)
+    order = np.random.default_rng(42).permutation(len(y))
+    n_val = int(len(y) * args.validation_split)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    print(f"Training on {len(train_idx)} samples ({int(y[train_idx].sum())} positive)")
+
+    started = time.time()
+    model.fit(X[train_idx], y[train_idx], max_exact=args.max_exact, landmarks=args.landmarks, C=args.C)
+    print(f"Fitted {model.kind} kernel model with {len(model.states)} stored states "
+          f"({time.time() - started:.1f}s)")
+    if n_val:
+        probs = np.clip(model.predict_proba_batch(X[val_idx]), 1e-6, 1 - 1e-6)
+        y_val = y[val_idx]
+        loss = -np.mean(y_val * np.log(probs) + (1 - y_val) * np.log(1 - probs))
+        accuracy = np.mean((probs >= 0.5) == y_val)
+        print(f"Validation: log loss {loss:.4f}, accuracy {accuracy:.3f}")
+    model.save(args.output)
+    print(f"Saved quantum kernel model to {args.output}")
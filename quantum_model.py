@@ -1,15 +1,49 @@
 import pennylane as qml
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+import os
 import traceback
 from qiskit import QuantumCircuit
+from feature_scaler import StreamingFeatureScaler, DEFAULT_SCALER_PATH
+from data_sources.observation import as_observation, to_batch
+from quantum_backends import make_backend, select_backend
+
+# Where trained circuit weights are checkpointed (see quantum_training.py)
+DEFAULT_WEIGHTS_PATH = os.getenv('TORNADO_WEIGHTS_PATH', os.path.join('models', 'tornado_weights.npz'))
+
+# Features fed to the 4-wire tornado circuit, in wire order
+TORNADO_FEATURES = ['temperature', 'humidity', 'pressure', 'wind_speed']
+
+# Regions with historically low tornado activity
+LOW_TORNADO_REGIONS = [
+    # Northeast US (including New Jersey)
+    {'min_lat': 38.0, 'max_lat': 45.0, 'min_lon': -75.0, 'max_lon': -70.0},
+    # West Coast
+    {'min_lat': 32.0, 'max_lat': 49.0, 'min_lon': -125.0, 'max_lon': -120.0},
+    # Northern states (excluding tornado alley)
+    {'min_lat': 45.0, 'max_lat': 49.0, 'min_lon': -125.0, 'max_lon': -90.0},
+    # Alaska
+    {'min_lat': 50.0, 'max_lat': 72.0, 'min_lon': -180.0, 'max_lon': -130.0},
+    # Hawaii
+    {'min_lat': 18.0, 'max_lat': 23.0, 'min_lon': -160.0, 'max_lon': -154.0}
+]
 
 class QuantumTornadoPredictor:
-    def __init__(self):
+    def __init__(self, weights_path=DEFAULT_WEIGHTS_PATH, scaler_path=DEFAULT_SCALER_PATH, backend=None):
+        # Training device; inference runs on self.backend (see quantum_backends.py)
         self.dev = qml.device("default.qubit", wires=4)
         self.circuit = qml.QNode(self.quantum_circuit, self.dev)
-        self.scaler = MinMaxScaler()
+        # Trainable variant of the circuit, differentiated with backprop so a whole
+        # mini-batch of features can be broadcast through a single execution
+        self.trainable_circuit = qml.QNode(self.variational_circuit, self.dev,
+                                           interface="autograd", diff_method="backprop")
+        self.weights = None
+        # Fitted once offline (see feature_scaler.py); falls back to the default ranges
+        self.scaler = StreamingFeatureScaler.load_or_default(scaler_path)
         self.n_qubits = 5  # Number of qubits for our quantum circuit
+        if weights_path and os.path.exists(weights_path):
+            self.load_weights(weights_path)
+        # A backend name, or None for QUANTUM_BACKEND / the recorded autotune choice
+        self.backend = make_backend(backend, self) if backend else select_backend(self)
         
     def quantum_circuit(self, features):
         # Encode the weather features into quantum states
@@ -22,69 +56,135 @@ class QuantumTornadoPredictor:
             
         # Measure in computational basis
         return [qml.expval(qml.PauliZ(i)) for i in range(4)]
-    
+
+    def variational_circuit(self, features, weights):
+        """
+        Same angle encoding as quantum_circuit followed by trainable entangling layers.
+        features may be a single sample (4,) or a batch (n_samples, 4); PennyLane
+        broadcasts the RY rotations over the leading dimension.
+        """
+        for i in range(4):
+            qml.RY(features[..., i], wires=i)
+        qml.StronglyEntanglingLayers(weights, wires=range(4))
+        return qml.expval(qml.PauliZ(0))
+
+    def load_weights(self, path):
+        """Load trained circuit weights from a checkpoint written by quantum_training.py"""
+        try:
+            checkpoint = np.load(path)
+            # The weights only fit the encoding they were trained under (see quantum_training.py)
+            if 'scaler_fingerprint' not in checkpoint:
+                print(f"Warning: {path} does not record its feature scaler; it may not match the current one")
+            elif str(checkpoint['scaler_fingerprint']) != self.scaler.fingerprint():
+                print(f"Ignoring trained weights in {path}: they were fitted with a different feature "
+                      f"scaler; retrain with quantum_training.py")
+                self.weights = None
+                return
+            self.weights = np.array(checkpoint['weights'])
+            print(f"Loaded trained tornado circuit weights from {path} "
+                  f"(epoch {int(checkpoint['epoch'])}, loss {float(checkpoint['loss']):.4f})")
+        except Exception as e:
+            print(f"Error loading weights from {path}: {str(e)}")
+            self.weights = None
+
+    def encode_features(self, temp, humidity, pressure, wind_speed):
+        """
+        Map raw weather values (temperature in Celsius) to rotation angles.
+        Accepts scalars or equal-length arrays and returns an array of shape (..., 4).
+        """
+        raw = np.stack(np.broadcast_arrays(temp, humidity, pressure, wind_speed), axis=-1).astype(float)
+        return self.scaler.transform(raw, features=TORNADO_FEATURES) * 2 * np.pi
+
+    def predict_proba_batch(self, features, weights=None):
+        """
+        Tornado probability for a batch of encoded features using the trained circuit.
+        Returns an array of shape (n_samples,).
+        """
+        weights = self.weights if weights is None else weights
+        if weights is None:
+            raise ValueError("No trained weights loaded; run quantum_training.py first")
+        expval = self.backend.variational(np.atleast_2d(features), weights)
+        return (1 - np.asarray(expval)) / 2
+
+    def feature_probability_batch(self, features):
+        """
+        Tornado probability for encoded features of shape (n_samples, 4), before the
+        regional adjustment: the part of predict() that depends only on the features.
+        """
+        features = np.atleast_2d(features)
+        # A trained circuit is already calibrated against historical labels,
+        # so its output is used directly instead of the hand-tuned scaling below
+        if self.weights is not None:
+            return self.predict_proba_batch(features)
+
+        # Get quantum predictions, (n_samples, 4) expectation values
+        predictions = self.backend.expvals(features)
+
+        # Convert predictions to probability [0, 1] with more conservative scaling
+        raw_probability = (np.mean(predictions, axis=1) + 1) / 2
+
+        # Apply more conservative probability scaling
+        # This ensures probabilities are lower and more realistic
+        return raw_probability * 0.6  # Scale down by 40%
+
+    def adjust_probability(self, probability, weather_data):
+        """Location-specific adjustment and cap applied on top of feature_probability_batch()"""
+        if self.weights is not None:
+            return probability
+
+        # Lower probabilities for regions with historically low tornado activity
+        if self._is_low_tornado_region(weather_data):
+            probability *= 0.3  # Reduce probability by 70% for low-risk regions
+
+        return min(0.65, probability)  # Cap maximum probability at 65%
+
     def predict(self, weather_data):
         try:
             # Extract and normalize weather features
-            temp = weather_data['main']['temp'] - 273.15  # Convert to Celsius
-            humidity = weather_data['main']['humidity']
-            pressure = weather_data['main']['pressure']
-            wind_speed = weather_data['wind']['speed']
-            
-            # More realistic normalization ranges for tornado prediction
-            features = [
-                (temp - 15) / 30 * 2 * np.pi,  # Temperature range: 15 to 45 C (typical tornado conditions)
-                (humidity - 40) / 40 * 2 * np.pi,  # Humidity range: 40 to 80% (typical tornado conditions)
-                (pressure - 980) / 40 * 2 * np.pi,  # Pressure range: 980 to 1020 hPa (typical tornado conditions)
-                wind_speed / 20 * 2 * np.pi  # Wind speed range: 0 to 20 m/s (typical tornado conditions)
-            ]
-            
-            # Get quantum predictions
-            predictions = self.circuit(np.array(features))
-            
-            # Convert predictions to probability [0, 1] with more conservative scaling
-            raw_probability = (np.mean(predictions) + 1) / 2
-            
-            # Apply more conservative probability scaling
-            # This ensures probabilities are lower and more realistic
-            scaled_probability = raw_probability * 0.6  # Scale down by 40%
-            
-            # Add location-specific adjustments
-            # Lower probabilities for regions with historically low tornado activity
-            if self._is_low_tornado_region(weather_data):
-                scaled_probability *= 0.3  # Reduce probability by 70% for low-risk regions
-            
-            return min(0.65, scaled_probability)  # Cap maximum probability at 65%
-            
+            weather = as_observation(weather_data)
+            features = self.encode_features(weather.temp_c, weather.humidity,
+                                            weather.pressure, weather.wind_speed)
+            probability = float(self.feature_probability_batch(features)[0])
+            return self.adjust_probability(probability, weather)
+
         except Exception as e:
             print(f"Error in predict: {str(e)}")
             return 0.1  # Return low default probability on error
-    
+
+    def predict_batch(self, batch):
+        """Exact tornado probabilities for an observation batch (see data_sources.observation)"""
+        batch = to_batch(batch)
+        features = self.encode_features(batch['temp'] - 273.15, batch['humidity'],
+                                        batch['pressure'], batch['wind_speed'])
+        probabilities = self.feature_probability_batch(features)
+        return self.adjust_probability_batch(probabilities, batch)
+
+    def adjust_probability_batch(self, probabilities, batch):
+        """Vectorized adjust_probability() over an observation batch"""
+        probabilities = np.asarray(probabilities, dtype=float)
+        if self.weights is not None:
+            return probabilities
+        lat, lon = batch['lat'], batch['lon']
+        # NaN coordinates compare False, so rows without a location are never low-risk
+        low_risk = np.zeros(len(batch), dtype=bool)
+        for region in LOW_TORNADO_REGIONS:
+            low_risk |= ((region['min_lat'] <= lat) & (lat <= region['max_lat'])
+                         & (region['min_lon'] <= lon) & (lon <= region['max_lon']))
+        return np.minimum(0.65, np.where(low_risk, probabilities * 0.3, probabilities))
+
     def _is_low_tornado_region(self, weather_data):
         """
         Check if the location is in a region with historically low tornado activity
         """
         try:
             # Get location coordinates
-            lat = weather_data['coord']['lat']
-            lon = weather_data['coord']['lon']
-            
-            # Regions with historically low tornado activity
-            low_risk_regions = [
-                # Northeast US (including New Jersey)
-                {'min_lat': 38.0, 'max_lat': 45.0, 'min_lon': -75.0, 'max_lon': -70.0},
-                # West Coast
-                {'min_lat': 32.0, 'max_lat': 49.0, 'min_lon': -125.0, 'max_lon': -120.0},
-                # Northern states (excluding tornado alley)
-                {'min_lat': 45.0, 'max_lat': 49.0, 'min_lon': -125.0, 'max_lon': -90.0},
-                # Alaska
-                {'min_lat': 50.0, 'max_lat': 72.0, 'min_lon': -180.0, 'max_lon': -130.0},
-                # Hawaii
-                {'min_lat': 18.0, 'max_lat': 23.0, 'min_lon': -160.0, 'max_lon': -154.0}
-            ]
+            weather = as_observation(weather_data)
+            if not weather.has_coordinates:
+                return False
+            lat, lon = weather.lat, weather.lon
             
             # Check if location is in any low-risk region
-            for region in low_risk_regions:
+            for region in LOW_TORNADO_REGIONS:
                 if (region['min_lat'] <= lat <= region['max_lat'] and 
                     region['min_lon'] <= lon <= region['max_lon']):
                     return True
@@ -97,28 +197,13 @@ class QuantumTornadoPredictor:
 
     def _normalize_features(self, features):
         try:
-            print("Starting feature normalization...")
             # Ensure all required features are present
-            required_features = ['temperature', 'humidity', 'pressure', 'wind_speed', 'wind_deg']
-            feature_values = []
-            
-            for feature in required_features:
-                if feature in features:
-                    feature_values.append(features[feature])
-                    print(f"Feature {feature}: {features[feature]}")
-                else:
+            for feature in self.scaler.feature_names:
+                if feature not in features:
                     print(f"Warning: Missing feature {feature}, using default value 0")
-                    feature_values.append(0)
-            
-            # Convert features to numpy array and normalize
-            feature_array = np.array(feature_values).reshape(1, -1)
-            print("Feature array before normalization:", feature_array)
-            
-            # Normalize to [0, 1] range
-            normalized = self.scaler.fit_transform(feature_array)
-            print("Normalized features:", normalized[0])
             
-            return normalized[0]
+            # Normalize to [0, 1] range with the pre-fitted scaler
+            return self.scaler.transform_dict(features)
         except Exception as e:
             print(f"Error in _normalize_features: {str(e)}")
             print(traceback.format_exc())
@@ -0,0 +1,173 @@
+"""
+Fast approximate inference for the tornado circuit.
+
+The circuit output depends only on the four normalized features, and the RY angle
+encoding (normalized value * 2π) makes it periodic with period 1 in each of them.
+TornadoSurrogate evaluates the exact circuit once on a regular grid over [0, 1)^4,
+then answers queries by multilinear interpolation on that table. Features are
+wrapped modulo 1, so values outside the scaler's range are still exact inputs for
+the lookup. The regional adjustment and cap from QuantumTornadoPredictor are
+applied on top, exactly as predict() does.
+
+After fitting, the surrogate is validated against the exact model on random
+points. predict_batch(..., error_budget=e) uses the lookup table only when the
+measured max error is within e, and otherwise falls back to exact evaluation.
+
+Usage:
+    python quantum_surrogate.py --grid 16 --samples 20000
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+from data_sources.observation import to_batch
+
+DEFAULT_SURROGATE_PATH = os.getenv('TORNADO_SURROGATE_PATH', os.path.join('models', 'tornado_surrogate.npz'))
+# Largest measured max error the bulk paths (forecasts, static build, backtests) accept
+SURROGATE_ERROR_BUDGET = float(os.getenv('TORNADO_SURROGATE_ERROR_BUDGET', 0.02))
+
+N_FEATURES = 4
+
+
+def model_signature(predictor):
+    """
+    Identifies the exact model a table was built for: trained weights, if any, and the
+    feature scaler they were trained under. The table itself covers the normalized
+    domain, but the weights are only valid for that one encoding.
+    """
+    digest = hashlib.sha256()
+    if predictor.weights is not None:
+        digest.update(np.ascontiguousarray(predictor.weights, dtype=float).tobytes())
+        digest.update(predictor.scaler.fingerprint().encode())
+    else:
+        digest.update(b'legacy-circuit')
+    return digest.hexdigest()[:16]
+
+
+class TornadoSurrogate:
+    def __init__(self, predictor, grid_size=16):
+        self.predictor = predictor
+        self.grid_size = grid_size
+        self.table = None
+        self.max_error = np.inf
+        self.mean_error = np.inf
+        self.signature = model_signature(predictor)
+        self._interpolator = None
+
+    @property
+    def fitted(self):
+        return self.table is not None
+
+    def _exact_unit(self, u):
+        """Exact pre-adjustment probability for normalized features u (n, 4)"""
+        return np.asarray(self.predictor.feature_probability_batch(np.asarray(u) * 2 * np.pi), dtype=float)
+
+    def _build_interpolator(self):
+        # The table covers [0, 1) and one extra wrapped plane per axis, so [0, 1] is closed
+        axis = np.linspace(0.0, 1.0, self.grid_size + 1)
+        closed = np.pad(self.table, [(0, 1)] * N_FEATURES, mode='wrap')
+        self._interpolator = RegularGridInterpolator([axis] * N_FEATURES, closed, method='linear')
+
+    def fit(self, chunk_size=65536):
+        """Evaluate the exact circuit on the grid (grid_size ** 4 points)"""
+        axis = np.arange(self.grid_size) / self.grid_size
+        grid = np.stack(np.meshgrid(*[axis] * N_FEATURES, indexing='ij'), axis=-1).reshape(-1, N_FEATURES)
+        values = np.concatenate([self._exact_unit(grid[i:i + chunk_size])
+                                 for i in range(0, len(grid), chunk_size)])
+        self.table = values.reshape((self.grid_size,) * N_FEATURES)
+        self._build_interpolator()
+        return self
+
+    def validate(self, n_samples=20000, seed=0):
+        """Measure max/mean absolute error against the exact model on random points"""
+        u = np.random.default_rng(seed).random((n_samples, N_FEATURES))
+        errors = np.abs(self.approximate_unit(u) - self._exact_unit(u))
+        self.max_error = float(errors.max())
+        self.mean_error = float(errors.mean())
+        return {'max_error': self.max_error, 'mean_error': self.mean_error, 'samples': n_samples}
+
+    def approximate_unit(self, u):
+        return self._interpolator(np.mod(np.atleast_2d(u), 1.0))
+
+    def covers(self, error_budget):
+        """True when the lookup table is accurate enough for `error_budget` (None = any)"""
+        if not self.fitted or self.signature != model_signature(self.predictor):
+            return False
+        return error_budget is None or self.max_error <= error_budget
+
+    def predict_batch(self, batch, error_budget=None):
+        """
+        Tornado probabilities for an observation batch. Uses the lookup table when its
+        measured max error is within `error_budget`, exact evaluation otherwise.
+        """
+        if not self.covers(error_budget):
+            return self.predictor.predict_batch(batch)
+        batch = to_batch(batch)
+        features = self.predictor.encode_features(batch['temp'] - 273.15, batch['humidity'],
+                                                  batch['pressure'], batch['wind_speed'])
+        probabilities = self.approximate_unit(features / (2 * np.pi))
+        return self.predictor.adjust_probability_batch(probabilities, batch)
+
+    def save(self, path=DEFAULT_SURROGATE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(path, table=self.table, grid_size=self.grid_size, max_error=self.max_error,
+                 mean_error=self.mean_error, signature=self.signature)
+
+    @classmethod
+    def load(cls, predictor, path=DEFAULT_SURROGATE_PATH):
+        data = np.load(path)
+        surrogate = cls(predictor, int(data['grid_size']))
+        if str(data['signature']) != surrogate.signature:
+            raise ValueError(f"{path} was built for a different model; rebuild it")
+        surrogate.table = data['table']
+        surrogate.max_error = float(data['max_error'])
+        surrogate.mean_error = float(data['mean_error'])
+        surrogate._build_interpolator()
+        return surrogate
+
+    @classmethod
+    def load_or_none(cls, predictor, path=DEFAULT_SURROGATE_PATH):
+        if not os.path.exists(path):
+            return None
+        try:
+            return cls.load(predictor, path)
+        except Exception as e:
+            print(f"Error loading tornado surrogate from {path}: {str(e)}")
+            return None
+
+
+if __name__ == '__main__':
+    from quantum_model import QuantumTornadoPredictor
+
+    parser = argparse.ArgumentParser(description="Build the tornado circuit lookup-table surrogate")
+    parser.add_argument('--grid', type=int, default=16, help="Grid points per feature")
+    parser.add_argument('--samples', type=int, default=20000, help="Random points used to measure the error")
+    parser.add_argument('--output', default=DEFAULT_SURROGATE_PATH)
+    args = parser.parse_args()
+
+    predictor = QuantumTornadoPredictor()
+    surrogate = TornadoSurrogate(predictor, args.grid)
+    start = time.perf_counter()
+    surrogate.fit()
+    print(f"Evaluated {args.grid ** N_FEATURES} grid points in {time.perf_counter() - start:.1f}s")
+    report = surrogate.validate(args.samples)
+    print(f"Max error {report['max_error']:.5f}, mean error {report['mean_error']:.5f} "
+          f"over {report['samples']} random points")
+
+    u = np.random.default_rng(1).random((args.samples, N_FEATURES))
+    start = time.perf_counter()
+    surrogate.approximate_unit(u)
+    approx_time = time.perf_counter() - start
+    start = time.perf_counter()
+    surrogate._exact_unit(u)
+    exact_time = time.perf_counter() - start
+    print(f"Lookup {approx_time * 1e6 / args.samples:.2f} us/point, exact {exact_time * 1e6 / args.samples:.2f} us/point")
+
+    surrogate.save(args.output)
+    print(f"Saved surrogate to {args.output}")
@@ -0,0 +1,170 @@
+"""
+Training loop for the variational tornado circuit.
+
+Fits the StronglyEntanglingLayers weights of QuantumTornadoPredictor.variational_circuit
+on historical labeled weather observations. Each optimizer step broadcasts a whole
+mini-batch through one circuit execution and differentiates it with backprop, so the
+cost of a step does not grow with per-sample parameter-shift evaluations.
+
+Usage:
+    python quantum_training.py data/tornado_history.csv --epochs 20 --batch-size 256 --fit-scaler
+
+The CSV needs the columns temp (Kelvin, as returned by OpenWeatherMap), humidity,
+pressure, wind_speed and label (1 if a tornado was reported, 0 otherwise).
+Features are normalized with the persisted feature scaler; --fit-scaler refits it
+on the training data first, which should be done whenever the history changes.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pennylane as qml
+from pennylane import numpy as pnp
+
+from quantum_model import QuantumTornadoPredictor, DEFAULT_WEIGHTS_PATH
+from feature_scaler import fit_scaler_from_csv, DEFAULT_SCALER_PATH
+
+REQUIRED_COLUMNS = ['temp', 'humidity', 'pressure', 'wind_speed', 'label']
+
+
+def load_training_data(path, predictor):
+    """Read a labeled CSV and return (encoded features, labels) as arrays"""
+    df = pd.read_csv(path)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Training data is missing columns: {missing}")
+    df = df.dropna(subset=REQUIRED_COLUMNS)
+    features = predictor.encode_features(
+        df['temp'].to_numpy() - 273.15,
+        df['humidity'].to_numpy(),
+        df['pressure'].to_numpy(),
+        df['wind_speed'].to_numpy()
+    )
+    labels = df['label'].to_numpy(dtype=float)
+    return features, labels
+
+
+class TornadoCircuitTrainer:
+    def __init__(self, predictor=None, n_layers=2, learning_rate=0.05, batch_size=256,
+                 checkpoint_path=DEFAULT_WEIGHTS_PATH, seed=42):
+        self.predictor = predictor or QuantumTornadoPredictor(weights_path=None)
+        self.n_layers = n_layers
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.optimizer = qml.AdamOptimizer(stepsize=learning_rate)
+        self.rng = np.random.default_rng(seed)
+
+    def init_weights(self):
+        shape = qml.StronglyEntanglingLayers.shape(n_layers=self.n_layers, n_wires=4)
+        return pnp.array(self.rng.uniform(0, 2 * np.pi, size=shape), requires_grad=True)
+
+    def loss(self, weights, features, labels):
+        """Binary cross-entropy of the circuit probabilities over one batch"""
+        expval = self.predictor.trainable_circuit(features, weights)
+        probs = pnp.clip((1 - expval) / 2, 1e-6, 1 - 1e-6)
+        return -pnp.mean(labels * pnp.log(probs) + (1 - labels) * pnp.log(1 - probs))
+
+    def save_checkpoint(self, weights, epoch, loss):
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Adam's moment estimates are saved with the weights so a resumed run continues
+        # the same optimization instead of restarting it from zero moments
+        state = self.optimizer.accumulation
+        optimizer_state = {} if state is None else {
+            'adam_fm': np.asarray(state['fm'][0]), 'adam_sm': np.asarray(state['sm'][0]), 'adam_t': state['t']}
+        # Write to a temp file first so a crash mid-save never corrupts the last checkpoint
+        tmp_path = self.checkpoint_path + '.tmp.npz'
+        np.savez(tmp_path, weights=np.asarray(weights), epoch=epoch, loss=loss, n_layers=self.n_layers,
+                 scaler_fingerprint=self.predictor.scaler.fingerprint(), **optimizer_state)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def load_checkpoint(self):
+        """
+        Return (weights, next_epoch, best_loss) from an existing checkpoint, or None.
+        The optimizer's moment estimates are restored when the checkpoint has them.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        checkpoint = np.load(self.checkpoint_path)
+        if int(checkpoint['n_layers']) != self.n_layers:
+            print(f"Checkpoint has {int(checkpoint['n_layers'])} layers, expected {self.n_layers}; starting fresh")
+            return None
+        if 'scaler_fingerprint' in checkpoint and str(checkpoint['scaler_fingerprint']) != self.predictor.scaler.fingerprint():
+            print("Checkpoint was trained with a different feature scaler; starting fresh")
+            return None
+        if 'adam_t' in checkpoint:
+            self.optimizer.accumulation = {'fm': [pnp.array(checkpoint['adam_fm'], requires_grad=False)],
+                                           'sm': [pnp.array(checkpoint['adam_sm'], requires_grad=False)],
+                                           't': int(checkpoint['adam_t'])}
+        weights = pnp.array(checkpoint['weights'], requires_grad=True)
+        return weights, int(checkpoint['epoch']) + 1, float(checkpoint['loss'])
+
+    def fit(self, features, labels, epochs=10, validation_split=0.1, resume=True):
+        features = np.asarray(features, dtype=float)
+        labels = np.asarray(labels, dtype=float)
+
+        # Hold out a validation slice used to pick the checkpoint we keep
+        order = self.rng.permutation(len(labels))
+        n_val = int(len(labels) * validation_split)
+        val_idx, train_idx = order[:n_val], order[n_val:]
+        x_val, y_val = features[val_idx], labels[val_idx]
+
+        start_epoch, best_loss = 0, np.inf
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint is not None:
+            # Only an epoch that beats the checkpointed validation loss may replace it
+            weights, start_epoch, best_loss = checkpoint
+            print(f"Resuming training from epoch {start_epoch} (best val loss {best_loss:.4f})")
+        else:
+            self.optimizer.reset()
+            weights = self.init_weights()
+
+        for epoch in range(start_epoch, epochs):
+            started = time.time()
+            self.rng.shuffle(train_idx)
+            batch_losses = []
+            for start in range(0, len(train_idx), self.batch_size):
+                batch = train_idx[start:start + self.batch_size]
+                x_batch, y_batch = features[batch], labels[batch]
+                weights, batch_loss = self.optimizer.step_and_cost(
+                    lambda w: self.loss(w, x_batch, y_batch), weights
+                )
+                batch_losses.append(float(batch_loss))
+
+            train_loss = float(np.mean(batch_losses))
+            val_loss = float(self.loss(weights, x_val, y_val)) if n_val else train_loss
+            print(f"Epoch {epoch + 1}/{epochs}: train loss {train_loss:.4f}, "
+                  f"val loss {val_loss:.4f} ({time.time() - started:.1f}s)")
+
+            if val_loss < best_loss:
+                best_loss = val_loss
+                self.save_checkpoint(weights, epoch, val_loss)
+
+        self.predictor.load_weights(self.checkpoint_path)
+        return self.predictor.weights
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train the variational tornado circuit")
+    parser.add_argument('data', help="CSV of labeled historical observations")
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--layers', type=int, default=2)
+    parser.add_argument('--learning-rate', type=float, default=0.05)
+    parser.add_argument('--checkpoint', default=DEFAULT_WEIGHTS_PATH)
+    parser.add_argument('--no-resume', action='store_true', help="Ignore an existing checkpoint")
+    parser.add_argument('--fit-scaler', action='store_true', help="Refit the feature scaler on the training data")
+    args = parser.parse_args()
+
+    trainer = TornadoCircuitTrainer(n_layers=args.layers, learning_rate=args.learning_rate,
+                                    batch_size=args.batch_size, checkpoint_path=args.checkpoint)
+    if args.fit_scaler:
+        trainer.predictor.scaler = fit_scaler_from_csv(args.data)
+        trainer.predictor.scaler.save(DEFAULT_SCALER_PATH)
+        print(f"Saved feature scaler to {DEFAULT_SCALER_PATH}")
+    X, y = load_training_data(args.data, trainer.predictor)
+    print(f"Training on {len(y)} samples ({int(y.sum())} positive)")
+    trainer.fit(X, y, epochs=args.epochs, resume=not args.no_resume)
@@ -0,0 +1,354 @@
+"""
+Out-of-process scoring pool with shared-memory batches and micro-batching.
+
+CPU-heavy scoring runs in dedicated worker processes instead of the web worker that
+handles the request. Each worker owns a shared-memory segment. Observation batches
+(data_sources.observation.OBSERVATION_DTYPE) are written into it and the scores are
+written back in place, so only a short control message (task id, segment name,
+row count, kernel name) crosses the process boundary.
+
+Requests are micro-batched: score() calls that arrive within `window` seconds of
+each other for the same kernel are concatenated into one vectorized call, up to
+`max_batch` rows, and the results are split back per caller.
+
+Control messages travel over socket pairs, so waiting for a worker is cooperative
+under gevent as well as under threads.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from data_sources.observation import OBSERVATION_DTYPE, to_batch
+
+SCORING_POOL_PROCESSES = int(os.getenv('SCORING_POOL_PROCESSES', 0))
+SCORING_POOL_WINDOW = float(os.getenv('SCORING_POOL_WINDOW', 0.005))
+
+DISASTERS = ('tornado', 'earthquake', 'fire', 'flood')
+
+
+# --- kernels (run inside the worker processes) ---------------------------------
+
+_predictor = None
+_kernel_model = None
+_surrogate = False  # Not loaded yet; None once loading found no usable table
+
+
+def _quantum_predictor():
+    global _predictor
+    if _predictor is None:
+        from quantum_model import QuantumTornadoPredictor
+        _predictor = QuantumTornadoPredictor()
+    return _predictor
+
+
+def _tornado_surrogate():
+    global _surrogate
+    if _surrogate is False:
+        from quantum_surrogate import TornadoSurrogate
+        _surrogate = TornadoSurrogate.load_or_none(_quantum_predictor())
+    return _surrogate
+
+
+def _tornado_probabilities(batch, error_budget=None):
+    """Exact tornado probabilities, or the surrogate's where its measured error fits error_budget"""
+    surrogate = _tornado_surrogate() if error_budget is not None else None
+    if surrogate is None:
+        return _quantum_predictor().predict_batch(batch)
+    return surrogate.predict_batch(batch, error_budget=error_budget)
+
+
+def _quantum_kernel_model():
+    global _kernel_model
+    if _kernel_model is None:
+        from quantum_kernel import QuantumKernelModel
+        _kernel_model = QuantumKernelModel.load_or_untrained(scaler=_quantum_predictor().scaler)
+    return _kernel_model
+
+
+def quantum_kernel(batch, rng=None, error_budget=None):
+    """
+    Vectorized predict_with_quantum for all four disasters: (n, 4) in DISASTERS order.
+    `rng` seeds the rule-based scorers' noise (see disaster_scoring.score_all). With an
+    error_budget, the tornado circuit is answered by the lookup-table surrogate when
+    its measured error fits the budget.
+    """
+    from disaster_scoring import score_all
+    scores = score_all(batch, DISASTERS, rng)
+    tornado = _tornado_probabilities(batch, error_budget)
+    # Without coordinates the regional adjustment is unknown, so be conservative
+    no_coordinates = np.isnan(batch['lat']) | np.isnan(batch['lon'])
+    scores['tornado'] = np.where(no_coordinates, tornado * 0.5, tornado)
+    return np.stack([scores[d] for d in DISASTERS], axis=1)
+
+
+def quantum_bulk_kernel(batch, rng=None, error_budget=None):
+    """quantum_kernel for bulk scoring (forecasts): the surrogate within SURROGATE_ERROR_BUDGET by default"""
+    from quantum_surrogate import SURROGATE_ERROR_BUDGET
+    return quantum_kernel(batch, rng, SURROGATE_ERROR_BUDGET if error_budget is None else error_budget)
+
+
+def qkernel_kernel(batch, rng=None, error_budget=None):
+    """Vectorized predict_with_qkernel: the kernel classifier's tornado score once it is trained"""
+    model = _quantum_kernel_model()
+    if not model.trained:
+        return quantum_kernel(batch, rng, error_budget)
+    from disaster_scoring import score_all
+    scores = score_all(batch, DISASTERS, rng)
+    scores['tornado'] = model.predict_batch(batch)
+    return np.stack([scores[d] for d in DISASTERS], axis=1)
+
+
+def rule_kernel(batch, rng=None, error_budget=None):
+    """Rule-based scorers for all four disasters: (n, 4) in DISASTERS order"""
+    from disaster_scoring import score_all
+    scores = score_all(batch, DISASTERS, rng)
+    return np.stack([scores[d] for d in DISASTERS], axis=1)
+
+
+KERNELS = {
+    'quantum': quantum_kernel,
+    'quantum_bulk': quantum_bulk_kernel,
+    'qkernel': qkernel_kernel,
+    'rules': rule_kernel,
+}
+N_OUTPUTS = len(DISASTERS)
+
+
+# --- wire protocol ---------------------------------------------------------------
+
+def _send(sock, obj):
+    data = pickle.dumps(obj)
+    sock.sendall(struct.pack('!I', len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise EOFError("scoring worker connection closed")
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv(sock):
+    (length,) = struct.unpack('!I', _recv_exact(sock, 4))
+    return pickle.loads(_recv_exact(sock, length))
+
+
+def _segment_views(buf, n):
+    inputs = np.ndarray((n,), dtype=OBSERVATION_DTYPE, buffer=buf)
+    outputs = np.ndarray((n, N_OUTPUTS), dtype=np.float64, buffer=buf, offset=n * OBSERVATION_DTYPE.itemsize)
+    return inputs, outputs
+
+
+def _segment_size(n):
+    return n * (OBSERVATION_DTYPE.itemsize + N_OUTPUTS * 8)
+
+
+def _worker_main(sock):
+    # Load the models up front so the first batch doesn't pay for it
+    _quantum_predictor()
+    segments = {}
+    while True:
+        try:
+            task_id, name, n, kernel = _recv(sock)
+        except EOFError:
+            break
+        try:
+            if name not in segments:
+                for old in segments.values():
+                    old.close()
+                segments.clear()
+                segment = shared_memory.SharedMemory(name=name)
+                # The parent owns the segment; don't let this process's tracker unlink it
+                resource_tracker.unregister(segment._name, 'shared_memory')
+                segments[name] = segment
+            inputs, outputs = _segment_views(segments[name].buf, n)
+            outputs[:] = KERNELS[kernel](inputs)
+            del inputs, outputs
+            _send(sock, (task_id, None))
+        except Exception as e:
+            _send(sock, (task_id, f"{type(e).__name__}: {e}"))
+    for segment in segments.values():
+        segment.close()
+
+
+# --- parent side -------------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, index):
+        self.sock, child_sock = socket.socketpair()
+        self.process = multiprocessing.get_context('fork').Process(
+            target=_worker_main, args=(child_sock,), name=f'scoring-worker-{index}', daemon=True)
+        self.process.start()
+        child_sock.close()
+        self.segment = None
+
+    def ensure_capacity(self, n):
+        size = _segment_size(n)
+        if self.segment is None or self.segment.size < size:
+            if self.segment is not None:
+                self.segment.close()
+                self.segment.unlink()
+            # Grow geometrically so a busy worker settles on one segment
+            self.segment = shared_memory.SharedMemory(create=True, size=max(size * 2, 1 << 16))
+        return self.segment
+
+    def close(self):
+        try:
+            self.sock.close()
+        finally:
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+            if self.segment is not None:
+                self.segment.close()
+                self.segment.unlink()
+                self.segment = None
+
+
+class _Request:
+    __slots__ = ('kernel', 'batch', 'future')
+
+    def __init__(self, kernel, batch):
+        self.kernel = kernel
+        self.batch = batch
+        self.future = Future()
+
+
+class ScoringPool:
+    def __init__(self, processes=2, window=SCORING_POOL_WINDOW, max_batch=4096):
+        self.window = window
+        self.max_batch = max_batch
+        self._requests = queue.Queue()
+        self._idle = queue.Queue()
+        self._task_ids = itertools.count()
+        self._workers = [_Worker(i) for i in range(processes)]
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._closed = False
+        self.batches = 0
+        self.rows = 0
+        self.requests = 0
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='scoring-dispatch', daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, kernel, batch):
+        """Queue a batch for `kernel`; returns a Future of an (n, 4) score array"""
+        if self._closed:
+            raise RuntimeError("scoring pool is closed")
+        if kernel not in KERNELS:
+            raise ValueError(f"Unknown scoring kernel: {kernel}")
+        request = _Request(kernel, to_batch(batch))
+        self._requests.put(request)
+        return request.future
+
+    def score(self, kernel, batch, timeout=60):
+        return self.submit(kernel, batch).result(timeout)
+
+    def _collect(self):
+        """Block for one request, then gather more for up to `window` seconds"""
+        first = self._requests.get()
+        if first is None:
+            return None
+        pending = [first]
+        rows = len(first.batch)
+        deadline = time.monotonic() + self.window
+        while rows < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)
+                break
+            pending.append(request)
+            rows += len(request.batch)
+        return pending
+
+    def _dispatch_loop(self):
+        while True:
+            pending = self._collect()
+            if pending is None:
+                return
+            by_kernel = {}
+            for request in pending:
+                by_kernel.setdefault(request.kernel, []).append(request)
+            for kernel, requests in by_kernel.items():
+                worker = self._idle.get()
+                threading.Thread(target=self._run_batch, args=(worker, kernel, requests), daemon=True).start()
+
+    def _run_batch(self, worker, kernel, requests):
+        sizes = [len(r.batch) for r in requests]
+        n = sum(sizes)
+        try:
+            segment = worker.ensure_capacity(n)
+            inputs, outputs = _segment_views(segment.buf, n)
+            inputs[:] = np.concatenate([r.batch for r in requests]) if len(requests) > 1 else requests[0].batch
+            task_id = next(self._task_ids)
+            _send(worker.sock, (task_id, segment.name, n, kernel))
+            reply_id, error = _recv(worker.sock)
+            if error is not None or reply_id != task_id:
+                raise RuntimeError(error or "scoring worker replied out of order")
+            results = outputs.copy()
+            del inputs, outputs
+            self.batches += 1
+            self.rows += n
+            self.requests += len(requests)
+            start = 0
+            for request, size in zip(requests, sizes):
+                request.future.set_result(results[start:start + size])
+                start += size
+        except Exception as e:
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        finally:
+            self._idle.put(worker)
+
+    def stats(self):
+        return {'workers': len(self._workers), 'batches': self.batches, 'rows': self.rows,
+                'requests': self.requests,
+                'mean_batch_rows': self.rows / self.batches if self.batches else 0.0}
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._requests.put(None)
+        self._dispatcher.join(timeout=5)
+        for worker in self._workers:
+            worker.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_scoring_pool():
+    """Process-wide pool when SCORING_POOL_PROCESSES > 0, started on first use; else None"""
+    global _pool
+    if SCORING_POOL_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ScoringPool(SCORING_POOL_PROCESSES)
+            # Shared-memory segments outlive the process unless they are unlinked
+            atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,47 @@
+"""
+Serving mode helpers.
+
+SERVING_MODE=async runs gunicorn with gevent workers (see gunicorn.conf.py): the
+standard library is monkey-patched, so blocking upstream I/O (requests, geopy,
+socket) yields to other greenlets and one process can hold hundreds of in-flight
+predictions. CPU-bound scoring would still block the event loop, so run_cpu() sends
+it to a small forked process pool. Threads are not an option there: locks created
+after patching (numpy's Generator lock, for one) belong to the gevent hub and
+deadlock when taken from native threads. In the default threaded mode run_cpu()
+just calls the function.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+SERVING_MODE = os.getenv('SERVING_MODE', 'threaded')
+CPU_OFFLOAD_PROCESSES = int(os.getenv('CPU_OFFLOAD_PROCESSES', 2))
+
+
+def is_async():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+
+_pool = None
+
+
+def _cpu_pool():
+    global _pool
+    if _pool is None:
+        # Forked lazily inside the gunicorn worker, so children inherit the loaded models
+        _pool = ProcessPoolExecutor(CPU_OFFLOAD_PROCESSES, mp_context=multiprocessing.get_context('fork'))
+    return _pool
+
+
+def run_cpu(fn, *args, **kwargs):
+    """
+    Run CPU-bound `fn` without blocking other greenlets in async mode.
+    `fn` and its arguments must be picklable (module-level functions, plain data).
+    """
+    if not is_async():
+        return fn(*args, **kwargs)
+    return _cpu_pool().submit(fn, *args, **kwargs).result()
@@ -0,0 +1,63 @@
+"""
+Request coalescing ("single-flight") for identical concurrent lookups.
+
+When several threads ask for the same key at the same time, only the first one
+runs the function; the others wait for it and share its result (or its exception).
+Once the call finishes the key is forgotten, so this coalesces concurrent work
+without caching anything.
+"""
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'shared')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shared = 0
+
+
+class SingleFlight:
+    def __init__(self, name=''):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.shared += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {'name': self.name, 'executions': self.executions,
+                'coalesced': self.coalesced, 'in_flight': in_flight}
@@ -0,0 +1,352 @@
+"""
+Server-side watchlist: periodic re-scoring of watched locations with push updates.
+
+A background thread refreshes weather for every watched location and re-scores it
+only when the inputs changed after quantization (0.1 K, 1 % humidity, 0.5 hPa,
+0.1 m/s), so tiny fluctuations don't cost a prediction. Refresh intervals adapt to
+the rate of change: an unchanged location backs off geometrically up to
+max_interval, and a changed one drops back to min_interval.
+
+Threshold crossings (Low/Medium/High at 0.4 and 0.7, plus an optional per-entry
+alert threshold) are published to subscribers, which the app exposes as a
+Server-Sent Events stream. The scheduler only runs while someone is subscribed.
+
+Entries are persisted to WATCHLIST_PATH and reloaded when the file changes, so all
+gunicorn workers share one list. Only one process schedules at a time: the one
+holding the lock on <WATCHLIST_PATH>.lock. It writes the per-entry state and recent
+events to <name>.state.json, and the other workers with subscribers follow that
+file and forward its events, so each location is fetched and scored once. When the
+scheduling worker loses its last subscriber or exits, the lock is released and
+another worker with subscribers takes over where it left off.
+"""
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+WATCHLIST_PATH = os.getenv('WATCHLIST_PATH', 'data/watchlist.json')
+MIN_INTERVAL = float(os.getenv('WATCHLIST_MIN_INTERVAL', 300))
+MAX_INTERVAL = float(os.getenv('WATCHLIST_MAX_INTERVAL', 3600))
+
+DISASTERS = ('tornado', 'earthquake', 'fire', 'flood')
+EVENT_LOG_SIZE = 256  # recent events kept in the state file for following workers
+RISK_LEVELS = ((0.7, 'High'), (0.4, 'Medium'), (0.0, 'Low'))
+
+
+def risk_level(probability):
+    for threshold, level in RISK_LEVELS:
+        if probability >= threshold:
+            return level
+    return 'Low'
+
+
+def input_key(weather):
+    """Quantized model inputs; re-scoring happens only when this changes"""
+    return (round(weather.temp, 1), round(weather.humidity), round(weather.pressure * 2) / 2,
+            round(weather.wind_speed, 1), round(weather.wind_deg / 10) * 10)
+
+
+def entry_key(location, model):
+    return f"{' '.join(location.lower().split())}|{model}"
+
+
+class Watchlist:
+    """
+    fetch_weather(lat, lon) -> Observation and score(weather, model) -> [probability per
+    disaster in DISASTERS] are injected by the app.
+    """
+
+    def __init__(self, fetch_weather, score, path=WATCHLIST_PATH,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, tick=5.0):
+        self.fetch_weather = fetch_weather
+        self.score = score
+        self.path = path
+        self.state_path = f"{os.path.splitext(path)[0]}.state.json"
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._state = {}  # key -> runtime state (not persisted)
+        self._mtime = None
+        self._subscribers = set()
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock_file = None  # held while this process is the scheduler
+        self._events = deque(maxlen=EVENT_LOG_SIZE)
+        self._seq = None  # last event sequence number seen in the state file
+        self._state_mtime = None
+        self.refreshes = 0
+        self.rescored = 0
+        self._reload()
+
+    # --- persistence -------------------------------------------------------
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path) as f:
+                entries = {e['key']: e for e in json.load(f)}
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._entries = entries
+            self._mtime = mtime
+            for key in list(self._state):
+                if key not in entries:
+                    del self._state[key]
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(list(self._entries.values()), f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _save_state(self):
+        with self._lock:
+            shared = {'seq': self._seq or 0, 'events': list(self._events),
+                      'state': {key: dict(state) for key, state in self._state.items()}}
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(shared, f)
+        os.replace(tmp, self.state_path)
+        self._state_mtime = os.path.getmtime(self.state_path)
+
+    def _follow(self):
+        """Adopt the scheduler's state and forward the events this process hasn't seen"""
+        try:
+            mtime = os.path.getmtime(self.state_path)
+        except OSError:
+            return
+        if mtime == self._state_mtime:
+            return
+        try:
+            with open(self.state_path) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._state_mtime = mtime
+        with self._lock:
+            # JSON turns the input tuples into lists; they are compared as tuples
+            self._state = {key: dict(state, inputs=tuple(state['inputs'])) if 'inputs' in state else state
+                           for key, state in shared['state'].items() if key in self._entries}
+            self._events = deque(shared['events'], maxlen=EVENT_LOG_SIZE)
+            # A new follower starts from now; subscribe() already sent it the current picture
+            last_seen = shared['seq'] if self._seq is None else self._seq
+            self._seq = shared['seq']
+        for event in shared['events']:
+            if event['seq'] > last_seen:
+                self.publish(event)
+
+    # --- election ----------------------------------------------------------
+
+    def _try_lead(self):
+        """Whether this process is the scheduler, taking the lock if nobody holds it"""
+        if self._lock_file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        lock_file = open(f"{self.path}.lock", 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        # Carry on from the previous scheduler's schedule instead of refreshing everything
+        self._follow()
+        return True
+
+    def _resign(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    # --- entries -----------------------------------------------------------
+
+    def add(self, location, lat, lon, model='quantum', threshold=None):
+        key = entry_key(location, model)
+        entry = {'key': key, 'location': location, 'lat': lat, 'lon': lon,
+                 'model': model, 'threshold': threshold}
+        self._reload()
+        with self._lock:
+            self._entries[key] = entry
+            self._state.pop(key, None)
+            self._save()
+        self._wake.set()
+        return entry
+
+    def remove(self, key):
+        self._reload()
+        with self._lock:
+            removed = self._entries.pop(key, None)
+            self._state.pop(key, None)
+            if removed:
+                self._save()
+        return removed is not None
+
+    def list(self):
+        self._reload()
+        with self._lock:
+            result = []
+            for key, entry in self._entries.items():
+                state = self._state.get(key, {})
+                result.append(dict(entry, probabilities=state.get('probabilities'),
+                                   levels=state.get('levels'), updated=state.get('updated'),
+                                   interval=state.get('interval')))
+            return result
+
+    # --- pub/sub -----------------------------------------------------------
+
+    def subscribe(self, maxsize=256):
+        q = queue.Queue(maxsize=maxsize)
+        with self._lock:
+            self._subscribers.add(q)
+            # Send the current picture so a new client doesn't wait for the next change
+            for key, state in self._state.items():
+                if 'probabilities' in state:
+                    q.put_nowait(self._snapshot_event(key, state))
+        self._ensure_running()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # A stalled client loses old updates rather than blocking the scheduler
+                pass
+
+    def _snapshot_event(self, key, state):
+        entry = self._entries[key]
+        return {'type': 'update', 'key': key, 'location': entry['location'], 'model': entry['model'],
+                'probabilities': state['probabilities'], 'levels': state['levels'], 'crossings': []}
+
+    # --- scheduler ---------------------------------------------------------
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='watchlist', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Nobody is listening: stop until the next subscriber
+                    self._thread = None
+                    self._resign()
+                    return
+            self._reload()
+            if self._try_lead():
+                self._schedule()
+            else:
+                self._follow()
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def _schedule(self):
+        now = time.time()
+        with self._lock:
+            due = [(key, dict(entry)) for key, entry in self._entries.items()
+                   if self._state.get(key, {}).get('next_due', 0) <= now]
+        for key, entry in due:
+            try:
+                self.refresh(key, entry)
+            except Exception as e:
+                print(f"Error refreshing watchlist entry {key}: {str(e)}")
+                with self._lock:
+                    self._state.setdefault(key, {})['next_due'] = time.time() + self.min_interval
+        if due:
+            self._save_state()
+
+    def _emit(self, event):
+        """Publish locally and log the event for the workers following this one"""
+        with self._lock:
+            self._seq = (self._seq or 0) + 1
+            event['seq'] = self._seq
+            self._events.append(event)
+        self.publish(event)
+
+    def refresh(self, key, entry):
+        """Fetch weather for one entry and re-score it if its inputs changed"""
+        self.refreshes += 1
+        weather = self.fetch_weather(entry['lat'], entry['lon'])
+        inputs = input_key(weather)
+        with self._lock:
+            state = self._state.setdefault(key, {'interval': self.min_interval})
+            unchanged = state.get('inputs') == inputs
+            if unchanged:
+                state['interval'] = min(state['interval'] * 2, self.max_interval)
+            else:
+                state['interval'] = self.min_interval
+            state['next_due'] = time.time() + state['interval']
+        if unchanged:
+            return None
+
+        probabilities = dict(zip(DISASTERS, (round(float(p), 4) for p in self.score(weather, entry['model']))))
+        self.rescored += 1
+        levels = {d: risk_level(p) for d, p in probabilities.items()}
+        with self._lock:
+            previous = state.get('probabilities')
+            previous_levels = state.get('levels') or {}
+            state.update(inputs=inputs, probabilities=probabilities, levels=levels, updated=time.time())
+
+        crossings = []
+        if previous is not None:
+            for disaster in DISASTERS:
+                if levels[disaster] != previous_levels.get(disaster):
+                    crossings.append({'disaster': disaster, 'from': previous_levels.get(disaster),
+                                      'to': levels[disaster], 'probability': probabilities[disaster]})
+                threshold = entry.get('threshold')
+                if threshold is not None and (previous[disaster] >= threshold) != (probabilities[disaster] >= threshold):
+                    crossings.append({'disaster': disaster, 'threshold': threshold,
+                                      'direction': 'up' if probabilities[disaster] >= threshold else 'down',
+                                      'probability': probabilities[disaster]})
+
+        event = {'type': 'alert' if crossings else 'update', 'key': key, 'location': entry['location'],
+                 'model': entry['model'], 'probabilities': probabilities, 'levels': levels,
+                 'crossings': crossings}
+        self._emit(event)
+        return event
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'subscribers': len(self._subscribers),
+                    'refreshes': self.refreshes, 'rescored': self.rescored,
+                    'running': self._thread is not None, 'scheduler': self._lock_file is not None}
+
+
+def sse_stream(watchlist, heartbeat=15.0):
+    """Server-Sent Events generator for one client; unsubscribes when the client goes away"""
+    q = watchlist.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = q.get(timeout=heartbeat)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        watchlist.unsubscribe(q)